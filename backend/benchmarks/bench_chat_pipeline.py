@@ -0,0 +1,135 @@
+# benchmarks/bench_chat_pipeline.py
+"""Benchmark hors ligne du pipeline de chat complet (backend mémoire, LLM et embeddings simulés)
+
+Usage (depuis backend/) :
+    python benchmarks/bench_chat_pipeline.py --users 20 --turns 5 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Configuration à fixer AVANT d'importer l'application
+os.environ["DATA_BACKEND"] = "memory"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("REFRESH_SECRET_KEY", "benchmark-refresh-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUESTIONS = [
+    "Comment fonctionne l'attention dans un transformer ?",
+    "Quelles sont les limites de la recherche vectorielle FAISS ?",
+    "Explique la différence entre précision et rappel en évaluation.",
+    "Comment réduire la latence d'une API FastAPI sous charge ?",
+    "Quels indicateurs suivre pour un projet de R&D en IA ?",
+    "Pourquoi normaliser les embeddings avant une recherche cosinus ?",
+]
+
+
+class HashEmbeddings:
+    """Embeddings déterministes (hash des mots) : aucun modèle à télécharger"""
+
+    def __init__(self, size: int = 384):
+        self.size = size
+
+    def _embed(self, text: str):
+        vector = [0.0] * self.size
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.size] += 1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(pct * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+async def run_benchmark(args):
+    from core.vectorstore import vector_store
+    from core.background import background_tasks
+    from core.executors import io_executor, cpu_executor
+    from services.llm_service import llm_service
+    from services.chat_service import chat_service
+    from repositories import repos
+
+    # Vector store isolé et embeddings déterministes
+    vector_store.persist_directory = tempfile.mkdtemp(prefix="bench_faiss_")
+    vector_store.embeddings = HashEmbeddings()
+    vector_store.init_vectorstore()
+
+    # LLM simulé : latence fixe, réponse assez longue pour déclencher l'apprentissage
+    async def fake_llm(messages, priority="interactive", deadline=None):
+        await asyncio.sleep(args.llm_latency_ms / 1000)
+        question = messages[-1]["content"] if messages else ""
+        return f"Réponse simulée ({priority}) :\n- point 1\n- point 2\n" + ("détail " * 40) + question[:80]
+    llm_service.get_response = fake_llm
+
+    background_tasks.start()
+    latencies = []
+
+    async def session(user_index: int):
+        user_id = f"bench_user_{user_index}"
+        await repos.users.create(user_id, {"id": user_id, "email": f"{user_id}@bench.local", "name": user_id})
+        rng = random.Random(args.seed + user_index) # Même scénario d'un run à l'autre
+        conversation_id = None
+        for _ in range(args.turns):
+            message = rng.choice(QUESTIONS)
+            started = time.perf_counter()
+            result = await chat_service.process_chat_message(
+                user_id=user_id, message=message, conversation_id=conversation_id, use_agentic=args.agentic
+            )
+            latencies.append(time.perf_counter() - started)
+            conversation_id = result.get("conversation_id", conversation_id)
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+        started = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(args.users)))
+        elapsed = time.perf_counter() - started
+        await background_tasks.shutdown(timeout=120)
+        drained = time.perf_counter() - started
+
+    turns = len(latencies)
+    print(f"Backend: {repos.backend} (latence simulée {os.getenv('MEMORY_BACKEND_LATENCY_MS', '0')} ms/op)")
+    print(f"Sessions: {args.users} x {args.turns} tours, LLM simulé {args.llm_latency_ms} ms, agentique={args.agentic}")
+    print(f"Tours: {turns} en {elapsed:.2f}s -> {turns / elapsed:.1f} tours/s")
+    print(f"Latence p50={_percentile(latencies, 0.50) * 1000:.1f} ms  "
+          f"p95={_percentile(latencies, 0.95) * 1000:.1f} ms  p99={_percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"Persistance en fond terminée après {drained:.2f}s ({background_tasks.get_stats()})")
+    print(f"Opérations base: {repos.store.operations}")
+    print(f"Exécuteurs: io={io_executor.get_stats()} cpu={cpu_executor.get_stats()}")
+
+    io_executor.shutdown()
+    cpu_executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Sessions simultanées")
+    parser.add_argument("--turns", type=int, default=5, help="Tours par session")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Latence simulée du LLM")
+    parser.add_argument("--store-latency-ms", type=float, default=None, help="Latence simulée par opération de base")
+    parser.add_argument("--agentic", action="store_true", help="Active la détection d'intention (actions réseau possibles)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="Affiche les logs du pipeline")
+    args = parser.parse_args()
+    if args.store_latency_ms is not None:
+        os.environ["MEMORY_BACKEND_LATENCY_MS"] = str(args.store_latency_ms)
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
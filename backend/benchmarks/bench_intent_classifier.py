@@ -0,0 +1,99 @@
+# benchmarks/bench_intent_classifier.py
+"""Micro-benchmark du classifieur d'intention (débit + équivalence avec le balayage naïf)
+
+Usage (depuis backend/) :
+    python benchmarks/bench_intent_classifier.py --iterations 2000 --min-throughput 20000
+
+Code de sortie 1 si le débit passe sous --min-throughput ou si un résultat diffère de la référence.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("REFRESH_SECRET_KEY", "benchmark-refresh-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MESSAGES = [
+    "Cherche les dernières actualités sur l'IA générative",
+    "Écris une fonction Python pour parser un fichier CSV",
+    "Résume ce document en cinq points clés pour la réunion",
+    "Analyse ces données de ventes et fais un graphique pour le trimestre",
+    "Comment fonctionne l'attention dans un transformer ?",
+    "Quelle est la définition de la précision en classification ?",
+    "Bonjour, merci pour ton aide d'hier",
+    "Génère le code JavaScript d'une boucle qui affiche un tableau",
+    "Trouve des informations sur la mise à jour 2026 de FAISS",
+    "Peux-tu m'expliquer la différence entre rappel et précision ?",
+    # Deux intentions au-delà de 1.0 : la première dans l'ordre l'emporte (score comparé à la confiance plafonnée)
+    "recherche des informations sur les actualités ia et tendances; analyse les données statistiques",
+]
+
+
+def reference_classify(patterns, message):
+    """Ancien algorithme (ChatService._detect_agentic_intention) : sous-chaînes une par une,
+    re.search non compilé, score comparé à la confiance déjà plafonnée à 1.0"""
+    message_lower = message.lower()
+    best_match = {"action_type": None, "confidence": 0.0}
+    for action_type, config in patterns.items():
+        keyword_matches = [kw for kw in config.get("keywords", []) if kw in message_lower]
+        keyword_score = len(keyword_matches) * 0.2
+        pattern_score = 0
+        for pattern in config.get("patterns", []):
+            if re.search(pattern, message_lower):
+                pattern_score = 0.5
+                break
+        total_score = keyword_score + pattern_score
+        if total_score > best_match["confidence"]:
+            best_match = {"action_type": action_type, "confidence": min(total_score, 1.0)}
+    return best_match["action_type"], best_match["confidence"]
+
+
+def _throughput(classify, messages, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for message in messages:
+            classify(message)
+    return iterations * len(messages) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="Passages sur le corpus")
+    parser.add_argument("--long-messages", action="store_true", help="Messages allongés (~2 000 caractères)")
+    parser.add_argument("--min-throughput", type=float, default=0, help="Débit minimal attendu (messages/s)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from services.intent_classifier import IntentClassifier
+
+    classifier = IntentClassifier()
+    messages = list(MESSAGES)
+    if args.long_messages:
+        rng = random.Random(args.seed)
+        messages = [" ".join(rng.choice(MESSAGES) for _ in range(30)) for _ in range(len(MESSAGES))]
+
+    mismatches = [
+        message for message in messages
+        if classifier.classify(message) != reference_classify(classifier.patterns, message)
+    ]
+    reference = _throughput(lambda message: reference_classify(classifier.patterns, message), messages, args.iterations)
+    compiled = _throughput(classifier.classify, messages, args.iterations)
+
+    print(f"Corpus: {len(messages)} messages x {args.iterations} passages (mots-clés: {classifier.keywords.engine})")
+    print(f"Référence (balayage naïf): {reference:,.0f} messages/s")
+    print(f"Classifieur compilé:       {compiled:,.0f} messages/s (x{compiled / reference:.2f})")
+    if mismatches:
+        print(f"❌ {len(mismatches)} résultat(s) différent(s) de la référence, ex: {mismatches[0][:80]}")
+        sys.exit(1)
+    if compiled < args.min_throughput:
+        print(f"❌ Débit sous le seuil ({args.min_throughput:,.0f} messages/s)")
+        sys.exit(1)
+    print("✅ Résultats identiques à la référence")
+
+
+if __name__ == "__main__":
+    main()
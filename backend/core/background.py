@@ -0,0 +1,74 @@
+# core/background.py
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class BackgroundTaskQueue:
+    """File de tâches de fond bornée (persistance, apprentissage) hors du chemin de réponse"""
+
+    def __init__(self, maxsize: int = 1000, workers: int = 2):
+        self.maxsize = maxsize
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks = []
+        self._key_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock) # Ordre garanti par clé
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "dropped": 0}
+
+    def start(self):
+        """Démarre les workers (appelé depuis le lifespan, ou à la première soumission)"""
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    def submit(self, func: Callable[..., Awaitable], *args, key: str = None, **kwargs) -> bool:
+        """Planifie `func(*args, **kwargs)` ; les tâches de même clé s'exécutent dans l'ordre"""
+        self.start()
+        try:
+            self._queue.put_nowait((func, args, kwargs, key))
+            self.stats["submitted"] += 1
+            return True
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            print(f"⚠️ File de fond pleine, tâche ignorée: {getattr(func, '__name__', func)}")
+            return False
+
+    async def _worker(self, index: int):
+        while True:
+            func, args, kwargs, key = await self._queue.get()
+            try:
+                if key:
+                    async with self._key_locks[key]:
+                        await func(*args, **kwargs)
+                else:
+                    await func(*args, **kwargs)
+                self.stats["completed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"❌ Erreur tâche de fond {getattr(func, '__name__', func)}: {e}")
+            finally:
+                lock = self._key_locks.get(key) if key else None
+                if lock and not lock.locked() and not getattr(lock, "_waiters", None):
+                    self._key_locks.pop(key, None)
+                self._queue.task_done()
+
+    async def shutdown(self, timeout: float = 10.0):
+        """Vide la file (dans la limite de `timeout`) puis arrête les workers"""
+        if not self._worker_tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Arrêt : {self._queue.qsize()} tâche(s) de fond non terminée(s)")
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "pending": self._queue.qsize() if self._queue else 0}
+
+
+# Instance globale
+background_tasks = BackgroundTaskQueue()
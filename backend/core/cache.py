@@ -0,0 +1,166 @@
+# core/cache.py
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU borné avec expiration, cache négatif (None) et chargement unique par clé"""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300.0, negative_ttl: float = 30.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl # Durée plus courte pour les absences (ex : utilisateur supprimé)
+        self._entries: "OrderedDict[Any, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Any, asyncio.Task] = {} # Chargements en cours (anti-stampede)
+        self.stats = {
+            "hits": 0, "negative_hits": 0, "misses": 0, "loads": 0, "coalesced": 0,
+            "evictions": 0, "expirations": 0, "invalidations": 0,
+        }
+
+    def get(self, key, default=_MISSING):
+        """Valeur en cache (None compris pour une absence mise en cache), sinon `default`"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return default
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats["negative_hits" if value is None else "hits"] += 1
+        return value
+
+    def peek(self, key, default=_MISSING):
+        """Comme get, sans compter dans les statistiques ni rafraîchir l'ordre LRU"""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry[1]:
+            return default
+        return entry[0]
+
+    def keys(self) -> List:
+        return list(self._entries)
+
+    def set(self, key, value, ttl: float = None):
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, key) -> bool:
+        """Retire la clé ; un chargement en cours ne pourra plus remplir le cache avec une valeur périmée"""
+        self._inflight.pop(key, None)
+        if self._entries.pop(key, None) is not None:
+            self.stats["invalidations"] += 1
+            return True
+        return False
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+
+    async def get_or_load(self, key, loader: Callable[[], Awaitable[Any]]):
+        """Retourne la valeur en cache ou la charge une seule fois pour tous les appelants concurrents"""
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            self.stats["loads"] += 1
+            task.add_done_callback(lambda done, key=key: self._store_loaded(key, done))
+        # shield : l'annulation d'un appelant n'interrompt pas le chargement partagé
+        return await asyncio.shield(task)
+
+    def _store_loaded(self, key, task: asyncio.Task):
+        if self._inflight.get(key) is not task:
+            return # Invalidé pendant le chargement : résultat non mis en cache
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "inflight": len(self._inflight),
+            "hit_rate": round((self.stats["hits"] + self.stats["negative_hits"]) / lookups, 3) if lookups else None,
+        }
+
+
+class InvalidationTransport(ABC):
+    """Interface d'un transport inter-workers (Redis pub/sub, Firestore listener...)"""
+
+    @abstractmethod
+    def send(self, channel: str, key: str):
+        pass
+
+
+class InvalidationBus:
+    """Bus d'invalidation : diffusion locale immédiate, puis transport optionnel vers les autres workers"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+        self._transport: Optional[InvalidationTransport] = None
+        self.stats = {"published": 0, "received": 0, "forwarded": 0}
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        self._subscribers[channel].append(handler)
+
+    def attach_transport(self, transport: InvalidationTransport):
+        """Branche un transport ; il doit appeler `receive` pour les messages des autres workers"""
+        self._transport = transport
+
+    def publish(self, channel: str, key: str, local: bool = True):
+        """`local=False` : seulement les autres workers (l'émetteur a déjà mis sa copie à jour)"""
+        self.stats["published"] += 1
+        if local:
+            self._deliver(channel, key)
+        if self._transport is not None:
+            try:
+                self._transport.send(channel, key)
+                self.stats["forwarded"] += 1
+            except Exception as e:
+                print(f"⚠️ Invalidation non diffusée ({channel}/{key}): {e}")
+
+    def receive(self, channel: str, key: str):
+        """Message reçu d'un autre worker"""
+        self.stats["received"] += 1
+        self._deliver(channel, key)
+
+    def _deliver(self, channel: str, key: str):
+        for handler in self._subscribers.get(channel, []):
+            try:
+                handler(key)
+            except Exception as e:
+                print(f"❌ Erreur invalidation {channel}/{key}: {e}")
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "transport": type(self._transport).__name__ if self._transport else "local",
+            "channels": sorted(self._subscribers),
+        }
+
+
+# Instance globale
+invalidation_bus = InvalidationBus()
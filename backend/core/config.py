@@ -19,7 +19,114 @@ class Settings:
     # Firebase
     PROJECT_ID: str = os.getenv("PROJECT_ID")
     FIREBASE_CREDENTIALS: str = os.getenv("FIREBASE_CREDENTIALS") # Clés d'authentification Firebase
-    
+    # Stockage : "firestore" (production) ou "memory" (tests de charge, benchmarks hors ligne)
+    DATA_BACKEND: str = os.getenv("DATA_BACKEND", "firestore")
+    MEMORY_BACKEND_LATENCY_MS: float = float(os.getenv("MEMORY_BACKEND_LATENCY_MS", 0)) # Latence simulée par opération
+    # Cache des utilisateurs authentifiés
+    USER_CACHE_MAXSIZE: int = int(os.getenv("USER_CACHE_MAXSIZE", 1024))
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", 300)) # 5 minutes
+    USER_CACHE_NEGATIVE_TTL: float = float(os.getenv("USER_CACHE_NEGATIVE_TTL", 30)) # Utilisateur inexistant
+    # Conversations : derniers messages recopiés sur le document (historique lu en une lecture)
+    CONVERSATION_TAIL_SIZE: int = int(os.getenv("CONVERSATION_TAIL_SIZE", 6))
+    # Cache par worker des documents de conversation (0 pour désactiver)
+    CONVERSATION_CACHE_SIZE: int = int(os.getenv("CONVERSATION_CACHE_SIZE", 2048))
+    CONVERSATION_CACHE_TTL: float = float(os.getenv("CONVERSATION_CACHE_TTL", 900)) # 15 minutes
+    # Au-delà, la copie en cache n'est servie qu'après relecture de sa `version` (écritures d'autres workers)
+    CONVERSATION_CACHE_FRESHNESS: float = float(os.getenv("CONVERSATION_CACHE_FRESHNESS", 5))
+    # Mémoire résumée : les messages anciens sont intégrés en tâche de fond à un résumé glissant
+    CONVERSATION_SUMMARY_ENABLED: bool = os.getenv("CONVERSATION_SUMMARY_ENABLED", "true").lower() == "true"
+    CONVERSATION_SUMMARY_KEEP_RECENT: int = int(os.getenv("CONVERSATION_SUMMARY_KEEP_RECENT", 2)) # Dernier tour gardé tel quel
+    CONVERSATION_SUMMARY_FOLD_BATCH: int = int(os.getenv("CONVERSATION_SUMMARY_FOLD_BATCH", 2)) # Messages à résumer d'un coup
+    CONVERSATION_SUMMARY_MAX_TOKENS: int = int(os.getenv("CONVERSATION_SUMMARY_MAX_TOKENS", 400))
+    # Index vectoriel par conversation : anciens tours pertinents pour la question
+    CONVERSATION_INDEX_ENABLED: bool = os.getenv("CONVERSATION_INDEX_ENABLED", "true").lower() == "true"
+    CONVERSATION_INDEX_TOP_K: int = int(os.getenv("CONVERSATION_INDEX_TOP_K", 2))
+    CONVERSATION_INDEX_MIN_SCORE: float = float(os.getenv("CONVERSATION_INDEX_MIN_SCORE", 0.5)) # Similarité cosinus
+    CONVERSATION_INDEX_CACHE_SIZE: int = int(os.getenv("CONVERSATION_INDEX_CACHE_SIZE", 512)) # Conversations en mémoire
+    # Index inversé des connaissances (mot-clé -> entrées) : listes gardées en mémoire par worker
+    KNOWLEDGE_INDEX_CACHE_SIZE: int = int(os.getenv("KNOWLEDGE_INDEX_CACHE_SIZE", 20000)) # Listes (utilisateur, mot-clé)
+    KNOWLEDGE_INDEX_CACHE_TTL: float = float(os.getenv("KNOWLEDGE_INDEX_CACHE_TTL", 600))
+    # Connaissances communautaires : partition vectorielle anonymisée (HNSW), alimentée en tâche de fond
+    COMMUNITY_INDEX_DIR: str = os.getenv("COMMUNITY_INDEX_DIR", "./faiss_db/community")
+    COMMUNITY_MIN_VALUE_SCORE: float = float(os.getenv("COMMUNITY_MIN_VALUE_SCORE", 0.7)) # Seuil de promotion
+    COMMUNITY_MIN_SIMILARITY: float = float(os.getenv("COMMUNITY_MIN_SIMILARITY", 0.55)) # Similarité cosinus
+    COMMUNITY_SAVE_EVERY: int = int(os.getenv("COMMUNITY_SAVE_EVERY", 20)) # Promotions entre deux sauvegardes
+    COMMUNITY_BACKFILL_LIMIT: int = int(os.getenv("COMMUNITY_BACKFILL_LIMIT", 2000))
+    # Apprentissage : file bornée vidée par lots (écritures groupées, un passage d'embedding par lot)
+    LEARNING_QUEUE_SIZE: int = int(os.getenv("LEARNING_QUEUE_SIZE", 1000))
+    LEARNING_BATCH_SIZE: int = int(os.getenv("LEARNING_BATCH_SIZE", 32))
+    LEARNING_BATCH_WAIT: float = float(os.getenv("LEARNING_BATCH_WAIT", 2.0)) # Secondes pour compléter un lot
+    # Quasi-doublons fusionnés à l'apprentissage (MinHash/LSH sur les mots et paires de mots de la question)
+    KNOWLEDGE_DEDUP_ENABLED: bool = os.getenv("KNOWLEDGE_DEDUP_ENABLED", "true").lower() == "true"
+    KNOWLEDGE_DEDUP_THRESHOLD: float = float(os.getenv("KNOWLEDGE_DEDUP_THRESHOLD", 0.8)) # Similarité de Jaccard
+    KNOWLEDGE_DEDUP_NUM_PERM: int = int(os.getenv("KNOWLEDGE_DEDUP_NUM_PERM", 64))
+    KNOWLEDGE_DEDUP_BANDS: int = int(os.getenv("KNOWLEDGE_DEDUP_BANDS", 16)) # 4 lignes par bande : candidates dès ~0,5
+    # Recherche web : sources interrogées en parallèle, réponse dès max_results ou au délai global
+    WEB_SEARCH_DEADLINE: float = float(os.getenv("WEB_SEARCH_DEADLINE", 8.0)) # Secondes
+    # Client HTTP partagé (recherche web) : délais séparés, pool de connexions keep-alive
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.0)) # Secondes
+    HTTP_READ_TIMEOUT: float = float(os.getenv("HTTP_READ_TIMEOUT", 8.0))
+    HTTP_WRITE_TIMEOUT: float = float(os.getenv("HTTP_WRITE_TIMEOUT", 5.0))
+    HTTP_POOL_TIMEOUT: float = float(os.getenv("HTTP_POOL_TIMEOUT", 3.0)) # Attente d'une connexion libre
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60.0))
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 10))
+    # Utilisations des connaissances : accumulées en mémoire, écrites par lots
+    KNOWLEDGE_USAGE_FLUSH_INTERVAL: float = float(os.getenv("KNOWLEDGE_USAGE_FLUSH_INTERVAL", 60)) # Secondes
+    KNOWLEDGE_USAGE_MAX_PENDING: int = int(os.getenv("KNOWLEDGE_USAGE_MAX_PENDING", 10000)) # Entrées distinctes
+    # Rétention des connaissances : TTL par type d'interaction, atténuation de la valeur, balayage périodique
+    KNOWLEDGE_RETENTION_ENABLED: bool = os.getenv("KNOWLEDGE_RETENTION_ENABLED", "true").lower() == "true"
+    KNOWLEDGE_TTL_DAYS: str = os.getenv("KNOWLEDGE_TTL_DAYS", "") # "web_search=14,code_generation=365"
+    KNOWLEDGE_DEFAULT_TTL_DAYS: float = float(os.getenv("KNOWLEDGE_DEFAULT_TTL_DAYS", 180))
+    KNOWLEDGE_DECAY_HALF_LIFE_DAYS: float = float(os.getenv("KNOWLEDGE_DECAY_HALF_LIFE_DAYS", 60)) # Sans utilisation
+    KNOWLEDGE_DEMOTE_BELOW: float = float(os.getenv("KNOWLEDGE_DEMOTE_BELOW", 0.3)) # Exclue des recherches
+    KNOWLEDGE_DELETE_BELOW: float = float(os.getenv("KNOWLEDGE_DELETE_BELOW", 0.1))
+    KNOWLEDGE_RETENTION_INTERVAL: float = float(os.getenv("KNOWLEDGE_RETENTION_INTERVAL", 3600)) # Secondes
+    KNOWLEDGE_RETENTION_PAGE_SIZE: int = int(os.getenv("KNOWLEDGE_RETENTION_PAGE_SIZE", 500))
+    KNOWLEDGE_RETENTION_MAX_PER_SWEEP: int = int(os.getenv("KNOWLEDGE_RETENTION_MAX_PER_SWEEP", 5000))
+    # Graphe de connaissances : borné par worker, instantanés disque, reconstruit à la première utilisation
+    KNOWLEDGE_GRAPH_SNAPSHOT_DIR: str = os.getenv("KNOWLEDGE_GRAPH_SNAPSHOT_DIR", "./faiss_db/knowledge_graph")
+    KNOWLEDGE_GRAPH_MAX_USERS: int = int(os.getenv("KNOWLEDGE_GRAPH_MAX_USERS", 1000)) # Graphes en mémoire (LRU)
+    KNOWLEDGE_GRAPH_MAX_KEYWORDS: int = int(os.getenv("KNOWLEDGE_GRAPH_MAX_KEYWORDS", 1000)) # Par utilisateur (LRU)
+    KNOWLEDGE_GRAPH_MAX_ENTRIES: int = int(os.getenv("KNOWLEDGE_GRAPH_MAX_ENTRIES", 2000)) # Par utilisateur
+    KNOWLEDGE_GRAPH_SNAPSHOT_INTERVAL: float = float(os.getenv("KNOWLEDGE_GRAPH_SNAPSHOT_INTERVAL", 300)) # Secondes
+    # Détection d'intention agentique
+    INTENT_PATTERNS_FILE: str = os.getenv("INTENT_PATTERNS_FILE") # JSON {intention: {keywords, patterns, examples}}
+    INTENT_EMBEDDING_ENABLED: bool = os.getenv("INTENT_EMBEDDING_ENABLED", "false").lower() == "true"
+    INTENT_EMBEDDING_MIN_SIMILARITY: float = float(os.getenv("INTENT_EMBEDDING_MIN_SIMILARITY", 0.6))
+
+    # LLM - Limites de débit par modèle (recalées ensuite via les headers x-ratelimit-* de Groq)
+    LLM_DEFAULT_RPM: int = int(os.getenv("LLM_DEFAULT_RPM", 30)) # Requêtes par minute
+    LLM_DEFAULT_TPM: int = int(os.getenv("LLM_DEFAULT_TPM", 6000)) # Tokens par minute
+    LLM_MAX_TOKENS: int = int(os.getenv("LLM_MAX_TOKENS", 2000)) # Tokens max générés par réponse
+    # Échéances (secondes) d'attente d'un créneau selon la voie de priorité
+    LLM_DEADLINE_INTERACTIVE: float = float(os.getenv("LLM_DEADLINE_INTERACTIVE", 8))
+    LLM_DEADLINE_AGENTIC: float = float(os.getenv("LLM_DEADLINE_AGENTIC", 20))
+    LLM_DEADLINE_BACKGROUND: float = float(os.getenv("LLM_DEADLINE_BACKGROUND", 120))
+    # SLO de latence p95 (secondes) utilisés par le routage des modèles
+    LLM_SLO_INTERACTIVE: float = float(os.getenv("LLM_SLO_INTERACTIVE", 5))
+    LLM_SLO_AGENTIC: float = float(os.getenv("LLM_SLO_AGENTIC", 15))
+    LLM_SLO_BACKGROUND: float = float(os.getenv("LLM_SLO_BACKGROUND", 60))
+    # Résilience : timeout par appel, disjoncteurs par modèle et hedging
+    LLM_REQUEST_TIMEOUT: float = float(os.getenv("LLM_REQUEST_TIMEOUT", 30))
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", 3)) # Échecs consécutifs avant ouverture
+    LLM_BREAKER_RECOVERY: float = float(os.getenv("LLM_BREAKER_RECOVERY", 30)) # Secondes avant requête de test
+    LLM_HEDGING_ENABLED: bool = os.getenv("LLM_HEDGING_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_MAX_RATIO: float = float(os.getenv("LLM_HEDGE_MAX_RATIO", 0.1)) # Au plus ~10% de requêtes doublées
+    # RAG - Budget de tokens du prompt (instructions + sources + historique)
+    RAG_PROMPT_TOKEN_BUDGET: int = int(os.getenv("RAG_PROMPT_TOKEN_BUDGET", 6000))
+    RAG_HISTORY_SHARE: float = float(os.getenv("RAG_HISTORY_SHARE", 0.35))
+    # Exécuteurs bornés : I/O Firestore synchrones et calcul embeddings/FAISS
+    IO_EXECUTOR_WORKERS: int = int(os.getenv("IO_EXECUTOR_WORKERS", 16))
+    IO_EXECUTOR_MAX_PENDING: int = int(os.getenv("IO_EXECUTOR_MAX_PENDING", 256))
+    CPU_EXECUTOR_WORKERS: int = int(os.getenv("CPU_EXECUTOR_WORKERS", 2))
+    CPU_EXECUTOR_MAX_PENDING: int = int(os.getenv("CPU_EXECUTOR_MAX_PENDING", 64))
+    # bcrypt : pool dédié (bcrypt libère le GIL) et délai max en file avant rejet 503
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 5))
+
     # App
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     
@@ -37,5 +37,4 @@ def get_users_ref():
         users_ref = db.collection('users')
     return users_ref
 
-db = get_db()
-users_ref = get_users_ref()
\ No newline at end of file
+# Pas de connexion à l'import : le client est créé au premier accès (voir repositories/)
\ No newline at end of file
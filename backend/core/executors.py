@@ -0,0 +1,151 @@
+# core/executors.py
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from .config import settings
+
+
+class ExecutorSaturated(Exception):
+    """File d'attente pleine au-delà du délai accepté"""
+
+
+def _percentile_ms(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(int(pct * len(ordered)), len(ordered) - 1)] * 1000, 1)
+
+
+class BoundedExecutor:
+    """Pool de threads à file bornée : les appels bloquants ne tournent jamais sur la boucle asyncio"""
+
+    def __init__(self, name: str, max_workers: int, max_pending: int, queue_timeout: float = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout # None : attente illimitée ; sinon ExecutorSaturated
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots: Optional[asyncio.Semaphore] = None # Créé dans la boucle courante
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.durations = deque(maxlen=200)
+        self.queue_waits = deque(maxlen=200)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Exécute `func` dans le pool ; attend une place si la file est pleine (backpressure)"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_pending)
+        self.waiting += 1
+        queued_at = time.monotonic()
+        try:
+            if self.queue_timeout is None:
+                await self._slots.acquire()
+            else:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ExecutorSaturated(f"{self.name}: file saturée ({self.waiting} en attente)")
+        finally:
+            self.waiting -= 1
+
+        def _timed():
+            # Mesures prises dans le thread : attente totale (file + pool) puis exécution seule
+            begun = time.monotonic()
+            self.queue_waits.append(begun - queued_at)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.durations.append(time.monotonic() - begun)
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, _timed)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "p50_ms": _percentile_ms(self.durations, 0.50),
+            "p95_ms": _percentile_ms(self.durations, 0.95),
+            "queue_wait_p95_ms": _percentile_ms(self.queue_waits, 0.95),
+        }
+
+
+class LoopLagMonitor:
+    """Mesure le retard de la boucle asyncio (un appel bloquant se voit immédiatement ici)"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.samples = deque(maxlen=240) # ~2 minutes d'historique
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - expected, 0.0)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > 0.2:
+                print(f"⚠️ Boucle asyncio bloquée {lag * 1000:.0f} ms")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "current_ms": round(self.samples[-1] * 1000, 1) if self.samples else None,
+            "p95_ms": _percentile_ms(self.samples, 0.95),
+            "max_ms": round(self.max_lag * 1000, 1),
+            "samples": len(self.samples),
+        }
+
+
+# Instances globales : I/O Firestore d'un côté, embeddings/FAISS (CPU) de l'autre
+io_executor = BoundedExecutor("firestore-io", settings.IO_EXECUTOR_WORKERS, settings.IO_EXECUTOR_MAX_PENDING)
+cpu_executor = BoundedExecutor("embedding-cpu", settings.CPU_EXECUTOR_WORKERS, settings.CPU_EXECUTOR_MAX_PENDING)
+# bcrypt : quelques workers seulement, et rejet (503) plutôt qu'une file sans fin lors d'un pic de connexions
+password_executor = BoundedExecutor(
+    "password-hash", settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT
+)
+loop_monitor = LoopLagMonitor()
+
+
+async def run_io(func: Callable, *args, **kwargs):
+    """Appel Firestore (ou autre I/O synchrone) hors de la boucle"""
+    return await io_executor.run(func, *args, **kwargs)
+
+
+async def run_cpu(func: Callable, *args, **kwargs):
+    """Calcul d'embeddings / recherche FAISS hors de la boucle"""
+    return await cpu_executor.run(func, *args, **kwargs)
+
+
+async def run_password(func: Callable, *args, **kwargs):
+    """Hashage / vérification bcrypt hors de la boucle (lève ExecutorSaturated si la file déborde)"""
+    return await password_executor.run(func, *args, **kwargs)
@@ -0,0 +1,75 @@
+# core/http_client.py
+import asyncio
+from collections import defaultdict
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import httpx
+from .config import settings
+
+try:
+    import h2 # noqa: F401 - requis par httpx pour HTTP/2 (optionnel : HTTP/1.1 sinon)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class SharedHttpClient:
+    """Client HTTP unique pour la durée de l'application : pool de connexions keep-alive (DNS et TLS
+    faits une fois par hôte), HTTP/2 si disponible, connexions simultanées limitées par hôte"""
+
+    def __init__(self):
+        self.timeout = httpx.Timeout(
+            connect=settings.HTTP_CONNECT_TIMEOUT, read=settings.HTTP_READ_TIMEOUT,
+            write=settings.HTTP_WRITE_TIMEOUT, pool=settings.HTTP_POOL_TIMEOUT,
+        )
+        self.limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.max_per_host = settings.HTTP_MAX_CONNECTIONS_PER_HOST # httpx ne limite que le total
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.max_per_host))
+        self.stats = {"requests": 0, "errors": 0}
+
+    def start(self):
+        """Crée le client (appelé depuis le lifespan, ou à la première requête)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout, limits=self.limits, http2=HTTP2_AVAILABLE, follow_redirects=True
+            )
+            if not HTTP2_AVAILABLE:
+                print("⚠️ Paquet h2 absent : client HTTP en HTTP/1.1")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        self.start()
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Requête sur le client partagé, dans la limite de connexions de l'hôte"""
+        async with self._host_slots[urlparse(url).netloc]:
+            self.stats["requests"] += 1
+            try:
+                return await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                self.stats["errors"] += 1
+                raise
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats, "http2": HTTP2_AVAILABLE, "open": self._client is not None,
+            "hosts": len(self._host_slots), "max_per_host": self.max_per_host,
+        }
+
+
+# Instance globale
+http_client = SharedHttpClient()
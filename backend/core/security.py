@@ -1,15 +1,22 @@
 # core/security.py
 import os
 from datetime import datetime, timedelta
-from functools import lru_cache # pour Cache des Utilisateurs
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer # OAuth2PasswordBearer : Schéma d'authentification OAuth2 pour FastAPI
 from jose import JWTError, jwt #  Librairie pour JWT (JSON Web Tokens)
-from .database import users_ref
 from .config import settings
+from .cache import TTLCache, invalidation_bus
+from repositories import repos
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
-user_cache = {} # Cache mémoire pour les données utilisateur
+# Cache mémoire des utilisateurs (LRU + TTL, absences mises en cache plus brièvement)
+user_cache = TTLCache(
+    "users",
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl=settings.USER_CACHE_TTL,
+    negative_ttl=settings.USER_CACHE_NEGATIVE_TTL,
+)
+invalidation_bus.subscribe("users", user_cache.invalidate) # Invalidations venant de ce worker ou des autres
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str: # Création des Tokens JWT : Access Token (court terme)
     to_encode = data.copy()
@@ -29,21 +36,13 @@ def create_refresh_token(data: dict) -> str: # Création des Tokens JWT : Refres
 
 
 #  Cache des Utilisateurs
-# @lru_cache(maxsize=128) # Garde les 128 users les plus récents
-def get_user_from_cache(user_id: str): 
-    # if user_id in user_cache:
-    #     user_data, timestamp = user_cache[user_id]
-    #     if (datetime.now() - timestamp).total_seconds() < 300: # 5 minutes (300 secondes) dans le cache
-    #         return user_data
-    
-    user_doc = users_ref.document(user_id).get() #  Si pas en cache, va chercher dans Firebase
-    if not user_doc.exists:
+async def get_user_from_cache(user_id: str): 
+    # Si pas en cache, va chercher dans la base (une seule lecture pour les requêtes simultanées)
+    user_data = await user_cache.get_or_load(user_id, lambda: repos.users.get(user_id))
+    if not user_data:
         return None
     
-    user_data = user_doc.to_dict()
-    user_data["id"] = user_id
-    # user_cache[user_id] = (user_data, datetime.now())
-    return user_data
+    return dict(user_data) # Copie : l'appelant peut modifier sans toucher au cache
 
 # Vérification de l'Utilisateur Courant
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -64,7 +63,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
 
-    user_data = get_user_from_cache(user_id)
+    user_data = await get_user_from_cache(user_id)
     if not user_data:
         raise credentials_exception
 
@@ -88,7 +87,7 @@ async def refresh_access_token(refresh_token: str):
     except JWTError:
         raise credentials_exception
 
-    user_data = get_user_from_cache(user_id)
+    user_data = await get_user_from_cache(user_id)
     if not user_data:
         raise credentials_exception
 
@@ -101,7 +100,7 @@ async def refresh_access_token(refresh_token: str):
     }
 
 def invalidate_user_cache(user_id: str): # Utilisé quand un user est modifié/supprimé
-    """Invalide le cache pour un utilisateur spécifique"""
-    # if user_id in user_cache:
-    #     del user_cache[user_id]
+    """Invalide le cache pour un utilisateur spécifique (ce worker et les autres via le bus)"""
+    user_cache.invalidate(user_id)
+    invalidation_bus.publish("users", user_id, local=False) # Entrée locale déjà retirée
     print(f"✅ Cache invalidé pour l'utilisateur: {user_id}")
\ No newline at end of file
@@ -0,0 +1,76 @@
+# core/tokenizer.py
+from functools import lru_cache
+from typing import Dict, List
+
+try:
+    import tiktoken # tiktoken : Tokenizer BPE (optionnel, estimation par caractères sinon)
+except ImportError:
+    tiktoken = None
+
+# Encodage le plus proche du tokenizer de chaque famille de modèles
+# (Llama 3/4, Qwen et Gemma utilisent des BPE de ~100-150k entrées proches de cl100k)
+MODEL_ENCODINGS = {
+    "openai/gpt-oss-20b": "o200k_base",
+}
+DEFAULT_ENCODING = "cl100k_base"
+MESSAGE_OVERHEAD = 4 # Tokens de balisage par message (rôle, séparateurs)
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"⚠️ Encodage {name} indisponible, estimation approximative: {e}")
+        return None
+
+
+def _encoding_for(model: str = None):
+    return _get_encoding(MODEL_ENCODINGS.get(model, DEFAULT_ENCODING))
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """Nombre de tokens d'un texte pour le modèle cible"""
+    if not text:
+        return 0
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return len(text) // 3 + 1 # Estimation prudente pour du texte français
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict], model: str = None) -> int:
+    """Nombre de tokens d'une liste de messages chat"""
+    return sum(count_tokens(msg.get("content", ""), model) + MESSAGE_OVERHEAD for msg in messages) + 2
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = None) -> str:
+    """Tronque un texte à `max_tokens` tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return text[:max_tokens * 3]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def compress_to_tokens(text: str, max_tokens: int, model: str = None, marker: str = "\n[…]\n") -> str:
+    """Garde le début et la fin d'un texte trop long (utile pour le code et les réponses longues)"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(marker, model)
+    if budget <= 0:
+        return truncate_to_tokens(text, max_tokens, model)
+    head_budget = budget * 2 // 3
+    tail_budget = budget - head_budget
+
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return text[:head_budget * 3] + marker + text[-tail_budget * 3:]
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:head_budget]) + marker + encoding.decode(tokens[-tail_budget:])
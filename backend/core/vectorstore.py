@@ -1,7 +1,8 @@
 # core/vectorstore.py
 import os
 import pickle
-from typing import List
+import threading
+from typing import Iterable, List
 from datetime import datetime
 import faiss
 import numpy as np
@@ -16,6 +17,15 @@ from langchain.docstore.in_memory import InMemoryDocstore
 # Path config
 DEFAULT_PERSIST_DIR = "./faiss_db"
 
+
+def knowledge_vector_key(knowledge_id: str, revision: int = 0) -> str:
+    """Clé des vecteurs d'une connaissance (tombstones) : change quand sa réponse est remplacée"""
+    return f"{knowledge_id}#{revision}" if revision else knowledge_id
+
+
+def _vector_key(metadata: dict):
+    return metadata.get("vector_key") or metadata.get("knowledge_id")
+
 class VectorStoreManager:
     def __init__(self, persist_directory: str = None):
         self.persist_directory = persist_directory or DEFAULT_PERSIST_DIR
@@ -23,6 +33,9 @@ class VectorStoreManager:
         self.text_splitter = None
         self.vectorstore = None
         self._initialized = False
+        self.tombstones = set() # Clés de connaissances retirées (knowledge_vector_key) : ignorées à la recherche jusqu'au compactage
+        self.compact_ratio = 0.2 # Part de vecteurs retirés déclenchant une reconstruction de l'index
+        self._lock = threading.Lock() # Ajouts et compactage depuis les threads CPU
 
     def _init_embeddings_and_splitter(self):
         if self.embeddings is None:
@@ -74,6 +87,14 @@ class VectorStoreManager:
         else:
             self.vectorstore = self._create_new_vectorstore()
 
+        tombstones_path = os.path.join(self.persist_directory, "tombstones.pkl")
+        if os.path.exists(tombstones_path):
+            try:
+                with open(tombstones_path, "rb") as f:
+                    self.tombstones = pickle.load(f)
+            except Exception as e:
+                print(f"⚠️ Tombstones FAISS illisibles: {e}")
+
         self._initialized = True
 
     def _create_new_vectorstore(self):
@@ -115,6 +136,7 @@ class VectorStoreManager:
             with open(tmp_meta, "wb") as f:
                 pickle.dump(metadatas, f)
             os.replace(tmp_meta, final_meta)
+            self._save_tombstones()
 
             print("✅ Vector store sauvegardé (atomique)")
         except Exception as e:
@@ -129,17 +151,83 @@ class VectorStoreManager:
                 doc.metadata["user_id"] = user_id
         texts = self.text_splitter.split_documents(documents) if self.text_splitter else documents
         if texts:
-            self.vectorstore.add_documents(texts)
-            self.save_vectorstore()
+            with self._lock:
+                self.vectorstore.add_documents(texts)
+                self.save_vectorstore()
             return len(texts)
         return 0
 
+    def _save_tombstones(self):
+        tmp_path = os.path.join(self.persist_directory, "tombstones.pkl.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.tombstones, f)
+        os.replace(tmp_path, os.path.join(self.persist_directory, "tombstones.pkl"))
+
+    def tombstone(self, vector_keys: Iterable[str]) -> int:
+        """Retire des connaissances (ou une ancienne révision) de la recherche ; compactage de l'index
+        au-delà de `compact_ratio`"""
+        vector_keys = set(vector_keys) - self.tombstones
+        if not vector_keys or not self.vectorstore:
+            return 0
+        with self._lock:
+            self.tombstones |= vector_keys
+            total = len(self.vectorstore.index_to_docstore_id)
+            if total and len(self.tombstones) / total >= self.compact_ratio:
+                self._compact()
+            else:
+                self._save_tombstones()
+        return len(vector_keys)
+
+    def _compact(self):
+        """Reconstruit l'index plat sans les vecteurs retirés (sous verrou)"""
+        index = self.vectorstore.index
+        kept_positions, kept_docs = [], []
+        for position, doc_id in sorted(self.vectorstore.index_to_docstore_id.items()):
+            doc = self.vectorstore.docstore.search(doc_id)
+            if _vector_key(getattr(doc, "metadata", {})) not in self.tombstones:
+                kept_positions.append(position)
+                kept_docs.append(doc)
+        vectors = index.reconstruct_n(0, index.ntotal)[kept_positions]
+        new_index = faiss.index_factory(index.d, "Flat", index.metric_type) # Même métrique
+        new_index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        self.vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=new_index,
+            docstore=InMemoryDocstore({str(i): doc for i, doc in enumerate(kept_docs)}),
+            index_to_docstore_id={i: str(i) for i in range(len(kept_docs))}
+        )
+        removed = index.ntotal - new_index.ntotal
+        self.tombstones = set()
+        self.save_vectorstore()
+        print(f"🧹 Index FAISS compacté ({removed} vecteurs retirés, {new_index.ntotal} restants)")
+
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embedding d'une requête (calculé une fois, réutilisable par plusieurs recherches)"""
+        self._init_embeddings_and_splitter()
+        return self.embeddings.embed_query(query)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de plusieurs textes en un seul appel au modèle"""
+        self._init_embeddings_and_splitter()
+        return self.embeddings.embed_documents(texts)
 
     def search_similar(self, query: str, k: int = 4, user_id: str = None, filters: dict = None):
         """Recherche - essayer appliquer filters si le vectorstore les supporte"""
         try:
-            # Utiliser l'API similarity_search native
-            results = self.vectorstore.similarity_search(query, k=k)
+            return self.search_by_vector(self.embed_query(query), k=k, user_id=user_id)
+        except Exception as e:
+            print(f"❌ Erreur recherche FAISS: {e}")
+            return []
+
+    def search_by_vector(self, embedding: List[float], k: int = 4, user_id: str = None):
+        """Recherche à partir d'un embedding déjà calculé"""
+        try:
+            # Utiliser l'API similarity_search native (marge pour les connaissances retirées)
+            fetch_k = k + min(len(self.tombstones), 4 * k)
+            results = self.vectorstore.similarity_search_by_vector(embedding, k=fetch_k)
+            if self.tombstones:
+                results = [doc for doc in results if _vector_key(doc.metadata) not in self.tombstones]
             if user_id:
                 filtered = [doc for doc in results if doc.metadata.get("user_id") == user_id]
                 if len(filtered) < k:
@@ -156,7 +244,8 @@ class VectorStoreManager:
     def get_stats(self):
         try:
             total_docs = len(self.vectorstore.index_to_docstore_id) if self.vectorstore else 0
-            return {"total_documents": total_docs, "index_type": "FAISS", "embedding_model": "all-MiniLM-L6-v2"}
+            return {"total_documents": total_docs, "index_type": "FAISS", "embedding_model": "all-MiniLM-L6-v2",
+                    "tombstones": len(self.tombstones)}
         except Exception:
             return {"error": "Impossible de récupérer stats"}
 
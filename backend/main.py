@@ -4,7 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware #Gère les requêtes cross-or
 from contextlib import asynccontextmanager # Gestionnaire de cycle de vie de l'application
 import logging # Système de journalisation
 from core.config import settings
-from core.database import init_firebase, get_db
+from repositories import repos
 from routes.auth import router as auth_router
 from routes.chat import router as chat_router
 from routes.users import router as users_router
@@ -13,6 +13,13 @@ from routes.diagnostics import router as diagnostics_router
 from routes.agentic import router as agentic_router
 from routes.knowledge import router as knowledge
 from core.vectorstore import vector_store
+from services.community_knowledge import community_knowledge
+from services.knowledge_management import knowledge_manager
+from services.knowledge_retention import knowledge_retention
+from services.knowledge_usage import knowledge_usage
+from core.background import background_tasks
+from core.executors import loop_monitor, io_executor, cpu_executor, password_executor
+from core.http_client import http_client
 
 
 # Configuration du logging
@@ -24,17 +31,18 @@ async def lifespan(app: FastAPI):
     # Démarrage - Initialisation
     logger.info("Démarrage de l'application Assistant IA...")
     try:
-        # init_firebase()
-        get_db()
-        logger.info("✅ Firebase initialisé avec succès")
+        # Connexion au backend de données (Firestore en production, mémoire en benchmark)
+        repos.connect()
+        logger.info(f"✅ Base de données initialisée ({repos.backend})")
     except Exception as e:
-        logger.error(f"❌ Erreur initialisation Firebase: {e}")
+        logger.error(f"❌ Erreur initialisation base de données: {e}")
         raise
     
     try:
         # Init vectorstore lazy
         vector_store.init_vectorstore()
         logger.info("✅ VectorStore initialisé")
+        community_knowledge.init()
 
         
         logger.info("✅ Service de recherche web initialisé")
@@ -42,14 +50,47 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Erreur init VectorStore: {e}")
         # Ne pas crasher totalement si vectorstore fail, mais avertir
+
+    # Client HTTP partagé (recherche web) : connexions réutilisées pendant toute la vie de l'application
+    http_client.start()
+
+    # File de tâches de fond (sauvegarde des conversations, apprentissage)
+    background_tasks.start()
+    logger.info("✅ File de tâches de fond démarrée")
+    knowledge_manager.learning_pipeline.start()
+    if not community_knowledge.size:
+        # Première exécution : promotion des connaissances existantes à forte valeur
+        background_tasks.submit(community_knowledge.backfill, key="community_knowledge")
+    # Surveillance du retard de la boucle asyncio (appels bloquants)
+    loop_monitor.start()
+    # Instantanés périodiques des graphes de connaissances
+    knowledge_manager.knowledge_graph.start()
+    # Utilisations des connaissances écrites par lots
+    knowledge_usage.start()
+    # Balayage périodique de rétention (TTL, atténuation) des connaissances
+    knowledge_retention.start()
     yield
     logger.info("Arrêt de l'application...")
+    # Terminer les sauvegardes en attente avant de fermer : d'abord les tâches de fond (la persistance
+    # des tours alimente l'apprentissage), puis le pipeline, puis les promotions qu'il a planifiées
+    await background_tasks.shutdown()
+    await knowledge_manager.learning_pipeline.stop()
+    await background_tasks.shutdown()
+    await loop_monitor.stop()
+    await knowledge_retention.stop()
+    await knowledge_usage.stop()
+    await http_client.close()
+    await knowledge_manager.knowledge_graph.stop()
     # possibilité de save on shutdown
     try:
         vector_store.save_vectorstore()
+        community_knowledge.save()
         
     except:
         pass
+    io_executor.shutdown()
+    cpu_executor.shutdown()
+    password_executor.shutdown()
 
 app = FastAPI(
     title="Assistant IA Agentique API",
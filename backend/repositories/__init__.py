@@ -0,0 +1,30 @@
+# repositories/__init__.py
+from core.config import settings
+from .base import (
+    UserRepository, ConversationRepository, KnowledgeRepository, AgenticActionRepository, Repositories
+)
+
+
+def create_repositories(backend: str = None) -> Repositories:
+    """Dépôts du backend choisi par DATA_BACKEND : "firestore" (production) ou "memory" (tests, benchmarks)"""
+    backend = (backend or settings.DATA_BACKEND).lower()
+    if backend == "memory":
+        from .memory_repository import create_memory_repositories
+        repositories = create_memory_repositories(latency=settings.MEMORY_BACKEND_LATENCY_MS / 1000)
+    elif backend == "firestore":
+        from .firestore_repository import create_firestore_repositories
+        repositories = create_firestore_repositories()
+    else:
+        raise ValueError(f"DATA_BACKEND inconnu: {backend}")
+
+    if settings.CONVERSATION_CACHE_SIZE > 0:
+        from .cached_repository import CachedConversationRepository
+        repositories.conversations = CachedConversationRepository(
+            repositories.conversations, settings.CONVERSATION_CACHE_SIZE, settings.CONVERSATION_CACHE_TTL,
+            settings.CONVERSATION_CACHE_FRESHNESS
+        )
+    return repositories
+
+
+# Instance globale (aucune connexion à l'import : voir Repositories.connect)
+repos = create_repositories()
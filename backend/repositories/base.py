@@ -0,0 +1,342 @@
+# repositories/base.py
+import base64
+import json
+from datetime import datetime
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+from core.config import settings
+
+# Les implémentations (Firestore, mémoire) respectent la même sémantique de requête :
+# - un document sans le champ filtré/trié est exclu du résultat (comme Firestore) ;
+# - les dictionnaires retournés sont des copies (modifier le résultat ne touche pas la base).
+
+
+# Conversations : document léger (titre, dates, `message_count`, `tail` = derniers messages sans
+# métadonnées) + messages complets dans la sous-collection `messages` (ID = numéro de séquence).
+# Les anciens documents avec un tableau `messages` restent lisibles : ce tableau compte comme
+# les premiers messages, la suite va dans la sous-collection.
+
+def message_doc_id(seq: int) -> str:
+    return f"{seq:08d}" # Tri lexicographique = ordre d'envoi
+
+
+def tail_entry(message: Dict) -> Dict:
+    return {key: message.get(key) for key in ("role", "content", "timestamp")}
+
+
+def conversation_tail(conversation: Dict) -> List[Dict]:
+    """Derniers messages d'une conversation (document léger ou ancien format)"""
+    if "tail" in conversation:
+        return conversation["tail"]
+    legacy = conversation.get("messages", [])
+    return [tail_entry(message) for message in legacy[-settings.CONVERSATION_TAIL_SIZE:]]
+
+
+def message_count(conversation: Dict) -> int:
+    if "message_count" in conversation:
+        return conversation["message_count"]
+    return len(conversation.get("messages", []))
+
+
+def unsummarized_tail(conversation: Dict) -> List[Dict]:
+    """Messages du tail pas encore intégrés au résumé (`summary_upto` = nb de messages résumés)"""
+    tail = conversation_tail(conversation)
+    first_seq = message_count(conversation) - len(tail)
+    return tail[max(conversation.get("summary_upto", 0) - first_seq, 0):]
+
+
+def append_to_conversation(conversation: Dict, messages: List[Dict]) -> Dict:
+    """Champs du document léger après ajout de `messages` (à écrire avec les messages)"""
+    tail = conversation_tail(conversation) + [tail_entry(message) for message in messages]
+    return {
+        "tail": tail[-settings.CONVERSATION_TAIL_SIZE:],
+        "message_count": message_count(conversation) + len(messages),
+        "version": conversation.get("version", 0) + 1, # Incrémenté à chaque écriture (détection des caches périmés)
+    }
+
+
+# Liste des conversations : projection légère, paginée par curseur sur `updated_at`
+CONVERSATION_SUMMARY_FIELDS = ("id", "title", "updated_at", "message_count")
+
+
+def conversation_summary(conversation: Dict) -> Dict:
+    summary = {field: conversation.get(field) for field in CONVERSATION_SUMMARY_FIELDS}
+    if summary["message_count"] is None and "messages" in conversation:
+        summary["message_count"] = len(conversation["messages"]) # Ancien format
+    return summary
+
+
+def encode_cursor(updated_at: str, conversation_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([updated_at, conversation_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Curseur opaque -> (`updated_at`, id) du dernier élément de la page précédente (ValueError si invalide)"""
+    try:
+        updated_at, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise ValueError("Curseur invalide")
+    if not isinstance(updated_at, str) or not isinstance(conversation_id, str) or not conversation_id:
+        raise ValueError("Curseur invalide")
+    return updated_at, conversation_id
+
+
+# Connaissances : index inversé par utilisateur (sous-collection `knowledge_index`, un document par
+# mot-clé : {"postings": {entry_id: value_score}}), seaux LSH des quasi-doublons (`knowledge_lsh`, un
+# document par seau : {"entries": [entry_id]}) et documents techniques dans `knowledge_meta`.
+
+def keyword_doc_id(keyword: str) -> str:
+    # Firestore réserve les IDs de la forme __xxx__
+    return f"kw{keyword}" if keyword.startswith("__") and keyword.endswith("__") else keyword
+
+
+# Statistiques agrégées (`knowledge_meta/stats`), incrémentées dans la même écriture que l'entrée.
+# `initialized` n'est posé qu'après un comptage complet : sans lui, les compteurs sont partiels.
+# `seq` ne fait que croître (+1 par ajout ou suppression) : il date les instantanés du graphe.
+HIGH_VALUE_SCORE = 0.7
+
+
+def knowledge_stats_delta(entry: Dict, sign: int = 1) -> Dict:
+    """Variation des compteurs pour l'ajout (+1) ou la suppression (-1) d'une entrée"""
+    score = entry.get('value_score', 0.0) or 0.0
+    return {
+        'count': sign,
+        'seq': 1,
+        'high_value_count': sign if score >= HIGH_VALUE_SCORE else 0,
+        'score_sum': sign * score,
+        'by_type': {entry.get('interaction_type') or 'unknown': sign},
+    }
+
+
+def _sum_stats_deltas(deltas: List[Dict]) -> Dict:
+    stats = {'count': 0, 'seq': 0, 'high_value_count': 0, 'score_sum': 0.0, 'by_type': {}}
+    for delta in deltas:
+        stats['count'] += delta['count']
+        stats['seq'] += delta['seq']
+        stats['high_value_count'] += delta['high_value_count']
+        stats['score_sum'] += delta['score_sum']
+        for interaction_type, count in delta['by_type'].items():
+            stats['by_type'][interaction_type] = stats['by_type'].get(interaction_type, 0) + count
+    return stats
+
+
+def knowledge_stats_batch_delta(entries: List[Dict], sign: int = 1) -> Dict:
+    """Somme des variations pour un lot d'entrées (une seule écriture des compteurs)"""
+    return _sum_stats_deltas([knowledge_stats_delta(entry, sign) for entry in entries])
+
+
+def knowledge_stats_change(old: Dict, new: Dict) -> Dict:
+    """Variation des compteurs quand une entrée est remplacée par une nouvelle version"""
+    # Même entrée : `seq` inchangé (le graphe n'a rien à intégrer)
+    return {**_sum_stats_deltas([knowledge_stats_delta(old, -1), knowledge_stats_delta(new)]), 'seq': 0}
+
+
+def knowledge_stats_from_entries(entries: List[Dict], current: Optional[Dict] = None) -> Dict:
+    """Compteurs recalculés par un parcours complet (utilisateurs antérieurs aux compteurs) ;
+    `seq` repart du document partiel `current` pour rester croissant"""
+    stats = {**knowledge_stats_batch_delta(entries), 'initialized': True}
+    stats['seq'] += (current or {}).get('seq', 0)
+    return stats
+
+
+class UserRepository(ABC):
+    """Collection `users`"""
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[Dict]:
+        """Utilisateur (avec son `id`) ou None"""
+
+    @abstractmethod
+    async def find_by_email(self, email: str) -> Optional[Dict]:
+        """Premier utilisateur ayant cet email, ou None"""
+
+    @abstractmethod
+    async def create(self, user_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    async def update(self, user_id: str, data: Dict):
+        """Mise à jour partielle (échoue si l'utilisateur n'existe pas)"""
+
+    @abstractmethod
+    async def delete(self, user_id: str):
+        ...
+
+
+class ConversationRepository(ABC):
+    """Sous-collection `users/{user_id}/conversations`"""
+
+    @abstractmethod
+    def new_id(self, user_id: str) -> str:
+        """Nouvel ID de conversation, généré localement (sans aller-retour réseau)"""
+
+    @abstractmethod
+    async def get(self, user_id: str, conversation_id: str) -> Optional[Dict]:
+        """Document léger (avec `tail`), une seule lecture quelle que soit la longueur"""
+
+    @abstractmethod
+    async def get_version(self, user_id: str, conversation_id: str) -> Optional[int]:
+        """Seul champ `version` du document (lecture projetée) ; None si la conversation n'existe pas"""
+
+    @abstractmethod
+    async def get_messages(self, user_id: str, conversation_id: str, limit: int = None) -> List[Dict]:
+        """Messages complets dans l'ordre (les `limit` derniers si précisé)"""
+
+    @abstractmethod
+    async def create(self, user_id: str, conversation_id: str, data: Dict, messages: List[Dict]) -> Dict:
+        """Crée le document léger et ses premiers messages en une écriture groupée ; retourne le document"""
+
+    @abstractmethod
+    async def append_messages(self, user_id: str, conversation_id: str, messages: List[Dict], updated_at: str) -> Dict:
+        """Ajoute des messages à la sous-collection ; retourne les champs mis à jour (`tail`, `version`...)"""
+
+    @abstractmethod
+    async def update_conversation(self, user_id: str, conversation_id: str, fields: Dict) -> Dict:
+        """Met à jour des champs du document léger (résumé...) ; retourne les champs écrits, `version` comprise"""
+
+    @abstractmethod
+    async def add_turn_vectors(self, user_id: str, conversation_id: str, entries: List[Dict]):
+        """Ajoute des entrées à l'index vectoriel de la conversation (sous-collection `turn_vectors`, ID = `seq`)"""
+
+    @abstractmethod
+    async def get_turn_vectors(self, user_id: str, conversation_id: str) -> List[Dict]:
+        """Entrées de l'index vectoriel de la conversation, par `seq` croissant"""
+
+    @abstractmethod
+    async def list_page(self, user_id: str, limit: int, before: Tuple[str, str] = None,
+                        since: str = None) -> Tuple[List[Dict], bool]:
+        """Résumés (CONVERSATION_SUMMARY_FIELDS) par (`updated_at`, id) décroissants, strictement après le
+        curseur `before` = (updated_at, id) et modifiés après `since` ; retourne (page, il_en_reste)"""
+
+    @abstractmethod
+    async def list_deleted_since(self, user_id: str, since: str) -> List[str]:
+        """IDs des conversations supprimées après `since` (synchronisation incrémentale des clients)"""
+
+    @abstractmethod
+    async def delete(self, user_id: str, conversation_id: str) -> bool:
+        """Supprime la conversation, ses messages et son index (en laissant une trace datée) ; False si elle n'existait pas"""
+
+    @abstractmethod
+    async def delete_all(self, user_id: str):
+        ...
+
+
+class KnowledgeRepository(ABC):
+    """Sous-collection `users/{user_id}/knowledge`"""
+
+    @abstractmethod
+    async def add(self, user_id: str, entry_id: str, entry: Dict):
+        """Enregistre l'entrée et incrémente les statistiques agrégées ; `timestamp` est fixé par le serveur"""
+
+    @abstractmethod
+    async def add_many(self, entries: List[Tuple[str, str, Dict]]):
+        """Enregistre des entrées (user_id, entry_id, entry) de plusieurs utilisateurs en écritures groupées,
+        compteurs agrégés inclus (une mise à jour par utilisateur)"""
+
+    @abstractmethod
+    async def merge_duplicate(self, user_id: str, entry_id: str, replacement: Dict = None, count: int = 1) -> Optional[Dict]:
+        """Quasi-doublon(s) d'une entrée existante : `usage_count` + count, et champs de `replacement` appliqués
+        s'il a un meilleur value_score, avec `response_revision` + 1 (compteurs ajustés, atomique) ;
+        retourne l'entrée fusionnée, None si elle n'existe plus"""
+
+    @abstractmethod
+    async def update_entry(self, user_id: str, entry_id: str, fields: Dict) -> bool:
+        """Met à jour des champs d'une entrée et ajuste les compteurs (atomique) ; False si elle n'existe plus"""
+
+    @abstractmethod
+    async def record_usage(self, usage: Dict[str, Dict[str, Tuple[int, datetime]]]):
+        """{user_id: {entry_id: (utilisations, dernière utilisation)}} : incrémente `usage_count` et fixe
+        `last_used` des entrées existantes, en écritures groupées (les entrées supprimées sont ignorées)"""
+
+    @abstractmethod
+    async def delete(self, user_id: str, entry_id: str) -> bool:
+        """Supprime l'entrée et décrémente les statistiques (atomique) ; False si elle n'existait pas"""
+
+    @abstractmethod
+    async def find(self, user_id: str, min_score: float = None, predicate: Callable[[Dict], bool] = None,
+                   limit: int = None) -> List[Dict]:
+        """Parcourt les entrées (value_score >= min_score), arrêt dès `limit` entrées acceptées par `predicate`"""
+
+    @abstractmethod
+    async def get_many(self, user_id: str, entry_ids: List[str]) -> List[Dict]:
+        """Entrées demandées, dans l'ordre de `entry_ids` (les absentes sont ignorées)"""
+
+    @abstractmethod
+    async def add_postings(self, user_id: str, postings: Dict[str, Dict[str, float]]):
+        """Fusionne {mot-clé: {entry_id: value_score}} dans l'index inversé (écriture groupée)"""
+
+    @abstractmethod
+    async def get_postings(self, user_id: str, keywords: List[str]) -> Dict[str, Dict[str, float]]:
+        """Listes de l'index inversé pour ces mots-clés (vide si absent), en une lecture groupée"""
+
+    @abstractmethod
+    async def remove_postings(self, user_id: str, postings: Dict[str, List[str]]):
+        """Retire {mot-clé: [entry_id]} de l'index inversé (écriture groupée)"""
+
+    @abstractmethod
+    async def add_lsh_buckets(self, user_id: str, buckets: Dict[str, List[str]]):
+        """Ajoute des entry_id aux seaux LSH (détection des quasi-doublons), écriture groupée"""
+
+    @abstractmethod
+    async def get_lsh_buckets(self, user_id: str, bucket_keys: List[str]) -> Dict[str, List[str]]:
+        """entry_id de chaque seau LSH demandé (vide si absent), en une lecture groupée"""
+
+    @abstractmethod
+    async def remove_lsh_buckets(self, user_id: str, buckets: Dict[str, List[str]]):
+        """Retire des entry_id de leurs seaux LSH (écriture groupée)"""
+
+    @abstractmethod
+    async def get_meta(self, user_id: str, name: str) -> Optional[Dict]:
+        """Document technique `knowledge_meta/{name}` (état de l'index...)"""
+
+    @abstractmethod
+    async def set_meta(self, user_id: str, name: str, data: Dict):
+        ...
+
+    @abstractmethod
+    async def initialize_stats(self, user_id: str) -> Dict:
+        """Statistiques agrégées ; si `initialized` n'est pas posé, comptage complet écrit dans une transaction
+        qui relit le document (un incrément concurrent la fait rejouer au lieu d'être écrasé)"""
+
+    @abstractmethod
+    async def find_global(self, min_score: float, limit: int) -> List[Dict]:
+        """Entrées de tous les utilisateurs (collection group) avec value_score >= min_score"""
+
+    @abstractmethod
+    async def scan_global(self, cursor: Optional[str], limit: int) -> Tuple[List[Dict], Optional[str]]:
+        """Page d'entrées de tous les utilisateurs dans l'ordre des chemins, reprise après `cursor` ;
+        (entrées, curseur suivant) avec un curseur None en fin de parcours"""
+
+    @abstractmethod
+    async def list_recent(self, user_id: str, limit: int) -> List[Dict]:
+        """Entrées triées par `timestamp` décroissant"""
+
+
+class AgenticActionRepository(ABC):
+    """Sous-collection `users/{user_id}/agentic_actions`"""
+
+    @abstractmethod
+    async def add(self, user_id: str, action_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    async def list_recent(self, user_id: str, limit: int) -> List[Dict]:
+        """Actions triées par `timestamp` décroissant"""
+
+
+class Repositories:
+    """Regroupe les dépôts d'un même backend"""
+
+    def __init__(self, backend: str, users: UserRepository, conversations: ConversationRepository,
+                 knowledge: KnowledgeRepository, agentic_actions: AgenticActionRepository, connect: Callable = None):
+        self.backend = backend
+        self.users = users
+        self.conversations = conversations
+        self.knowledge = knowledge
+        self.agentic_actions = agentic_actions
+        self._connect = connect
+
+    def connect(self):
+        """Ouvre la connexion au backend (appelé au démarrage, jamais à l'import)"""
+        if self._connect:
+            self._connect()
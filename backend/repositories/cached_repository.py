@@ -0,0 +1,123 @@
+# repositories/cached_repository.py
+import copy
+from typing import Dict, List, Optional, Tuple
+from core.cache import TTLCache, invalidation_bus
+from .base import ConversationRepository
+
+_MISSING = object()
+
+
+class CachedConversationRepository(ConversationRepository):
+    """Cache write-through des documents de conversation (tail) : une conversation active ne relit plus la base.
+    Sans transport sur le bus, les écritures des autres workers ne sont pas diffusées : passé `freshness`
+    secondes, une copie n'est resservie qu'après relecture de sa `version` (lecture projetée, sans le tail)"""
+
+    channel = "conversations"
+
+    def __init__(self, inner: ConversationRepository, maxsize: int, ttl: float, freshness: float = 5.0):
+        self.inner = inner
+        self.cache = TTLCache("conversations", maxsize=maxsize, ttl=ttl, negative_ttl=min(ttl, 30.0))
+        self.fresh = TTLCache("conversations_fresh", maxsize=maxsize, ttl=freshness) # Copies confirmées récemment
+        self.stale_detected = 0
+        self.version_checks = 0
+        invalidation_bus.subscribe(self.channel, self._invalidate) # Écritures des autres workers
+
+    def _invalidate(self, key: str):
+        self.cache.invalidate(key)
+        self.fresh.invalidate(key)
+
+    @staticmethod
+    def _key(user_id: str, conversation_id: str) -> str:
+        return f"{user_id}/{conversation_id}"
+
+    def _publish(self, key: str):
+        # Les autres workers évincent leur copie ; la nôtre est déjà à jour
+        invalidation_bus.publish(self.channel, key, local=False)
+
+    def new_id(self, user_id: str) -> str:
+        return self.inner.new_id(user_id)
+
+    async def get(self, user_id: str, conversation_id: str) -> Optional[Dict]:
+        key = self._key(user_id, conversation_id)
+        cached = self.cache.peek(key, None)
+        if cached is not None and self.fresh.peek(key, None) is None:
+            # Copie plus ancienne que `freshness` : une autre écriture a pu nous échapper
+            self.version_checks += 1
+            version = await self.inner.get_version(user_id, conversation_id)
+            if self.cache.peek(key, None) is cached and version == cached.get("version", 0):
+                self.fresh.set(key, True)
+            else:
+                self.stale_detected += 1
+                self._invalidate(key)
+        conversation = await self.cache.get_or_load(key, lambda: self.inner.get(user_id, conversation_id))
+        if conversation is not None:
+            self.fresh.set(key, True) # Chargée ou confirmée à l'instant
+        return copy.deepcopy(conversation) if conversation is not None else None
+
+    async def get_version(self, user_id: str, conversation_id: str) -> Optional[int]:
+        return await self.inner.get_version(user_id, conversation_id)
+
+    async def get_messages(self, user_id: str, conversation_id: str, limit: int = None) -> List[Dict]:
+        return await self.inner.get_messages(user_id, conversation_id, limit)
+
+    async def create(self, user_id: str, conversation_id: str, data: Dict, messages: List[Dict]) -> Dict:
+        key = self._key(user_id, conversation_id)
+        conversation = await self.inner.create(user_id, conversation_id, data, messages)
+        self.cache.invalidate(key) # Annule un éventuel chargement en cours (absence périmée)
+        self.cache.set(key, copy.deepcopy(conversation))
+        self.fresh.set(key, True)
+        self._publish(key)
+        return conversation
+
+    async def append_messages(self, user_id: str, conversation_id: str, messages: List[Dict], updated_at: str) -> Dict:
+        changes = await self.inner.append_messages(user_id, conversation_id, messages, updated_at)
+        self._apply_changes(self._key(user_id, conversation_id), changes)
+        return changes
+
+    async def update_conversation(self, user_id: str, conversation_id: str, fields: Dict) -> Dict:
+        changes = await self.inner.update_conversation(user_id, conversation_id, fields)
+        self._apply_changes(self._key(user_id, conversation_id), changes)
+        return changes
+
+    def _apply_changes(self, key: str, changes: Dict):
+        cached = self.cache.peek(key, _MISSING)
+        if isinstance(cached, dict) and cached.get("version", 0) + 1 == changes.get("version"):
+            # Copie locale à jour : on applique l'écriture en place
+            cached.update(copy.deepcopy(changes))
+            self.fresh.set(key, True)
+        else:
+            # Version inattendue : une autre écriture nous a échappé, la copie est périmée
+            if cached is not _MISSING:
+                self.stale_detected += 1
+            self._invalidate(key)
+        self._publish(key)
+
+    async def add_turn_vectors(self, user_id: str, conversation_id: str, entries: List[Dict]):
+        await self.inner.add_turn_vectors(user_id, conversation_id, entries)
+
+    async def get_turn_vectors(self, user_id: str, conversation_id: str) -> List[Dict]:
+        return await self.inner.get_turn_vectors(user_id, conversation_id)
+
+    async def list_page(self, user_id: str, limit: int, before: Tuple[str, str] = None,
+                        since: str = None) -> Tuple[List[Dict], bool]:
+        return await self.inner.list_page(user_id, limit, before, since)
+
+    async def list_deleted_since(self, user_id: str, since: str) -> List[str]:
+        return await self.inner.list_deleted_since(user_id, since)
+
+    async def delete(self, user_id: str, conversation_id: str) -> bool:
+        key = self._key(user_id, conversation_id)
+        deleted = await self.inner.delete(user_id, conversation_id)
+        self._invalidate(key)
+        self._publish(key)
+        return deleted
+
+    async def delete_all(self, user_id: str):
+        await self.inner.delete_all(user_id)
+        prefix = f"{user_id}/"
+        for key in [key for key in self.cache.keys() if key.startswith(prefix)]:
+            self._invalidate(key)
+            self._publish(key)
+
+    def get_stats(self) -> Dict:
+        return {**self.cache.get_stats(), "stale_detected": self.stale_detected, "version_checks": self.version_checks}
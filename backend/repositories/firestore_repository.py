@@ -0,0 +1,452 @@
+# repositories/firestore_repository.py
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from google.cloud import firestore
+from core.database import get_db
+from core.executors import run_io
+from .base import (
+    UserRepository, ConversationRepository, KnowledgeRepository, AgenticActionRepository, Repositories,
+    append_to_conversation, message_count, message_doc_id, conversation_summary, keyword_doc_id,
+    knowledge_stats_delta, knowledge_stats_batch_delta, knowledge_stats_change, knowledge_stats_from_entries,
+    CONVERSATION_SUMMARY_FIELDS
+)
+
+
+class _FirestoreRepository:
+    """Accès paresseux au client : aucune connexion tant qu'aucune requête n'est faite"""
+
+    @property
+    def db(self):
+        return get_db()
+
+    def _user_collection(self, user_id: str, name: str):
+        return self.db.collection('users').document(user_id).collection(name)
+
+
+class FirestoreUserRepository(_FirestoreRepository, UserRepository):
+    async def get(self, user_id: str) -> Optional[Dict]:
+        doc = await run_io(self.db.collection('users').document(user_id).get)
+        if not doc.exists:
+            return None
+        user_data = doc.to_dict()
+        user_data["id"] = user_id
+        return user_data
+
+    async def find_by_email(self, email: str) -> Optional[Dict]:
+        query = self.db.collection('users').where('email', '==', email).limit(1)
+        docs = await run_io(query.get)
+        if not docs:
+            return None
+        user_data = docs[0].to_dict()
+        user_data.setdefault("id", docs[0].id)
+        return user_data
+
+    async def create(self, user_id: str, data: Dict):
+        await run_io(self.db.collection('users').document(user_id).set, data)
+
+    async def update(self, user_id: str, data: Dict):
+        await run_io(self.db.collection('users').document(user_id).update, data)
+
+    async def delete(self, user_id: str):
+        await run_io(self.db.collection('users').document(user_id).delete)
+
+
+class FirestoreConversationRepository(_FirestoreRepository, ConversationRepository):
+    def _conversation_ref(self, user_id: str, conversation_id: str):
+        return self._user_collection(user_id, 'conversations').document(conversation_id)
+
+    def new_id(self, user_id: str) -> str:
+        return self._user_collection(user_id, 'conversations').document().id
+
+    async def get(self, user_id: str, conversation_id: str) -> Optional[Dict]:
+        doc = await run_io(self._conversation_ref(user_id, conversation_id).get)
+        return doc.to_dict() if doc.exists else None
+
+    async def get_version(self, user_id: str, conversation_id: str) -> Optional[int]:
+        doc = await run_io(self._conversation_ref(user_id, conversation_id).get, field_paths=['version'])
+        return (doc.to_dict() or {}).get('version', 0) if doc.exists else None
+
+    async def get_messages(self, user_id: str, conversation_id: str, limit: int = None) -> List[Dict]:
+        conv_ref = self._conversation_ref(user_id, conversation_id)
+
+        def _read():
+            conversation = conv_ref.get()
+            legacy = (conversation.to_dict() or {}).get('messages', []) if conversation.exists else []
+            query = conv_ref.collection('messages').order_by('seq', direction=firestore.Query.DESCENDING)
+            if limit:
+                query = query.limit(limit)
+            recent = [doc.to_dict() for doc in query.stream()]
+            recent.reverse()
+            messages = legacy + recent
+            return messages[-limit:] if limit else messages
+        return await run_io(_read)
+
+    async def create(self, user_id: str, conversation_id: str, data: Dict, messages: List[Dict]):
+        conv_ref = self._conversation_ref(user_id, conversation_id)
+        conversation = {**data, **append_to_conversation({}, messages)}
+        batch = self.db.batch()
+        batch.set(conv_ref, conversation)
+        for seq, message in enumerate(messages):
+            batch.set(conv_ref.collection('messages').document(message_doc_id(seq)), {**message, 'seq': seq})
+        await run_io(batch.commit)
+        return conversation
+
+    async def append_messages(self, user_id: str, conversation_id: str, messages: List[Dict], updated_at: str):
+        conv_ref = self._conversation_ref(user_id, conversation_id)
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def _append(transaction):
+            # Une lecture (document léger) + écritures, quelle que soit la longueur de la conversation
+            snapshot = conv_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                raise LookupError(f"Conversation introuvable: {conversation_id}")
+            conversation = snapshot.to_dict()
+            first_seq = message_count(conversation)
+            for offset, message in enumerate(messages):
+                seq = first_seq + offset
+                transaction.set(conv_ref.collection('messages').document(message_doc_id(seq)), {**message, 'seq': seq})
+            changes = {**append_to_conversation(conversation, messages), 'updated_at': updated_at}
+            transaction.update(conv_ref, changes)
+            return changes
+        return await run_io(_append, transaction)
+
+    async def update_conversation(self, user_id: str, conversation_id: str, fields: Dict) -> Dict:
+        conv_ref = self._conversation_ref(user_id, conversation_id)
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def _update(transaction):
+            snapshot = conv_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                raise LookupError(f"Conversation introuvable: {conversation_id}")
+            changes = {**fields, 'version': snapshot.to_dict().get('version', 0) + 1}
+            transaction.update(conv_ref, changes)
+            return changes
+        return await run_io(_update, transaction)
+
+    async def add_turn_vectors(self, user_id: str, conversation_id: str, entries: List[Dict]):
+        vectors_ref = self._conversation_ref(user_id, conversation_id).collection('turn_vectors')
+        batch = self.db.batch()
+        for entry in entries:
+            batch.set(vectors_ref.document(message_doc_id(entry['seq'])), entry)
+        await run_io(batch.commit)
+
+    async def get_turn_vectors(self, user_id: str, conversation_id: str) -> List[Dict]:
+        query = self._conversation_ref(user_id, conversation_id).collection('turn_vectors').order_by('seq')
+        return await run_io(lambda: [doc.to_dict() for doc in query.stream()])
+
+    async def list_page(self, user_id: str, limit: int, before: Tuple[str, str] = None,
+                        since: str = None) -> Tuple[List[Dict], bool]:
+        collection = self._user_collection(user_id, 'conversations')
+        query = collection
+        if since:
+            query = query.where(filter=firestore.FieldFilter('updated_at', '>', since))
+        # Tri (updated_at, id) : deux conversations de même date ne sont pas sautées en limite de page
+        query = query.order_by('updated_at', direction=firestore.Query.DESCENDING).order_by(
+            firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING
+        )
+        if before:
+            query = query.start_after({
+                'updated_at': before[0],
+                firestore.FieldPath.document_id(): collection.document(before[1]),
+            })
+        # Projection : seuls les champs du résumé transitent (ni tail ni ancien tableau de messages)
+        query = query.select(list(CONVERSATION_SUMMARY_FIELDS)).limit(limit + 1)
+        docs = await run_io(lambda: [conversation_summary(doc.to_dict()) for doc in query.stream()])
+        return docs[:limit], len(docs) > limit
+
+    async def list_deleted_since(self, user_id: str, since: str) -> List[str]:
+        query = self._user_collection(user_id, 'conversation_tombstones').where(
+            filter=firestore.FieldFilter('deleted_at', '>', since)
+        )
+        return await run_io(lambda: [doc.id for doc in query.stream()])
+
+    def _delete_conversation(self, conv_ref):
+        # Firestore ne supprime pas les sous-collections : messages et index d'abord, par lots
+        for name in ('messages', 'turn_vectors'):
+            while True:
+                docs = list(conv_ref.collection(name).limit(400).stream())
+                if not docs:
+                    break
+                batch = self.db.batch()
+                for doc in docs:
+                    batch.delete(doc.reference)
+                batch.commit()
+        conv_ref.delete()
+
+    async def delete(self, user_id: str, conversation_id: str) -> bool:
+        conv_ref = self._conversation_ref(user_id, conversation_id)
+        conv = await run_io(conv_ref.get)
+        if not conv.exists:
+            return False
+        await run_io(self._delete_conversation, conv_ref)
+        await run_io(self._user_collection(user_id, 'conversation_tombstones').document(conversation_id).set, {
+            'id': conversation_id, 'deleted_at': datetime.now().isoformat()
+        })
+        return True
+
+    async def delete_all(self, user_id: str):
+        convs_ref = self._user_collection(user_id, 'conversations')
+
+        tombstones_ref = self._user_collection(user_id, 'conversation_tombstones')
+
+        def _delete_conversations():
+            for doc in convs_ref.stream():
+                self._delete_conversation(doc.reference)
+            for doc in tombstones_ref.stream():
+                doc.reference.delete()
+        await run_io(_delete_conversations)
+
+
+def _increments(delta: Dict) -> Dict:
+    return {
+        key: _increments(value) if isinstance(value, dict) else firestore.Increment(value)
+        for key, value in delta.items()
+    }
+
+
+class FirestoreKnowledgeRepository(_FirestoreRepository, KnowledgeRepository):
+    def _stats_ref(self, user_id: str):
+        return self._user_collection(user_id, 'knowledge_meta').document('stats')
+
+    async def add(self, user_id: str, entry_id: str, entry: Dict):
+        entry = {**entry, 'timestamp': firestore.SERVER_TIMESTAMP} # Timestamp natif Firestore
+        batch = self.db.batch()
+        batch.set(self._user_collection(user_id, 'knowledge').document(entry_id), entry)
+        # Compteurs agrégés dans la même écriture (incréments côté serveur, sans lecture)
+        batch.set(self._stats_ref(user_id), _increments(knowledge_stats_delta(entry)), merge=True)
+        await run_io(batch.commit)
+
+    async def add_many(self, entries: List[Tuple[str, str, Dict]]):
+        for start in range(0, len(entries), 240): # Limite de 500 écritures par lot (entrées + compteurs)
+            chunk = entries[start:start + 240]
+            by_user: Dict[str, List[Dict]] = {}
+            batch = self.db.batch()
+            for user_id, entry_id, entry in chunk:
+                entry = {**entry, 'timestamp': firestore.SERVER_TIMESTAMP}
+                batch.set(self._user_collection(user_id, 'knowledge').document(entry_id), entry)
+                by_user.setdefault(user_id, []).append(entry)
+            for user_id, user_entries in by_user.items():
+                batch.set(self._stats_ref(user_id), _increments(knowledge_stats_batch_delta(user_entries)), merge=True)
+            await run_io(batch.commit)
+
+    async def merge_duplicate(self, user_id: str, entry_id: str, replacement: Dict = None, count: int = 1) -> Optional[Dict]:
+        entry_ref = self._user_collection(user_id, 'knowledge').document(entry_id)
+        stats_ref = self._stats_ref(user_id)
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def _merge(transaction):
+            snapshot = entry_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            current = snapshot.to_dict()
+            updates = {'usage_count': current.get('usage_count', 0) + count}
+            if replacement and replacement.get('value_score', 0.0) > current.get('value_score', 0.0):
+                updates.update(replacement)
+                updates['response_revision'] = current.get('response_revision', 0) + 1
+                change = knowledge_stats_change(current, {**current, **replacement})
+                transaction.set(stats_ref, _increments(change), merge=True)
+            transaction.update(entry_ref, updates)
+            return {**current, **updates}
+        return await run_io(_merge, transaction)
+
+    async def update_entry(self, user_id: str, entry_id: str, fields: Dict) -> bool:
+        entry_ref = self._user_collection(user_id, 'knowledge').document(entry_id)
+        stats_ref = self._stats_ref(user_id)
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def _update(transaction):
+            snapshot = entry_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            current = snapshot.to_dict()
+            transaction.update(entry_ref, fields)
+            transaction.set(stats_ref, _increments(knowledge_stats_change(current, {**current, **fields})), merge=True)
+            return True
+        return await run_io(_update, transaction)
+
+    async def record_usage(self, usage: Dict[str, Dict[str, Tuple[int, datetime]]]):
+        refs = [
+            (self._user_collection(user_id, 'knowledge').document(entry_id), hits, last_used)
+            for user_id, entries in usage.items() for entry_id, (hits, last_used) in entries.items()
+        ]
+        if not refs:
+            return
+        # Une lecture groupée : un update sur une entrée supprimée ferait échouer tout le lot
+        existing = await run_io(lambda: {doc.reference.path for doc in self.db.get_all([ref for ref, _, _ in refs]) if doc.exists})
+        refs = [item for item in refs if item[0].path in existing]
+        for start in range(0, len(refs), 400): # Limite de 500 écritures par lot
+            batch = self.db.batch()
+            for ref, hits, last_used in refs[start:start + 400]:
+                batch.update(ref, {'usage_count': firestore.Increment(hits), 'last_used': last_used})
+            await run_io(batch.commit)
+
+    async def delete(self, user_id: str, entry_id: str) -> bool:
+        entry_ref = self._user_collection(user_id, 'knowledge').document(entry_id)
+        stats_ref = self._stats_ref(user_id)
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def _delete(transaction):
+            snapshot = entry_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            transaction.delete(entry_ref)
+            transaction.set(stats_ref, _increments(knowledge_stats_delta(snapshot.to_dict(), -1)), merge=True)
+            return True
+        return await run_io(_delete, transaction)
+
+    async def find(self, user_id: str, min_score: float = None, predicate: Callable[[Dict], bool] = None,
+                   limit: int = None) -> List[Dict]:
+        query = self._user_collection(user_id, 'knowledge')
+        if min_score is not None:
+            query = query.where(filter=firestore.FieldFilter('value_score', '>=', min_score))
+        if limit and predicate is None:
+            query = query.limit(limit)
+
+        def _scan():
+            # Parcours (bloquant) exécuté hors de la boucle asyncio, arrêt anticipé
+            results = []
+            for doc in query.stream():
+                data = doc.to_dict()
+                if predicate is None or predicate(data):
+                    results.append(data)
+                    if limit and len(results) >= limit:
+                        break
+            return results
+        return await run_io(_scan)
+
+    async def get_many(self, user_id: str, entry_ids: List[str]) -> List[Dict]:
+        if not entry_ids:
+            return []
+        refs = [self._user_collection(user_id, 'knowledge').document(entry_id) for entry_id in entry_ids]
+        snapshots = await run_io(lambda: list(self.db.get_all(refs))) # Une seule lecture groupée
+        found = {doc.id: doc.to_dict() for doc in snapshots if doc.exists}
+        return [found[entry_id] for entry_id in entry_ids if entry_id in found]
+
+    async def add_postings(self, user_id: str, postings: Dict[str, Dict[str, float]]):
+        index_ref = self._user_collection(user_id, 'knowledge_index')
+        items = list(postings.items())
+        for start in range(0, len(items), 400): # Limite de 500 écritures par lot
+            batch = self.db.batch()
+            for keyword, entries in items[start:start + 400]:
+                batch.set(index_ref.document(keyword_doc_id(keyword)), {'postings': entries}, merge=True)
+            await run_io(batch.commit)
+
+    async def get_postings(self, user_id: str, keywords: List[str]) -> Dict[str, Dict[str, float]]:
+        if not keywords:
+            return {}
+        index_ref = self._user_collection(user_id, 'knowledge_index')
+        refs = {keyword_doc_id(keyword): keyword for keyword in keywords}
+        snapshots = await run_io(lambda: list(self.db.get_all([index_ref.document(doc_id) for doc_id in refs])))
+        postings = {keyword: {} for keyword in keywords}
+        for doc in snapshots:
+            if doc.exists:
+                postings[refs[doc.id]] = doc.to_dict().get('postings', {})
+        return postings
+
+    async def remove_postings(self, user_id: str, postings: Dict[str, List[str]]):
+        index_ref = self._user_collection(user_id, 'knowledge_index')
+        items = list(postings.items())
+        for start in range(0, len(items), 400): # Limite de 500 écritures par lot
+            batch = self.db.batch()
+            for keyword, entry_ids in items[start:start + 400]:
+                removed = {entry_id: firestore.DELETE_FIELD for entry_id in entry_ids}
+                batch.set(index_ref.document(keyword_doc_id(keyword)), {'postings': removed}, merge=True)
+            await run_io(batch.commit)
+
+    async def add_lsh_buckets(self, user_id: str, buckets: Dict[str, List[str]]):
+        lsh_ref = self._user_collection(user_id, 'knowledge_lsh')
+        items = list(buckets.items())
+        for start in range(0, len(items), 400): # Limite de 500 écritures par lot
+            batch = self.db.batch()
+            for bucket_key, entry_ids in items[start:start + 400]:
+                batch.set(lsh_ref.document(bucket_key), {'entries': firestore.ArrayUnion(entry_ids)}, merge=True)
+            await run_io(batch.commit)
+
+    async def get_lsh_buckets(self, user_id: str, bucket_keys: List[str]) -> Dict[str, List[str]]:
+        if not bucket_keys:
+            return {}
+        lsh_ref = self._user_collection(user_id, 'knowledge_lsh')
+        snapshots = await run_io(lambda: list(self.db.get_all([lsh_ref.document(key) for key in bucket_keys])))
+        buckets = {key: [] for key in bucket_keys}
+        for doc in snapshots:
+            if doc.exists:
+                buckets[doc.id] = doc.to_dict().get('entries', [])
+        return buckets
+
+    async def remove_lsh_buckets(self, user_id: str, buckets: Dict[str, List[str]]):
+        lsh_ref = self._user_collection(user_id, 'knowledge_lsh')
+        items = list(buckets.items())
+        for start in range(0, len(items), 400): # Limite de 500 écritures par lot
+            batch = self.db.batch()
+            for bucket_key, entry_ids in items[start:start + 400]:
+                batch.set(lsh_ref.document(bucket_key), {'entries': firestore.ArrayRemove(entry_ids)}, merge=True)
+            await run_io(batch.commit)
+
+    async def get_meta(self, user_id: str, name: str) -> Optional[Dict]:
+        doc = await run_io(self._user_collection(user_id, 'knowledge_meta').document(name).get)
+        return doc.to_dict() if doc.exists else None
+
+    async def set_meta(self, user_id: str, name: str, data: Dict):
+        await run_io(self._user_collection(user_id, 'knowledge_meta').document(name).set, data)
+
+    async def initialize_stats(self, user_id: str) -> Dict:
+        stats_ref = self._stats_ref(user_id)
+        entries_query = self._user_collection(user_id, 'knowledge')
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def _initialize(transaction):
+            snapshot = stats_ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else None
+            if current and current.get('initialized'):
+                return current
+            entries = [doc.to_dict() for doc in transaction.get(entries_query)]
+            stats = knowledge_stats_from_entries(entries, current)
+            transaction.set(stats_ref, stats)
+            return stats
+        return await run_io(_initialize, transaction)
+
+    async def find_global(self, min_score: float, limit: int) -> List[Dict]:
+        query = self.db.collection_group('knowledge').where('value_score', '>=', min_score).limit(limit)
+        return await run_io(lambda: [doc.to_dict() for doc in query.stream()])
+
+    async def scan_global(self, cursor: Optional[str], limit: int) -> Tuple[List[Dict], Optional[str]]:
+        query = self.db.collection_group('knowledge').order_by(firestore.FieldPath.document_id()).limit(limit)
+        if cursor:
+            # Référence plutôt qu'instantané : le dernier document lu a pu être supprimé depuis
+            query = query.start_after({firestore.FieldPath.document_id(): self.db.document(cursor)})
+
+        def _page():
+            docs = list(query.stream())
+            next_cursor = docs[-1].reference.path if len(docs) == limit else None
+            return [doc.to_dict() for doc in docs], next_cursor
+        return await run_io(_page)
+
+    async def list_recent(self, user_id: str, limit: int) -> List[Dict]:
+        query = self._user_collection(user_id, 'knowledge').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit)
+        return await run_io(lambda: [doc.to_dict() for doc in query.stream()])
+
+
+class FirestoreAgenticActionRepository(_FirestoreRepository, AgenticActionRepository):
+    async def add(self, user_id: str, action_id: str, data: Dict):
+        await run_io(self._user_collection(user_id, 'agentic_actions').document(action_id).set, data)
+
+    async def list_recent(self, user_id: str, limit: int) -> List[Dict]:
+        query = self._user_collection(user_id, 'agentic_actions').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit)
+        return await run_io(lambda: [doc.to_dict() for doc in query.stream()])
+
+
+def create_firestore_repositories() -> Repositories:
+    return Repositories(
+        backend="firestore",
+        users=FirestoreUserRepository(),
+        conversations=FirestoreConversationRepository(),
+        knowledge=FirestoreKnowledgeRepository(),
+        agentic_actions=FirestoreAgenticActionRepository(),
+        connect=get_db,
+    )
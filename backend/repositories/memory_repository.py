@@ -0,0 +1,403 @@
+# repositories/memory_repository.py
+import asyncio
+import copy
+import secrets
+import string
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from .base import (
+    UserRepository, ConversationRepository, KnowledgeRepository, AgenticActionRepository, Repositories,
+    append_to_conversation, message_count, message_doc_id, conversation_summary, keyword_doc_id,
+    knowledge_stats_delta, knowledge_stats_change, knowledge_stats_from_entries
+)
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+class MemoryStore:
+    """Documents en mémoire, organisés comme Firestore : {chemin de collection: {doc_id: données}}"""
+
+    def __init__(self, latency: float = 0.0):
+        self.collections: Dict[str, Dict[str, Dict]] = {}
+        self.latency = latency # Latence simulée par opération (benchmarks réalistes)
+        self.operations = 0
+
+    async def roundtrip(self):
+        self.operations += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            await asyncio.sleep(0) # Rend la main comme un vrai appel réseau
+
+    def collection(self, path: str) -> Dict[str, Dict]:
+        return self.collections.setdefault(path, {})
+
+    def collection_group(self, name: str) -> List[Dict]:
+        """Documents de toutes les collections `name`, dans l'ordre des chemins (comme Firestore)"""
+        docs = []
+        for path in sorted(self.collections):
+            if path.rsplit('/', 1)[-1] == name:
+                docs.extend(self.collections[path][doc_id] for doc_id in sorted(self.collections[path]))
+        return docs
+
+    def clear(self):
+        self.collections.clear()
+        self.operations = 0
+
+
+def _new_document_id() -> str:
+    return ''.join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+
+def _where_gte(docs, field: str, value) -> List[Dict]:
+    # Firestore ignore les documents sans le champ filtré
+    return [doc for doc in docs if doc.get(field) is not None and doc[field] >= value]
+
+
+def _apply_increments(doc: Dict, delta: Dict):
+    # Équivalent de firestore.Increment (champs imbriqués compris)
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            _apply_increments(doc.setdefault(key, {}), value)
+        else:
+            doc[key] = doc.get(key, 0) + value
+
+
+def _order_desc(docs, field: str) -> List[Dict]:
+    # Firestore ignore les documents sans le champ de tri
+    return sorted((doc for doc in docs if doc.get(field) is not None), key=lambda doc: doc[field], reverse=True)
+
+
+class _MemoryRepository:
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    def _user_collection(self, user_id: str, name: str) -> Dict[str, Dict]:
+        return self.store.collection(f"users/{user_id}/{name}")
+
+
+class MemoryUserRepository(_MemoryRepository, UserRepository):
+    async def get(self, user_id: str) -> Optional[Dict]:
+        await self.store.roundtrip()
+        data = self.store.collection('users').get(user_id)
+        if data is None:
+            return None
+        user_data = copy.deepcopy(data)
+        user_data["id"] = user_id
+        return user_data
+
+    async def find_by_email(self, email: str) -> Optional[Dict]:
+        await self.store.roundtrip()
+        users = self.store.collection('users')
+        for doc_id in sorted(users):
+            if users[doc_id].get('email') == email:
+                user_data = copy.deepcopy(users[doc_id])
+                user_data.setdefault("id", doc_id)
+                return user_data
+        return None
+
+    async def create(self, user_id: str, data: Dict):
+        await self.store.roundtrip()
+        self.store.collection('users')[user_id] = copy.deepcopy(data)
+
+    async def update(self, user_id: str, data: Dict):
+        await self.store.roundtrip()
+        users = self.store.collection('users')
+        if user_id not in users:
+            raise LookupError(f"Utilisateur introuvable: {user_id}")
+        users[user_id].update(copy.deepcopy(data))
+
+    async def delete(self, user_id: str):
+        await self.store.roundtrip()
+        self.store.collection('users').pop(user_id, None)
+
+
+class MemoryConversationRepository(_MemoryRepository, ConversationRepository):
+    def _messages(self, user_id: str, conversation_id: str) -> Dict[str, Dict]:
+        return self.store.collection(f"users/{user_id}/conversations/{conversation_id}/messages")
+
+    def _subcollection_paths(self, user_id: str, conversation_id: str) -> List[str]:
+        return [f"users/{user_id}/conversations/{conversation_id}/{name}" for name in ('messages', 'turn_vectors')]
+
+    def new_id(self, user_id: str) -> str:
+        return _new_document_id()
+
+    async def get(self, user_id: str, conversation_id: str) -> Optional[Dict]:
+        await self.store.roundtrip()
+        data = self._user_collection(user_id, 'conversations').get(conversation_id)
+        return copy.deepcopy(data) if data is not None else None
+
+    async def get_version(self, user_id: str, conversation_id: str) -> Optional[int]:
+        await self.store.roundtrip()
+        data = self._user_collection(user_id, 'conversations').get(conversation_id)
+        return data.get('version', 0) if data is not None else None
+
+    async def get_messages(self, user_id: str, conversation_id: str, limit: int = None) -> List[Dict]:
+        await self.store.roundtrip()
+        conversation = self._user_collection(user_id, 'conversations').get(conversation_id) or {}
+        collection = self._messages(user_id, conversation_id)
+        messages = conversation.get('messages', []) + [collection[doc_id] for doc_id in sorted(collection)]
+        return copy.deepcopy(messages[-limit:] if limit else messages)
+
+    async def create(self, user_id: str, conversation_id: str, data: Dict, messages: List[Dict]):
+        await self.store.roundtrip()
+        conversation = {**data, **append_to_conversation({}, messages)}
+        self._user_collection(user_id, 'conversations')[conversation_id] = copy.deepcopy(conversation)
+        collection = self._messages(user_id, conversation_id)
+        for seq, message in enumerate(messages):
+            collection[message_doc_id(seq)] = copy.deepcopy({**message, 'seq': seq})
+        return conversation
+
+    async def append_messages(self, user_id: str, conversation_id: str, messages: List[Dict], updated_at: str):
+        await self.store.roundtrip()
+        conversations = self._user_collection(user_id, 'conversations')
+        if conversation_id not in conversations:
+            raise LookupError(f"Conversation introuvable: {conversation_id}")
+        conversation = conversations[conversation_id]
+        first_seq = message_count(conversation)
+        collection = self._messages(user_id, conversation_id)
+        for offset, message in enumerate(messages):
+            collection[message_doc_id(first_seq + offset)] = copy.deepcopy({**message, 'seq': first_seq + offset})
+        changes = {**append_to_conversation(conversation, messages), 'updated_at': updated_at}
+        conversation.update(copy.deepcopy(changes))
+        return changes
+
+    async def update_conversation(self, user_id: str, conversation_id: str, fields: Dict) -> Dict:
+        await self.store.roundtrip()
+        conversation = self._user_collection(user_id, 'conversations').get(conversation_id)
+        if conversation is None:
+            raise LookupError(f"Conversation introuvable: {conversation_id}")
+        changes = {**fields, 'version': conversation.get('version', 0) + 1}
+        conversation.update(copy.deepcopy(changes))
+        return changes
+
+    async def add_turn_vectors(self, user_id: str, conversation_id: str, entries: List[Dict]):
+        await self.store.roundtrip()
+        collection = self.store.collection(f"users/{user_id}/conversations/{conversation_id}/turn_vectors")
+        for entry in entries:
+            collection[message_doc_id(entry['seq'])] = copy.deepcopy(entry)
+
+    async def get_turn_vectors(self, user_id: str, conversation_id: str) -> List[Dict]:
+        await self.store.roundtrip()
+        collection = self.store.collection(f"users/{user_id}/conversations/{conversation_id}/turn_vectors")
+        return copy.deepcopy([collection[doc_id] for doc_id in sorted(collection)])
+
+    async def list_page(self, user_id: str, limit: int, before: Tuple[str, str] = None,
+                        since: str = None) -> Tuple[List[Dict], bool]:
+        await self.store.roundtrip()
+        conversations = self._user_collection(user_id, 'conversations')
+        # Départage par id (comme l'ordre implicite __name__ de Firestore) : pas de saut en limite de page
+        keyed = sorted(
+            ((doc['updated_at'], doc_id, doc) for doc_id, doc in conversations.items() if doc.get('updated_at') is not None),
+            key=lambda item: item[:2], reverse=True,
+        )
+        docs = [
+            doc for updated_at, doc_id, doc in keyed
+            if (not since or updated_at > since) and (not before or (updated_at, doc_id) < tuple(before))
+        ]
+        return [conversation_summary(doc) for doc in docs[:limit]], len(docs) > limit
+
+    async def list_deleted_since(self, user_id: str, since: str) -> List[str]:
+        await self.store.roundtrip()
+        tombstones = self._user_collection(user_id, 'conversation_tombstones')
+        return [doc_id for doc_id in sorted(tombstones) if tombstones[doc_id]['deleted_at'] > since]
+
+    async def delete(self, user_id: str, conversation_id: str) -> bool:
+        await self.store.roundtrip()
+        for path in self._subcollection_paths(user_id, conversation_id):
+            self.store.collections.pop(path, None)
+        if self._user_collection(user_id, 'conversations').pop(conversation_id, None) is None:
+            return False
+        self._user_collection(user_id, 'conversation_tombstones')[conversation_id] = {
+            'id': conversation_id, 'deleted_at': datetime.now().isoformat()
+        }
+        return True
+
+    async def delete_all(self, user_id: str):
+        await self.store.roundtrip()
+        conversations = self._user_collection(user_id, 'conversations')
+        for conversation_id in list(conversations):
+            for path in self._subcollection_paths(user_id, conversation_id):
+                self.store.collections.pop(path, None)
+        conversations.clear()
+        self._user_collection(user_id, 'conversation_tombstones').clear()
+
+
+class MemoryKnowledgeRepository(_MemoryRepository, KnowledgeRepository):
+    async def add(self, user_id: str, entry_id: str, entry: Dict):
+        await self.store.roundtrip()
+        entry = copy.deepcopy(entry)
+        entry['timestamp'] = datetime.now(timezone.utc) # Équivalent de SERVER_TIMESTAMP
+        self._user_collection(user_id, 'knowledge')[entry_id] = entry
+        _apply_increments(self._user_collection(user_id, 'knowledge_meta').setdefault('stats', {}), knowledge_stats_delta(entry))
+
+    async def add_many(self, entries: List[Tuple[str, str, Dict]]):
+        await self.store.roundtrip() # Un seul aller-retour, comme un commit groupé
+        for user_id, entry_id, entry in entries:
+            entry = copy.deepcopy(entry)
+            entry['timestamp'] = datetime.now(timezone.utc)
+            self._user_collection(user_id, 'knowledge')[entry_id] = entry
+            _apply_increments(self._user_collection(user_id, 'knowledge_meta').setdefault('stats', {}), knowledge_stats_delta(entry))
+
+    async def merge_duplicate(self, user_id: str, entry_id: str, replacement: Dict = None, count: int = 1) -> Optional[Dict]:
+        await self.store.roundtrip()
+        current = self._user_collection(user_id, 'knowledge').get(entry_id)
+        if current is None:
+            return None
+        current['usage_count'] = current.get('usage_count', 0) + count
+        if replacement and replacement.get('value_score', 0.0) > current.get('value_score', 0.0):
+            change = knowledge_stats_change(current, {**current, **replacement})
+            current.update(copy.deepcopy(replacement))
+            current['response_revision'] = current.get('response_revision', 0) + 1
+            _apply_increments(self._user_collection(user_id, 'knowledge_meta').setdefault('stats', {}), change)
+        return copy.deepcopy(current)
+
+    async def update_entry(self, user_id: str, entry_id: str, fields: Dict) -> bool:
+        await self.store.roundtrip()
+        current = self._user_collection(user_id, 'knowledge').get(entry_id)
+        if current is None:
+            return False
+        change = knowledge_stats_change(current, {**current, **fields})
+        current.update(copy.deepcopy(fields))
+        _apply_increments(self._user_collection(user_id, 'knowledge_meta').setdefault('stats', {}), change)
+        return True
+
+    async def record_usage(self, usage: Dict[str, Dict[str, Tuple[int, datetime]]]):
+        await self.store.roundtrip()
+        for user_id, entries in usage.items():
+            collection = self._user_collection(user_id, 'knowledge')
+            for entry_id, (hits, last_used) in entries.items():
+                if entry_id in collection:
+                    collection[entry_id]['usage_count'] = collection[entry_id].get('usage_count', 0) + hits
+                    collection[entry_id]['last_used'] = last_used
+
+    async def delete(self, user_id: str, entry_id: str) -> bool:
+        await self.store.roundtrip()
+        entry = self._user_collection(user_id, 'knowledge').pop(entry_id, None)
+        if entry is None:
+            return False
+        _apply_increments(self._user_collection(user_id, 'knowledge_meta').setdefault('stats', {}), knowledge_stats_delta(entry, -1))
+        return True
+
+    async def find(self, user_id: str, min_score: float = None, predicate: Callable[[Dict], bool] = None,
+                   limit: int = None) -> List[Dict]:
+        await self.store.roundtrip()
+        collection = self._user_collection(user_id, 'knowledge')
+        docs = [collection[doc_id] for doc_id in sorted(collection)]
+        if min_score is not None:
+            docs = sorted(_where_gte(docs, 'value_score', min_score), key=lambda doc: doc['value_score'])
+        results = []
+        for doc in docs:
+            if predicate is None or predicate(doc):
+                results.append(copy.deepcopy(doc))
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    async def get_many(self, user_id: str, entry_ids: List[str]) -> List[Dict]:
+        await self.store.roundtrip()
+        collection = self._user_collection(user_id, 'knowledge')
+        return copy.deepcopy([collection[entry_id] for entry_id in entry_ids if entry_id in collection])
+
+    async def add_postings(self, user_id: str, postings: Dict[str, Dict[str, float]]):
+        await self.store.roundtrip()
+        index = self._user_collection(user_id, 'knowledge_index')
+        for keyword, entries in postings.items():
+            index.setdefault(keyword_doc_id(keyword), {'postings': {}})['postings'].update(entries)
+
+    async def get_postings(self, user_id: str, keywords: List[str]) -> Dict[str, Dict[str, float]]:
+        await self.store.roundtrip()
+        index = self._user_collection(user_id, 'knowledge_index')
+        return {
+            keyword: copy.deepcopy(index.get(keyword_doc_id(keyword), {}).get('postings', {}))
+            for keyword in keywords
+        }
+
+    async def remove_postings(self, user_id: str, postings: Dict[str, List[str]]):
+        await self.store.roundtrip()
+        index = self._user_collection(user_id, 'knowledge_index')
+        for keyword, entry_ids in postings.items():
+            entries = index.setdefault(keyword_doc_id(keyword), {'postings': {}})['postings']
+            for entry_id in entry_ids:
+                entries.pop(entry_id, None) # DELETE_FIELD
+
+    async def add_lsh_buckets(self, user_id: str, buckets: Dict[str, List[str]]):
+        await self.store.roundtrip()
+        lsh = self._user_collection(user_id, 'knowledge_lsh')
+        for bucket_key, entry_ids in buckets.items():
+            entries = lsh.setdefault(bucket_key, {'entries': []})['entries']
+            entries.extend(entry_id for entry_id in entry_ids if entry_id not in entries) # ArrayUnion
+
+    async def get_lsh_buckets(self, user_id: str, bucket_keys: List[str]) -> Dict[str, List[str]]:
+        await self.store.roundtrip()
+        lsh = self._user_collection(user_id, 'knowledge_lsh')
+        return {key: list(lsh.get(key, {}).get('entries', [])) for key in bucket_keys}
+
+    async def remove_lsh_buckets(self, user_id: str, buckets: Dict[str, List[str]]):
+        await self.store.roundtrip()
+        lsh = self._user_collection(user_id, 'knowledge_lsh')
+        for bucket_key, entry_ids in buckets.items():
+            entries = lsh.setdefault(bucket_key, {'entries': []})['entries']
+            entries[:] = [entry_id for entry_id in entries if entry_id not in entry_ids] # ArrayRemove
+
+    async def get_meta(self, user_id: str, name: str) -> Optional[Dict]:
+        await self.store.roundtrip()
+        data = self._user_collection(user_id, 'knowledge_meta').get(name)
+        return copy.deepcopy(data) if data is not None else None
+
+    async def set_meta(self, user_id: str, name: str, data: Dict):
+        await self.store.roundtrip()
+        self._user_collection(user_id, 'knowledge_meta')[name] = copy.deepcopy(data)
+
+    async def initialize_stats(self, user_id: str) -> Dict:
+        await self.store.roundtrip()
+        meta = self._user_collection(user_id, 'knowledge_meta')
+        current = meta.get('stats')
+        if not (current and current.get('initialized')):
+            # Lecture et écriture sans point d'attente : atomique comme la transaction Firestore
+            current = meta['stats'] = knowledge_stats_from_entries(list(self._user_collection(user_id, 'knowledge').values()), current)
+        return copy.deepcopy(current)
+
+    async def find_global(self, min_score: float, limit: int) -> List[Dict]:
+        await self.store.roundtrip()
+        docs = _where_gte(self.store.collection_group('knowledge'), 'value_score', min_score)
+        return copy.deepcopy(sorted(docs, key=lambda doc: doc['value_score'])[:limit])
+
+    async def scan_global(self, cursor: Optional[str], limit: int) -> Tuple[List[Dict], Optional[str]]:
+        await self.store.roundtrip()
+        paths = sorted(
+            f"{path}/{doc_id}" for path, docs in self.store.collections.items()
+            if path.rsplit('/', 1)[-1] == 'knowledge' for doc_id in docs
+        )
+        page = [path for path in paths if cursor is None or path > cursor][:limit]
+        docs = [copy.deepcopy(self.store.collections[path.rsplit('/', 1)[0]][path.rsplit('/', 1)[1]]) for path in page]
+        return docs, (page[-1] if len(page) == limit else None)
+
+    async def list_recent(self, user_id: str, limit: int) -> List[Dict]:
+        await self.store.roundtrip()
+        docs = self._user_collection(user_id, 'knowledge').values()
+        return copy.deepcopy(_order_desc(docs, 'timestamp')[:limit])
+
+
+class MemoryAgenticActionRepository(_MemoryRepository, AgenticActionRepository):
+    async def add(self, user_id: str, action_id: str, data: Dict):
+        await self.store.roundtrip()
+        self._user_collection(user_id, 'agentic_actions')[action_id] = copy.deepcopy(data)
+
+    async def list_recent(self, user_id: str, limit: int) -> List[Dict]:
+        await self.store.roundtrip()
+        docs = self._user_collection(user_id, 'agentic_actions').values()
+        return copy.deepcopy(_order_desc(docs, 'timestamp')[:limit])
+
+
+def create_memory_repositories(latency: float = 0.0) -> Repositories:
+    store = MemoryStore(latency=latency)
+    repositories = Repositories(
+        backend="memory",
+        users=MemoryUserRepository(store),
+        conversations=MemoryConversationRepository(store),
+        knowledge=MemoryKnowledgeRepository(store),
+        agentic_actions=MemoryAgenticActionRepository(store),
+    )
+    repositories.store = store
+    return repositories
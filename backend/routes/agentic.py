@@ -4,8 +4,9 @@ from core import security
 from services.agentic_service import agentic_service
 from typing import Dict, Any
 from pydantic import BaseModel
-from core.database import db
-from google.cloud import firestore
+from repositories import repos
+from datetime import datetime
+import secrets
 
 router = APIRouter()
 
@@ -57,8 +58,7 @@ async def get_action_history(
 ):
     """Retourne l'historique des actions agentiques"""
     try:
-        actions_ref = db.collection('users').document(current_user["id"]).collection('agentic_actions')
-        actions = [doc.to_dict() for doc in actions_ref.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit).stream()]
+        actions = await repos.agentic_actions.list_recent(current_user["id"], limit)
         return {"history": actions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur récupération historique: {str(e)}")
@@ -66,14 +66,13 @@ async def get_action_history(
 async def _save_action_history(user_id: str, action_result: Dict):
     """Sauvegarde l'historique des actions"""
     try:
-        actions_ref = db.collection('users').document(user_id).collection('agentic_actions')
         action_id = secrets.token_hex(8)
         
         action_result["id"] = action_id
         action_result["user_id"] = user_id
         action_result["saved_at"] = datetime.now().isoformat()
         
-        actions_ref.document(action_id).set(action_result)
+        await repos.agentic_actions.add(user_id, action_id, action_result)
         
     except Exception as e:
         print(f"❌ Erreur sauvegarde historique action: {e}")
\ No newline at end of file
@@ -1,8 +1,12 @@
 # routes/chat.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from datetime import datetime
 from core import security
 from schemas.chat_schemas import ChatRequest, ChatResponse, ConversationList
 from services.chat_service import chat_service
+from repositories import repos
+from repositories.base import encode_cursor, decode_cursor
 # from services.agentic_chat_service import process_chat_with_agentic  # Nouvelle importation
 
 router = APIRouter()
@@ -30,12 +34,12 @@ async def get_conversation(
     current_user: dict = Depends(security.get_current_user)
 ):
     try:
-        from core.database import db
-        conv_ref = db.collection('users').document(current_user["id"]).collection('conversations').document(conversation_id)
-        conversation = conv_ref.get()
+        conversation = await repos.conversations.get(current_user["id"], conversation_id)
         
-        if conversation.exists:
-            return conversation.to_dict()
+        if conversation:
+            conversation.pop("tail", None)
+            conversation["messages"] = await repos.conversations.get_messages(current_user["id"], conversation_id)
+            return conversation
         else:
             raise HTTPException(status_code=404, detail="Conversation non trouvée")
     except Exception as e:
@@ -50,14 +54,11 @@ async def delete_conversation(
 ):
     """Supprime une conversation"""
     try:
-        from core.database import db
-        conv_ref = db.collection('users').document(current_user["id"]).collection('conversations').document(conversation_id)
-        conv = conv_ref.get()
+        deleted = await repos.conversations.delete(current_user["id"], conversation_id)
         
-        if not conv.exists:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Conversation non trouvée")
         
-        conv_ref.delete()
         return {"message": "Conversation supprimée avec succès"}
         
     except Exception as e:
@@ -66,17 +67,29 @@ async def delete_conversation(
 
 @router.get("/chat/conversations", response_model=ConversationList)
 async def get_user_conversations(
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
     current_user: dict = Depends(security.get_current_user)
 ):
+    """Liste paginée (id, titre, date, nombre de messages) ; `since` = modifiées/supprimées depuis"""
     try:
-        from core.database import db
-        convs_ref = db.collection('users').document(current_user["id"]).collection('conversations')
-        conversations = []
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        server_time = datetime.now().isoformat() # Pris avant la lecture : rien n'est manqué à la prochaine synchro
+        conversations, has_more = await repos.conversations.list_page(
+            current_user["id"], limit, before=before, since=since
+        )
+        deleted = await repos.conversations.list_deleted_since(current_user["id"], since) if since and not cursor else []
         
-        for doc in convs_ref.order_by('updated_at', direction='DESCENDING').stream():
-            conv_data = doc.to_dict()
-            conversations.append(conv_data)
-            
-        return {"conversations": conversations}
+        return {
+            "conversations": conversations,
+            "next_cursor": encode_cursor(conversations[-1]["updated_at"], conversations[-1]["id"]) if has_more else None,
+            "deleted": deleted,
+            "server_time": server_time,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
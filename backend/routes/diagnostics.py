@@ -3,6 +3,19 @@ from fastapi import APIRouter, Depends
 from core import security
 from core.vectorstore import vector_store
 from services.rag_service import rag_service
+from core.executors import run_cpu, io_executor, cpu_executor, password_executor, loop_monitor
+from core.background import background_tasks
+from core.cache import invalidation_bus
+from core.http_client import http_client
+from repositories import repos
+from services.conversation_memory import conversation_memory
+from services.conversation_index import conversation_index
+from services.knowledge_index import knowledge_index
+from services.knowledge_dedup import knowledge_dedup
+from services.knowledge_retention import knowledge_retention
+from services.knowledge_usage import knowledge_usage
+from services.community_knowledge import community_knowledge
+from services.knowledge_management import knowledge_manager
 
 router = APIRouter()
 
@@ -13,7 +26,7 @@ async def vectorstore_diagnostics(
     """Diagnostics du vector store"""
     try:
         # Test de recherche
-        test_results = vector_store.search_similar("test", k=2, user_id=current_user["id"])
+        test_results = await run_cpu(vector_store.search_similar, "test", 2, current_user["id"])
         
         # Statistiques
         stats = vector_store.get_stats()
@@ -66,4 +79,44 @@ async def llm_diagnostics():
         success = llm_service.test_connection()
         return {"status": "success" if success else "error", "message": "Test LLM effectué"}
     except Exception as e:
-        return {"status": "error", "error": str(e)}
\ No newline at end of file
+        return {"status": "error", "error": str(e)}
+
+
+@router.get("/diagnostics/llm/router")
+async def llm_router_diagnostics(
+    current_user: dict = Depends(security.get_current_user)
+):
+    """Statistiques live des modèles et dernières décisions du routeur"""
+    from services.llm_service import llm_service
+    try:
+        return {"status": "success", **llm_service.get_router_stats()}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+@router.get("/diagnostics/runtime")
+async def runtime_diagnostics(
+    current_user: dict = Depends(security.get_current_user)
+):
+    """Retard de la boucle asyncio, exécuteurs bornés et file de tâches de fond"""
+    return {
+        "event_loop_lag": loop_monitor.get_stats(),
+        "executors": {
+            "io": io_executor.get_stats(),
+            "cpu": cpu_executor.get_stats(),
+            "password": password_executor.get_stats(),
+        },
+        "background_tasks": background_tasks.get_stats(),
+        "http_client": http_client.get_stats(),
+        "user_cache": security.user_cache.get_stats(),
+        "conversation_cache": repos.conversations.get_stats() if hasattr(repos.conversations, "get_stats") else None,
+        "invalidation_bus": invalidation_bus.get_stats(),
+        "conversation_memory": conversation_memory.get_stats(),
+        "conversation_index": conversation_index.get_stats(),
+        "knowledge_index": knowledge_index.get_stats(),
+        "knowledge_dedup": knowledge_dedup.get_stats(),
+        "knowledge_retention": knowledge_retention.get_stats(),
+        "knowledge_usage": knowledge_usage.get_stats(),
+        "community_knowledge": community_knowledge.get_stats(),
+        "knowledge_graph": knowledge_manager.knowledge_graph.get_stats(),
+        "learning_pipeline": knowledge_manager.learning_pipeline.get_stats(),
+    }
@@ -4,6 +4,7 @@ from core import security
 from services.document_processor import document_processor
 from services.rag_service import rag_service
 from typing import List
+from core.executors import run_cpu
 
 router = APIRouter()
 
@@ -18,10 +19,11 @@ async def upload_document(
             raise HTTPException(status_code=400, detail="Nom de fichier manquant")
         
         # Traiter le fichier
-        processing_result = document_processor.process_uploaded_file(file, current_user["id"])
+        processing_result = await run_cpu(document_processor.process_uploaded_file, file, current_user["id"])
         
-        # Ajouter à la base de connaissances
-        added_count = rag_service.add_knowledge_documents(
+        # Ajouter à la base de connaissances (embeddings + FAISS hors de la boucle)
+        added_count = await run_cpu(
+            rag_service.add_knowledge_documents,
             texts=processing_result["texts"],
             metadata=processing_result["metadata"],
             user_id=current_user["id"]
@@ -45,7 +47,8 @@ async def add_text_document(
 ):
     """Ajout de texte directement à la base de connaissances"""
     try:
-        added_count = rag_service.add_knowledge_documents(
+        added_count = await run_cpu(
+            rag_service.add_knowledge_documents,
             texts=[text],
             metadata=[{"source": source}],
             user_id=current_user["id"]
@@ -2,14 +2,14 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from core import security
 from schemas.user_schemas import UserResponse, UserUpdate
-from core.database import users_ref, db
+from repositories import repos
 from datetime import datetime
 import secrets
 
 router = APIRouter()
 
-# Importer pwd_context depuis auth_service
-from services.auth_service import pwd_context
+# Hashage bcrypt hors de la boucle (pool dédié)
+from services.auth_service import get_password_hash_async
 
 @router.get("/users/me", response_model=UserResponse)
 async def get_current_user_info(
@@ -31,20 +31,18 @@ async def update_user_info(
             update_data["name"] = user_data.name
         
         if user_data.password is not None and user_data.password != "":
-            update_data["hashed_password"] = pwd_context.hash(user_data.password)
+            update_data["hashed_password"] = await get_password_hash_async(user_data.password)
         
         if update_data:
             update_data["updated_at"] = datetime.now()
-            users_ref.document(current_user["id"]).update(update_data)
+            await repos.users.update(current_user["id"], update_data)
             
             # Invalider le cache IMMÉDIATEMENT
             security.invalidate_user_cache(current_user["id"])
             
             # Forcer le rechargement des données utilisateur
-            user_doc = users_ref.document(current_user["id"]).get()
-            if user_doc.exists:
-                updated_user = user_doc.to_dict()
-                updated_user["id"] = current_user["id"]
+            updated_user = await repos.users.get(current_user["id"])
+            if updated_user:
                 
                 # S'assurer que tous les champs requis sont présents
                 if "created_at" not in updated_user:
@@ -57,6 +55,8 @@ async def update_user_info(
         # Retourner les données actuelles si aucune modification
         return current_user
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur mise à jour utilisateur: {str(e)}")
 
@@ -69,12 +69,10 @@ async def delete_user_account(
         user_id = current_user["id"]
         
         # Supprimer toutes les conversations
-        convs_ref = db.collection('users').document(user_id).collection('conversations')
-        for doc in convs_ref.stream():
-            doc.reference.delete()
+        await repos.conversations.delete_all(user_id)
         
         # Supprimer l'utilisateur
-        db.collection('users').document(user_id).delete()
+        await repos.users.delete(user_id)
         
         # Invalider le cache
         security.invalidate_user_cache(user_id)
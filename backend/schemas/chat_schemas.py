@@ -23,5 +23,14 @@ class Conversation(BaseModel):
     created_at: str
     updated_at: str
 
+class ConversationSummary(BaseModel):
+    id: str
+    title: str
+    updated_at: str
+    message_count: Optional[int] = None
+
 class ConversationList(BaseModel):
-    conversations: List[Conversation]
+    conversations: List[ConversationSummary]
+    next_cursor: Optional[str] = None # Page suivante (None : dernière page)
+    deleted: List[str] = [] # Mode "since" : conversations supprimées depuis
+    server_time: str # À renvoyer comme `since` lors de la prochaine synchronisation
@@ -4,10 +4,11 @@ import json
 import requests
 from datetime import datetime
 import asyncio
-from google.cloud import firestore
-from core.database import db
+from repositories import repos
 from services.llm_service import llm_service
 from services.web_search_service import web_search_service 
+from core.background import background_tasks
+from core.executors import run_cpu
 import httpx
 import time
 
@@ -40,8 +41,9 @@ class AgenticService:
             result = await self.available_actions[action_name](parameters, user_id)
 
              # Enrichir la base de connaissances avec les résultats de l'action
+            # (en tâche de fond : l'indexation ne retarde pas la réponse)
             if action_name in ["web_search", "data_analysis", "document_processing"]:
-                await self.enrich_knowledge_from_action(action_name, parameters, user_id, result)
+                background_tasks.submit(self.enrich_knowledge_from_action, action_name, parameters, user_id, result)
 
             return {
                 "action": action_name,
@@ -228,7 +230,7 @@ class AgenticService:
             # Appel au LLM avec le prompt amélioré
             llm_response = await llm_service.get_response([
                 {"role": "user", "content": enhanced_prompt}
-            ])
+            ], priority="agentic")
             
             return {
                 "query": query,
@@ -291,9 +293,10 @@ class AgenticService:
                     
                     # Ajouter à la base vectorielle
                     from core.vectorstore import vector_store
-                    added_count = vector_store.add_documents(
+                    added_count = await run_cpu(
+                        vector_store.add_documents,
                         langchain_docs, 
-                        user_id=user_id
+                        user_id
                     )
                     print(f"✅ {added_count} documents ajoutés à la base via action agentique")
 
@@ -367,7 +370,7 @@ class AgenticService:
             if action == "summarize":
                 # Utiliser le LLM pour résumer
                 prompt = f"Résumez ce document de manière concise et informative:\n\n{content}"
-                summary = await llm_service.get_response([{"role": "user", "content": prompt}])
+                summary = await llm_service.get_response([{"role": "user", "content": prompt}], priority="agentic")
                 
                 return {
                     "action": "summarize",
@@ -378,7 +381,7 @@ class AgenticService:
             
             elif action == "extract_keypoints":
                 prompt = f"Extrayez les points clés de ce document sous forme de liste:\n\n{content}"
-                keypoints = await llm_service.get_response([{"role": "user", "content": prompt}])
+                keypoints = await llm_service.get_response([{"role": "user", "content": prompt}], priority="agentic")
                 
                 return {
                     "action": "extract_keypoints",
@@ -404,7 +407,7 @@ class AgenticService:
             Fournis le code complet avec des commentaires explicites.
             """
             
-            code = await llm_service.get_response([{"role": "user", "content": prompt}])
+            code = await llm_service.get_response([{"role": "user", "content": prompt}], priority="agentic")
             
             return {
                 "language": language,
@@ -425,7 +428,8 @@ class AgenticService:
         
         try:
             if text:
-                added_count = rag_service.add_knowledge_documents(
+                added_count = await run_cpu(
+                    rag_service.add_knowledge_documents,
                     texts=[text],
                     metadata=[{"source": source, "type": "agentic_update"}],
                     user_id=user_id
@@ -448,13 +452,10 @@ class AgenticService:
         
         try:
             if conversation_id:
-                # Récupérer la conversation
-                conv_ref = db.collection('users').document(user_id).collection('conversations').document(conversation_id)
-                conversation = conv_ref.get()
+                # Récupérer les messages (sous-collection)
+                messages = await repos.conversations.get_messages(user_id, conversation_id)
                 
-                if conversation.exists:
-                    conv_data = conversation.to_dict()
-                    messages = conv_data.get('messages', [])
+                if messages:
                     
                     # Préparer le contenu à résumer
                     content = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
@@ -469,7 +470,7 @@ class AgenticService:
                     {content}
                     """
                     
-                    summary = await llm_service.get_response([{"role": "user", "content": prompt}])
+                    summary = await llm_service.get_response([{"role": "user", "content": prompt}], priority="background")
                     
                     return {
                         "conversation_id": conversation_id,
@@ -3,8 +3,8 @@ from passlib.context import CryptContext # CryptContext : Pour le hashage des mo
 from datetime import datetime
 import secrets # Génération d'IDs sécurisés
 from fastapi import HTTPException, status
-from google.cloud import firestore
-from core.database import db
+from repositories import repos
+from core.executors import run_password, ExecutorSaturated
 from core import security
 from schemas.user_schemas import Token
 
@@ -20,22 +20,37 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# Versions asynchrones : bcrypt tourne dans un pool dédié, jamais sur la boucle
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password(get_password_hash, password)
+
+async def _run_password(func, *args):
+    try:
+        return await run_password(func, *args)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service d'authentification surchargé, réessayez dans quelques secondes",
+            headers={"Retry-After": "5"}
+        )
+
 # Création d'Utilisateur
 async def create_user(user_data: dict, background_tasks = None) -> Token:
     try:
         # Vérification de l'Email Unique
-        users_ref = db.collection('users')
-        query = users_ref.where('email', '==', user_data['email']).limit(1)
-        existing_users = query.get()
+        existing_user = await repos.users.find_by_email(user_data['email'])
         
-        if existing_users:
+        if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Un utilisateur avec cet email existe déjà"
             )
         
         # Préparation des Données
-        hashed_password = get_password_hash(user_data['password'])
+        hashed_password = await get_password_hash_async(user_data['password'])
         user_id = secrets.token_hex(12)
         now = datetime.now()
         
@@ -49,7 +64,7 @@ async def create_user(user_data: dict, background_tasks = None) -> Token:
         }
         
         # Sauvegarde dans Firebase
-        users_ref.document(user_id).set(user_dict)
+        await repos.users.create(user_id, user_dict)
         
         # Nettoie le cache utilisateur en arrière-plan
         if background_tasks:
@@ -66,6 +81,8 @@ async def create_user(user_data: dict, background_tasks = None) -> Token:
             expires_in=security.settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -76,21 +93,16 @@ async def create_user(user_data: dict, background_tasks = None) -> Token:
 async def authenticate_user(email: str, password: str, background_tasks = None) -> Token:
     try:
         # Recherche par Email
-        users_ref = db.collection('users')
-        query = users_ref.where('email', '==', email).limit(1)
-        users = query.get()
+        user_data = await repos.users.find_by_email(email)
         
-        if not users:
+        if not user_data:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email ou mot de passe incorrect"
             )
         
         #  Vérification du Mot de Passe
-        user_doc = users[0]
-        user_data = user_doc.to_dict()
-        
-        if not verify_password(password, user_data['hashed_password']):
+        if not await verify_password_async(password, user_data['hashed_password']):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email ou mot de passe incorrect"
@@ -1,12 +1,16 @@
 # services/chat_service.py 
 from datetime import datetime
-from google.cloud import firestore
-from core.database import db
+from repositories import repos
 from services.rag_service import rag_service
 from services.agentic_service import agentic_service
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from services.knowledge_management import knowledge_manager
-import re
+from services.conversation_memory import conversation_memory
+from services.conversation_index import conversation_index
+from services.intent_classifier import intent_classifier, embedding_intent_classifier
+from core.vectorstore import vector_store
+from core.background import background_tasks
+from core.executors import run_cpu
 import asyncio
 
 
@@ -17,100 +21,175 @@ class ChatService:
     
     async def process_chat_message(self, user_id: str, message: str, conversation_id: str = None, use_agentic: bool = True):
         """Service de chat unifié avec détection intelligente"""
+        is_new_conversation = not conversation_id
+        if is_new_conversation:
+            # ID généré localement : la sauvegarde peut partir en tâche de fond
+            conversation_id = self._new_conversation_id(user_id)
         try:
             print(f"💬 Message: {message}")
             print(f"Mode agentique: {'ACTIVÉ' if use_agentic else 'DÉSACTIVÉ'}")
             
+            # Étapes indépendantes lancées en parallèle : historique, embedding de la requête, intention
+            history_coro = (
+                self._get_conversation_history(user_id, conversation_id)
+                if not is_new_conversation else self._empty_history()
+            )
+            embedding_task = asyncio.create_task(self._embed_query(message))
+            (conversation_history, conversation_summary), intention = await asyncio.gather(
+                history_coro,
+                self._detect_agentic_intention(message) if use_agentic else self._no_intention(),
+            )
 
-                    # Récupérer l'historique de conversation
-            conversation_history = []
-            if conversation_id:
-                conversation_history = await self._get_conversation_history(user_id, conversation_id)
-
-            # 1. Détection d'intention (seulement si agentique activé)
+            # 1. Action agentique (seulement si agentique activé)
             if use_agentic:
-                intention = await self._detect_agentic_intention(message)
+                intention = await self._refine_intention(message, intention, embedding_task)
                 print(f"Intention détectée: {intention}")
                 
                 if intention["is_agentic"] and intention["confidence"] > 0.6:
-                    return await self._handle_agentic_action(user_id, message, conversation_id, intention, conversation_history)
+                    return await self._handle_agentic_action(
+                        user_id, message, conversation_id, intention, conversation_history,
+                        is_new_conversation=is_new_conversation, embedding_task=embedding_task,
+                        conversation_summary=conversation_summary
+                    )
             
             # 2. Fallback vers RAG standard
-            return await self._handle_rag_response(user_id, message, conversation_id, conversation_history)
+            return await self._handle_rag_response(
+                user_id, message, conversation_id, conversation_history,
+                is_new_conversation=is_new_conversation, query_embedding=await embedding_task,
+                conversation_summary=conversation_summary
+            )
             
         except Exception as e:
             print(f"❌ Erreur traitement chat: {str(e)}")
-            return await self._handle_error(user_id, message, conversation_id, str(e))
+            return await self._handle_error(user_id, message, conversation_id, str(e), is_new_conversation)
+
+    async def _empty_history(self) -> Tuple[List[Dict], Optional[str]]:
+        return [], None
+
+    async def _no_intention(self) -> Dict:
+        return {"is_agentic": False, "confidence": 0.0}
+
+    async def _embed_query(self, message: str) -> Optional[List[float]]:
+        """Embedding de la requête, calculé pendant la récupération de l'historique"""
+        try:
+            return await run_cpu(vector_store.embed_query, message)
+        except Exception as e:
+            print(f"⚠️ Embedding requête indisponible: {e}")
+            return None
+
+    def _new_conversation_id(self, user_id: str) -> str:
+        return repos.conversations.new_id(user_id)
+
+    def _schedule_persistence(self, user_id: str, message: str, response: str, conversation_id: str,
+                              learning_result: Dict, interaction_type: str, is_new_conversation: bool,
+                              is_agentic: bool, action_result: Dict = None, context_info: Dict = None,
+                              query_embedding: List[float] = None):
+        """Apprentissage et sauvegarde hors du chemin de réponse (ordonnés par conversation)"""
+        background_tasks.submit(
+            self._persist_turn, user_id, message, response, conversation_id, learning_result,
+            interaction_type, is_new_conversation, is_agentic, action_result, context_info, query_embedding,
+            key=f"{user_id}/{conversation_id}",
+        )
+
+    async def _persist_turn(self, user_id: str, message: str, response: str, conversation_id: str,
+                            learning_result: Dict, interaction_type: str, is_new_conversation: bool,
+                            is_agentic: bool, action_result: Dict = None, context_info: Dict = None,
+                            query_embedding: List[float] = None):
+        # Sauvegarde d'abord : l'historique du tour suivant en dépend
+        saved = await self._save_conversation(
+            user_id, message, response, conversation_id,
+            is_agentic=is_agentic, action_result=action_result, context_info=context_info,
+            is_new=is_new_conversation
+        )
+        if saved.get("success"):
+            # Repli des anciens messages dans le résumé glissant (tâche séparée)
+            conversation_memory.schedule_fold(user_id, conversation_id)
+            if interaction_type:
+                # Index de la conversation : seq = position du message utilisateur de ce tour
+                await conversation_index.index_turn(
+                    user_id, conversation_id, saved["message_count"] - 2, message, response,
+                    question_embedding=query_embedding
+                )
+        if interaction_type:
+            await knowledge_manager.learn_from_interaction(
+                user_id, message, learning_result, interaction_type, question_embedding=query_embedding
+            )
     
-    async def _handle_agentic_action(self, user_id: str, message: str, conversation_id: str, intention: Dict, conversation_history: List[Dict] = None):
+    async def _enhance_with_knowledge(self, message: str, user_id: str, action_type: str,
+                                      embedding_task: asyncio.Task = None) -> Dict:
+        """Enrichissement par les connaissances, avec l'embedding de la requête dès qu'il est prêt"""
+        query_embedding = await embedding_task if embedding_task else None
+        return await knowledge_manager.enhance_with_knowledge(message, user_id, action_type, query_embedding=query_embedding)
+
+    async def _handle_agentic_action(self, user_id: str, message: str, conversation_id: str, intention: Dict,
+                                     conversation_history: List[Dict] = None, is_new_conversation: bool = False,
+                                     embedding_task: asyncio.Task = None, conversation_summary: str = None):
         """Gère une action agentique"""
         try:
-            # Enrichissement avec les connaissances
-            enriched_context = await knowledge_manager.enhance_with_knowledge(
-                message, user_id, intention["action_type"]
-            )
-            
-            # Exécution de l'action
-            action_result = await self.agentic_service.execute_action(
-                intention["action_type"], 
-                intention["parameters"], 
-                user_id
+            # Enrichissement avec les connaissances et exécution de l'action, en parallèle
+            enriched_context, action_result = await asyncio.gather(
+                self._enhance_with_knowledge(message, user_id, intention["action_type"], embedding_task),
+                self.agentic_service.execute_action(
+                    intention["action_type"], 
+                    intention["parameters"], 
+                    user_id
+                ),
             )
+            query_embedding = await embedding_task if embedding_task else None # Déjà calculé
             
             # Construction de la réponse
             response = self._build_agentic_response(message, action_result)
             
-            # Apprentissage
-            await knowledge_manager.learn_from_interaction(
-                user_id, message, action_result, intention["action_type"]
-            )
-            
-            # Sauvegarde
-            conv_data = await self._save_conversation(
-                user_id, message, response, conversation_id, 
-                is_agentic=True, action_result=action_result
+            # Apprentissage et sauvegarde en tâche de fond
+            self._schedule_persistence(
+                user_id, message, response, conversation_id,
+                learning_result=action_result, interaction_type=intention["action_type"],
+                is_new_conversation=is_new_conversation, is_agentic=True, action_result=action_result,
+                query_embedding=query_embedding
             )
             
             return {
                 "message": response,
-                "conversation_id": conv_data["conversation_id"],
+                "conversation_id": conversation_id,
                 "actions_executed": True,
                 "action_results": action_result
             }
             
         except Exception as e:
             print(f"❌ Erreur action agentique: {e}")
-            return await self._handle_rag_response(user_id, message, conversation_id, conversation_history)
+            query_embedding = await embedding_task if embedding_task else None
+            return await self._handle_rag_response(
+                user_id, message, conversation_id, conversation_history,
+                is_new_conversation=is_new_conversation, query_embedding=query_embedding,
+                conversation_summary=conversation_summary
+            )
     
-    async def _handle_rag_response(self, user_id: str, message: str, conversation_id: str, conversation_history: List[Dict] = None):
+    async def _handle_rag_response(self, user_id: str, message: str, conversation_id: str,
+                                   conversation_history: List[Dict] = None, is_new_conversation: bool = False,
+                                   query_embedding: List[float] = None, conversation_summary: str = None):
         """Gère une réponse RAG standard"""
         try:
-             # Récupérer l'historique de conversation si conversation_id existe
-            conversation_history = []
-            if conversation_id:
-                conversation_history = await self._get_conversation_history(user_id, conversation_id)
-
-             # Passer l'historique de conversation au service RAG
+             # Passer l'historique de conversation (déjà récupéré) au service RAG
             rag_result = await self.rag_service.process_query_with_rag(
                 message, 
                 user_id, 
-                conversation_history=conversation_history
+                conversation_history=conversation_history or [],
+                query_embedding=query_embedding,
+                conversation_summary=conversation_summary,
+                conversation_id=conversation_id if not is_new_conversation else None
             )
 
-            # Apprentissage
-            await knowledge_manager.learn_from_interaction(
-                user_id, message, {"response": rag_result["response"]}, "rag_conversation"
-            )
-            
-            # Sauvegarde
-            conv_data = await self._save_conversation(
-                user_id, message, rag_result["response"], conversation_id, 
-                is_agentic=False, context_info=rag_result
+            # Apprentissage et sauvegarde en tâche de fond
+            self._schedule_persistence(
+                user_id, message, rag_result["response"], conversation_id,
+                learning_result={"response": rag_result["response"]}, interaction_type="rag_conversation",
+                is_new_conversation=is_new_conversation, is_agentic=False, context_info=rag_result,
+                query_embedding=query_embedding
             )
             
             return {
                 "message": rag_result["response"],
-                "conversation_id": conv_data["conversation_id"],
+                "conversation_id": conversation_id,
                 "actions_executed": False,
                 "has_context": rag_result["has_context"]
             }
@@ -119,38 +198,26 @@ class ChatService:
             print(f"❌ Erreur RAG: {e}")
             raise
     
-    async def _get_conversation_history(self, user_id: str, conversation_id: str) -> List[Dict]:
-        """Récupère l'historique d'une conversation spécifique"""
+    async def _get_conversation_history(self, user_id: str, conversation_id: str) -> Tuple[List[Dict], Optional[str]]:
+        """Récupère (derniers messages non résumés, résumé) d'une conversation"""
         try:
-            from core.database import db
-            conv_ref = db.collection('users').document(user_id).collection('conversations').document(conversation_id)
-            conversation = conv_ref.get()
+            # Une seule lecture : tail et résumé sont portés par le document de conversation
+            conv_data = await repos.conversations.get(user_id, conversation_id)
             
-            if conversation.exists:
-                conv_data = conversation.to_dict()
-                messages = conv_data.get('messages', [])
-                
-                # Formater l'historique pour le prompt
-                history = []
-                for msg in messages:
-                    history.append({
-                        "role": msg.get('role', 'user'),
-                        "content": msg.get('content', '')
-                    })
-                
-                return history
+            if conv_data:
+                return conversation_memory.prompt_memory(conv_data)
             
-            return []
+            return [], None
             
         except Exception as e:
             print(f"❌ Erreur récupération historique: {e}")
-            return []
+            return [], None
 
 
 
     async def _save_conversation(self, user_id: str, user_message: str, ai_response: str, 
                                conversation_id: str = None, is_agentic: bool = False, 
-                               action_result: Dict = None, context_info: Dict = None):
+                               action_result: Dict = None, context_info: Dict = None, is_new: bool = None):
         """Sauvegarde la conversation"""
         try:
             message_data = {
@@ -170,25 +237,24 @@ class ChatService:
                 }
             }
 
-            if conversation_id:
-                conv_ref = db.collection('users').document(user_id).collection('conversations').document(conversation_id)
-                conv_ref.update({
-                    'messages': firestore.ArrayUnion([message_data, ai_message_data]),
-                    'updated_at': datetime.now().isoformat()
-                })
+            if is_new is None:
+                is_new = not conversation_id
+
+            if not is_new:
+                written = await repos.conversations.append_messages(
+                    user_id, conversation_id, [message_data, ai_message_data], datetime.now().isoformat()
+                )
             else:
-                new_conv_ref = db.collection('users').document(user_id).collection('conversations').document()
-                conversation_id = new_conv_ref.id
-                new_conv_ref.set({
+                conversation_id = conversation_id or repos.conversations.new_id(user_id)
+                written = await repos.conversations.create(user_id, conversation_id, {
                     'id': conversation_id,
                     'title': user_message[:50] + ("..." if len(user_message) > 50 else ""),
-                    'messages': [message_data, ai_message_data],
                     'created_at': datetime.now().isoformat(),
                     'updated_at': datetime.now().isoformat(),
                     'is_agentic': is_agentic
-                })
+                }, [message_data, ai_message_data])
             
-            return {"conversation_id": conversation_id, "success": True}
+            return {"conversation_id": conversation_id, "success": True, "message_count": written["message_count"]}
             
         except Exception as e:
             print(f"❌ Erreur sauvegarde conversation: {e}")
@@ -196,62 +262,34 @@ class ChatService:
     
     
     async def _detect_agentic_intention(self, message: str) -> Dict:
-        """Détection d'intention agentique améliorée"""
-        message_lower = message.lower()
-        
-        # Patterns plus précis
-        patterns = {
-            "web_search": {
-                "keywords": ["recherche", "cherche", "trouve", "informations", "actualités", 
-                            "nouvelles", "avancées", "tendances", "derniers", "mise à jour",
-                            "quelle est la", "qu'est-ce que", "définition de"],
-                "patterns": [r"recherche.*sur", r"cherche.*info", r"trouve.*sur", 
-                            r"actualités.*ia", r"mise à jour.*2025",r"mise à jour.*2026"]
-            },
-            "code_generation": {
-                "keywords": ["code", "programme", "python", "javascript", "html", "génère", 
-                            "écris", "script", "fonction", "algorithme", "boucle", "variable"],
-                "patterns": [r"génère.*code", r"écris.*programme", r"code.*pour", 
-                            r"python.*pour", r"fonction.*python"]
-            },
-            "document_processing": {
-                "keywords": ["résume", "synthèse", "synthétise", "extrait", "points clés",
-                            "récapitule", "résumé", "synopsis", "abstract"],
-                "patterns": [r"résume.*document", r"synthèse.*pour", r"points clés.*pour"]
-            },
-            "data_analysis": {
-                "keywords": ["analyse", "data", "données", "statistiques", "graphique", 
-                            "tableau", "comparaison", "chiffres", "pourcentage", "statistique"],
-                "patterns": [r"analyse.*données", r"stats.*sur", r"graphique.*pour"]
-            }
+        """Détection d'intention agentique (classifieur compilé, un passage sur le message)"""
+        action_type, confidence = intent_classifier.classify(message)
+        if action_type is None:
+            return {"is_agentic": False, "confidence": 0.0}
+        return {
+            "is_agentic": True,
+            "action_type": action_type,
+            "parameters": self._extract_parameters(action_type, message),
+            "confidence": confidence
+        }
+
+    async def _refine_intention(self, message: str, intention: Dict, embedding_task: asyncio.Task) -> Dict:
+        """Second avis par embeddings quand les mots-clés ne suffisent pas (embedding de la requête réutilisé)"""
+        if embedding_intent_classifier is None or (intention["is_agentic"] and intention["confidence"] > 0.6):
+            return intention
+        try:
+            action_type, similarity = await run_cpu(embedding_intent_classifier.classify, await embedding_task)
+        except Exception as e:
+            print(f"⚠️ Classifieur d'intention par embeddings indisponible: {e}")
+            return intention
+        if action_type is None or similarity <= intention["confidence"]:
+            return intention
+        return {
+            "is_agentic": True,
+            "action_type": action_type,
+            "parameters": self._extract_parameters(action_type, message),
+            "confidence": similarity
         }
-        
-        # Détection avec scoring
-        best_match = {"is_agentic": False, "confidence": 0.0}
-        
-        for action_type, config in patterns.items():
-            # Score basé sur les keywords
-            keyword_matches = [kw for kw in config["keywords"] if kw in message_lower]
-            keyword_score = len(keyword_matches) * 0.2
-            
-            # Score basé sur les patterns regex
-            pattern_score = 0
-            for pattern in config["patterns"]:
-                if re.search(pattern, message_lower):
-                    pattern_score = 0.5
-                    break
-            
-            total_score = keyword_score + pattern_score
-            
-            if total_score > best_match["confidence"]:
-                best_match = {
-                    "is_agentic": True,
-                    "action_type": action_type,
-                    "parameters": self._extract_parameters(action_type, message),
-                    "confidence": min(total_score, 1.0)
-                }
-        
-        return best_match
     
     def _extract_parameters(self, action_type: str, message: str) -> Dict:
         """Extraction des paramètres"""
@@ -315,18 +353,20 @@ class ChatService:
         
         return f"✅ **Action '{action}' exécutée**\n\n{str(result)[:500]}"
     
-    async def _handle_error(self, user_id: str, message: str, conversation_id: str, error: str):
+    async def _handle_error(self, user_id: str, message: str, conversation_id: str, error: str,
+                            is_new_conversation: bool = False):
         """Gère les erreurs"""
         error_message = "Désolé, je rencontre une difficulté technique. Veuillez réessayer."
         
-        conv_data = await self._save_conversation(
-            user_id, message, error_message, conversation_id, 
-            is_agentic=False
+        self._schedule_persistence(
+            user_id, message, error_message, conversation_id,
+            learning_result=None, interaction_type=None,
+            is_new_conversation=is_new_conversation, is_agentic=False
         )
         
         return {
             "message": error_message,
-            "conversation_id": conv_data["conversation_id"],
+            "conversation_id": conversation_id,
             "actions_executed": False
         }
 
@@ -0,0 +1,83 @@
+# services/circuit_breaker.py
+import time
+from typing import Dict
+
+
+class CircuitBreaker:
+    """Disjoncteur par modèle : closed (normal), open (rejet immédiat), half_open (requête de test)"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: float = 30.0,
+                 max_recovery_timeout: float = 300.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold # Échecs consécutifs avant ouverture
+        self.base_recovery_timeout = recovery_timeout
+        self.recovery_timeout = recovery_timeout # Doublé à chaque test raté (plafonné)
+        self.max_recovery_timeout = max_recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.transitions = 0
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            self.transitions += 1
+
+    def allow_request(self) -> bool:
+        """Indique si le modèle peut être sollicité (sans réserver de place)"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self._set_state(self.HALF_OPEN)
+            self.half_open_calls = 0
+        if self.state == self.OPEN:
+            return False
+        if self.state == self.HALF_OPEN:
+            return self.half_open_calls < self.half_open_max_calls
+        return True
+
+    def try_acquire(self) -> bool:
+        """Réserve une place (une seule requête de test en half_open)"""
+        if not self.allow_request():
+            return False
+        if self.state == self.HALF_OPEN:
+            self.half_open_calls += 1
+        return True
+
+    def release(self):
+        """Libère une place sans verdict (requête annulée ou limitée en débit)"""
+        if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+            self.recovery_timeout = self.base_recovery_timeout
+            self.half_open_calls = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            # Test raté : on rouvre plus longtemps
+            self.recovery_timeout = min(self.recovery_timeout * 2, self.max_recovery_timeout)
+            self._open()
+        elif self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self._set_state(self.OPEN)
+        self.opened_at = time.monotonic()
+        self.half_open_calls = 0
+
+    def to_dict(self) -> Dict:
+        self.allow_request() # Met à jour l'état si le délai de récupération est écoulé
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "recovery_timeout": self.recovery_timeout,
+            "transitions": self.transitions,
+        }
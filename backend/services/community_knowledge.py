@@ -0,0 +1,233 @@
+# services/community_knowledge.py
+import hashlib
+import os
+import pickle
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List
+import faiss
+import numpy as np
+from core.config import settings
+from core.background import background_tasks
+from core.executors import run_cpu
+from core.vectorstore import vector_store, knowledge_vector_key
+from repositories import repos
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"(?<!\d)(?:\+\d{1,3}[\s.-]?)?(?:\d[\s.-]?){9,12}\d(?!\d)")
+
+
+def anonymize_text(text: str) -> str:
+    """Masque les coordonnées personnelles avant partage"""
+    return _PHONE.sub("[téléphone]", _EMAIL.sub("[email]", text or ""))
+
+
+def community_id(user_id: str, entry_id: str) -> str:
+    # Identifiant stable sans révéler l'utilisateur (dédoublonnage, retrait)
+    return hashlib.sha1(f"{user_id}/{entry_id}".encode("utf-8")).hexdigest()[:20]
+
+
+class CommunityKnowledge:
+    """Partition vectorielle anonymisée des connaissances à forte valeur, partagée entre utilisateurs.
+
+    Index HNSW (recherche approchée en O(log n)) sur embeddings normalisés : le score est une similarité cosinus.
+    Les entrées y sont promues en tâche de fond, jamais sur le chemin de la requête.
+    """
+
+    def __init__(self, persist_directory: str = None):
+        self.persist_directory = persist_directory or settings.COMMUNITY_INDEX_DIR
+        self.min_value_score = settings.COMMUNITY_MIN_VALUE_SCORE
+        self.min_similarity = settings.COMMUNITY_MIN_SIMILARITY
+        self.save_every = settings.COMMUNITY_SAVE_EVERY # Promotions entre deux sauvegardes
+        self.hnsw_m = 32
+        self.ef_search = 64
+        self.index = None
+        self.entries: List[Dict] = [] # Position = ID FAISS
+        self.ids = set()
+        self.tombstones = set() # community_id retirés (HNSW sans suppression) : filtrés, puis compactés
+        self.compact_ratio = 0.2
+        self._lock = threading.Lock() # Ajouts et recherches HNSW depuis plusieurs threads
+        self._dirty = 0
+        self.stats = {"promoted": 0, "duplicates": 0, "searches": 0, "hits": 0, "backfilled": 0, "removed": 0}
+
+    def init(self):
+        """Chargement depuis le disque (appelé depuis le lifespan) ; index créé au premier ajout sinon"""
+        index_path = os.path.join(self.persist_directory, "community_index")
+        entries_path = os.path.join(self.persist_directory, "community_entries.pkl")
+        tombstones_path = os.path.join(self.persist_directory, "community_tombstones.pkl")
+        if self.index is not None or not (os.path.exists(index_path) and os.path.exists(entries_path)):
+            return
+        try:
+            index = faiss.read_index(index_path)
+            with open(entries_path, "rb") as f:
+                entries = pickle.load(f)
+            if index.ntotal != len(entries):
+                raise ValueError(f"{index.ntotal} vecteurs pour {len(entries)} entrées")
+            index.hnsw.efSearch = self.ef_search
+            self.index, self.entries = index, entries
+            self.ids = {entry["community_id"] for entry in entries}
+            if os.path.exists(tombstones_path):
+                with open(tombstones_path, "rb") as f:
+                    self.tombstones = pickle.load(f) & self.ids
+            print(f"✅ Connaissances communautaires chargées ({len(entries)} entrées)")
+        except Exception as e:
+            print(f"❌ Erreur chargement connaissances communautaires: {e} - index recréé à la demande")
+
+    @property
+    def size(self) -> int:
+        return len(self.entries) - len(self.tombstones)
+
+    def _normalize(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[np.newaxis, :]
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def _add(self, entries: List[Dict], vectors) -> int:
+        """Ajoute les entrées absentes (thread CPU)"""
+        vectors = self._normalize(vectors)
+        with self._lock:
+            fresh = [i for i, entry in enumerate(entries) if entry["community_id"] not in self.ids]
+            if not fresh:
+                return 0
+            if self.index is None:
+                self.index = faiss.IndexHNSWFlat(vectors.shape[1], self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+                self.index.hnsw.efSearch = self.ef_search
+            self.index.add(vectors[fresh])
+            for i in fresh:
+                self.entries.append(entries[i])
+                self.ids.add(entries[i]["community_id"])
+            self._dirty += len(fresh)
+            should_save = self._dirty >= self.save_every
+        if should_save:
+            self.save()
+        return len(fresh)
+
+    def _to_community_entry(self, user_id: str, entry: Dict) -> Dict:
+        return {
+            # Révisée (réponse remplacée) : nouvel identifiant, l'ancienne version est retirée
+            "community_id": community_id(user_id, knowledge_vector_key(
+                entry.get("id", entry.get("question", "")), entry.get("response_revision", 0)
+            )),
+            "question": anonymize_text(entry.get("question", "")),
+            "response": anonymize_text(entry.get("response", "")),
+            "value_score": entry.get("value_score", 0.0),
+            "interaction_type": entry.get("interaction_type"),
+            "promoted_at": datetime.now().isoformat(),
+        }
+
+    def schedule_promotion(self, user_id: str, entry: Dict, question_embedding: List[float] = None):
+        """Planifie la promotion d'une entrée à forte valeur (clé unique : ajouts sérialisés)"""
+        if entry.get("value_score", 0.0) >= self.min_value_score:
+            background_tasks.submit(self.promote, user_id, entry, question_embedding, key="community_knowledge")
+
+    async def promote(self, user_id: str, entry: Dict, question_embedding: List[float] = None):
+        community_entry = self._to_community_entry(user_id, entry)
+        if community_entry["community_id"] in self.ids:
+            self.stats["duplicates"] += 1
+            return
+        if question_embedding is None:
+            question_embedding = await run_cpu(vector_store.embed_query, community_entry["question"])
+        added = await run_cpu(self._add, [community_entry], [question_embedding])
+        self.stats["promoted"] += added
+        if added:
+            print(f"🌐 Connaissance promue dans la base communautaire ({self.size} entrées)")
+
+    async def backfill(self, limit: int = None):
+        """Promotion initiale des entrées existantes (une fois, si la partition est vide)"""
+        if self.size:
+            return
+        docs = await repos.knowledge.find_global(min_score=self.min_value_score, limit=limit or settings.COMMUNITY_BACKFILL_LIMIT)
+        entries = [self._to_community_entry(doc.get("user_id", ""), doc) for doc in docs if doc.get("question")]
+        if not entries:
+            return
+        # Un seul passage d'embedding pour tout le lot
+        vectors = await run_cpu(vector_store.embed_documents, [entry["question"] for entry in entries])
+        self.stats["backfilled"] += await run_cpu(self._add, entries, vectors)
+        await run_cpu(self.save)
+
+    def remove(self, community_ids: Iterable[str]) -> int:
+        """Retire des entrées de la recherche ; index reconstruit au-delà de `compact_ratio` (thread CPU)"""
+        with self._lock:
+            removed = (set(community_ids) & self.ids) - self.tombstones
+            if not removed:
+                return 0
+            self.tombstones |= removed
+            self._dirty += len(removed)
+            should_compact = len(self.tombstones) / max(len(self.entries), 1) >= self.compact_ratio
+        self.stats["removed"] += len(removed)
+        if should_compact:
+            self.compact()
+        return len(removed)
+
+    def compact(self):
+        """Reconstruit l'index HNSW sans les entrées retirées, puis sauvegarde"""
+        with self._lock:
+            if self.index is None:
+                return
+            kept = [position for position, entry in enumerate(self.entries) if entry["community_id"] not in self.tombstones]
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)[kept]
+            index = faiss.IndexHNSWFlat(self.index.d, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = self.ef_search
+            if kept:
+                index.add(np.ascontiguousarray(vectors))
+            removed = len(self.entries) - len(kept)
+            self.index, self.entries = index, [self.entries[position] for position in kept]
+            self.ids = {entry["community_id"] for entry in self.entries}
+            self.tombstones = set()
+            self._dirty += 1
+        self.save()
+        print(f"🧹 Base communautaire compactée ({removed} entrées retirées, {self.size} restantes)")
+
+    def search(self, query_embedding: List[float], k: int = 5) -> List[Dict]:
+        """Une recherche approchée ; entrées au-dessus du seuil de similarité (thread CPU)"""
+        if self.index is None or query_embedding is None:
+            return []
+        query = self._normalize(query_embedding)
+        with self._lock:
+            # Marge pour les entrées retirées, filtrées après la recherche
+            similarities, positions = self.index.search(query, k + min(len(self.tombstones), 4 * k))
+        self.stats["searches"] += 1
+        results = []
+        for similarity, position in zip(similarities[0], positions[0]):
+            if position < 0 or similarity < self.min_similarity:
+                continue
+            entry = self.entries[position]
+            if entry["community_id"] in self.tombstones:
+                continue
+            results.append({**entry, "similarity": round(float(similarity), 3)})
+        results = results[:k]
+        self.stats["hits"] += len(results)
+        return results
+
+    def save(self):
+        """Sauvegarde atomique index + entrées"""
+        with self._lock:
+            if self.index is None or not self._dirty:
+                return
+            try:
+                os.makedirs(self.persist_directory, exist_ok=True)
+                index_path = os.path.join(self.persist_directory, "community_index")
+                entries_path = os.path.join(self.persist_directory, "community_entries.pkl")
+                tombstones_path = os.path.join(self.persist_directory, "community_tombstones.pkl")
+                faiss.write_index(self.index, index_path + ".tmp")
+                with open(entries_path + ".tmp", "wb") as f:
+                    pickle.dump(self.entries, f)
+                with open(tombstones_path + ".tmp", "wb") as f:
+                    pickle.dump(self.tombstones, f)
+                os.replace(index_path + ".tmp", index_path)
+                os.replace(entries_path + ".tmp", entries_path)
+                os.replace(tombstones_path + ".tmp", tombstones_path)
+                self._dirty = 0
+            except Exception as e:
+                print(f"❌ Erreur sauvegarde connaissances communautaires: {e}")
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "size": self.size, "index_type": "HNSW", "pending_save": self._dirty,
+                "tombstones": len(self.tombstones)}
+
+
+# Instance globale
+community_knowledge = CommunityKnowledge()
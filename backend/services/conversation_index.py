@@ -0,0 +1,137 @@
+# services/conversation_index.py
+import hashlib
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from core.config import settings
+from core.cache import TTLCache, invalidation_bus
+from core.executors import run_cpu
+from core.tokenizer import compress_to_tokens
+from core.vectorstore import vector_store
+from repositories import repos
+
+
+def question_key(question: str) -> str:
+    """Empreinte d'une question (reconnaît les tours déjà présents dans l'historique du prompt)"""
+    return hashlib.sha1(question.strip().encode("utf-8")).hexdigest()[:16]
+
+
+class _TurnIndex:
+    """Vecteurs normalisés d'une conversation, une ligne par tour"""
+
+    def __init__(self, entries: List[Dict]):
+        self.entries: List[Dict] = []
+        self.matrix: Optional[np.ndarray] = None
+        self.seqs = set()
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: Dict):
+        if entry["seq"] in self.seqs:
+            return # Tour déjà indexé (rejeu d'une sauvegarde)
+        vector = np.asarray(entry["vector"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return
+        row = (vector / norm)[np.newaxis, :]
+        self.matrix = row if self.matrix is None else np.vstack([self.matrix, row])
+        self.entries.append({key: value for key, value in entry.items() if key != "vector"})
+        self.seqs.add(entry["seq"])
+
+    def search(self, query: np.ndarray, k: int, min_score: float, exclude: set) -> List[Dict]:
+        if self.matrix is None:
+            return []
+        scores = self.matrix @ query
+        results = []
+        for index in np.argsort(-scores):
+            score = float(scores[index])
+            if score < min_score or len(results) >= k:
+                break
+            if self.entries[index].get("question_key") in exclude:
+                continue
+            results.append({**self.entries[index], "score": round(score, 3)})
+        return results
+
+
+class ConversationIndex:
+    """Index vectoriel par conversation : retrouve les anciens tours liés à la nouvelle question"""
+
+    channel = "conversations"
+
+    def __init__(self):
+        self.enabled = settings.CONVERSATION_INDEX_ENABLED
+        self.top_k = settings.CONVERSATION_INDEX_TOP_K
+        self.min_score = settings.CONVERSATION_INDEX_MIN_SCORE
+        self.max_question_tokens = 150
+        self.max_answer_tokens = 300 # Extrait de réponse remis dans le prompt
+        self.cache = TTLCache(
+            "conversation_index", maxsize=settings.CONVERSATION_INDEX_CACHE_SIZE,
+            ttl=settings.CONVERSATION_CACHE_TTL, negative_ttl=0
+        )
+        self.stats = {"indexed_turns": 0, "searches": 0, "hits": 0, "errors": 0}
+        invalidation_bus.subscribe(self.channel, self.cache.invalidate) # Tours indexés par un autre worker
+
+    @staticmethod
+    def _key(user_id: str, conversation_id: str) -> str:
+        return f"{user_id}/{conversation_id}"
+
+    async def _load(self, user_id: str, conversation_id: str) -> _TurnIndex:
+        entries = await repos.conversations.get_turn_vectors(user_id, conversation_id)
+        return _TurnIndex(entries)
+
+    async def index_turn(self, user_id: str, conversation_id: str, seq: int, question: str, answer: str,
+                         question_embedding: List[float] = None):
+        """Indexe un tour sauvegardé ; l'embedding de la question déjà calculé pour le RAG est réutilisé"""
+        if not self.enabled:
+            return
+        try:
+            if question_embedding is None:
+                question_embedding = await run_cpu(vector_store.embed_query, question)
+            entry = {
+                "seq": seq,
+                "question": compress_to_tokens(question, self.max_question_tokens),
+                "answer": compress_to_tokens(answer, self.max_answer_tokens),
+                "question_key": question_key(question),
+                "vector": [float(value) for value in question_embedding],
+            }
+            await repos.conversations.add_turn_vectors(user_id, conversation_id, [entry])
+
+            key = self._key(user_id, conversation_id)
+            cached = self.cache.peek(key, None)
+            if cached is not None:
+                cached.add(entry) # Mise à jour incrémentale, sans relire l'index
+            else:
+                self.cache.invalidate(key) # Un chargement en cours ne verrait pas ce tour
+            self.stats["indexed_turns"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Erreur indexation du tour: {e}")
+
+    async def search(self, user_id: str, conversation_id: str, query_embedding: List[float],
+                     exclude_questions: Iterable[str] = (), k: int = None) -> List[Dict]:
+        """Tours les plus proches de la question (hors tours déjà dans l'historique du prompt)"""
+        if not self.enabled or not conversation_id or query_embedding is None:
+            return []
+        try:
+            index = await self.cache.get_or_load(
+                self._key(user_id, conversation_id), lambda: self._load(user_id, conversation_id)
+            )
+            query = np.asarray(query_embedding, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if not norm:
+                return []
+            exclude = {question_key(question) for question in exclude_questions}
+            results = index.search(query / norm, k or self.top_k, self.min_score, exclude)
+            self.stats["searches"] += 1
+            self.stats["hits"] += len(results)
+            return results
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ Recherche dans la conversation indisponible: {e}")
+            return []
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "enabled": self.enabled, "cache": self.cache.get_stats()}
+
+
+# Instance globale
+conversation_index = ConversationIndex()
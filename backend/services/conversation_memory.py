@@ -0,0 +1,109 @@
+# services/conversation_memory.py
+from typing import Dict, List, Optional, Tuple
+from core.config import settings
+from core.background import background_tasks
+from core.tokenizer import compress_to_tokens, truncate_to_tokens
+from repositories import repos
+from repositories.base import conversation_tail, message_count, unsummarized_tail
+from services.llm_service import llm_service
+
+SUMMARY_PROMPT = """Tu maintiens le résumé d'une conversation entre un utilisateur et un assistant IA.
+
+RÉSUMÉ ACTUEL:
+{summary}
+
+NOUVEAUX MESSAGES À INTÉGRER:
+{messages}
+
+Réécris le résumé en intégrant les nouveaux messages. Conserve les faits, décisions, contraintes,
+noms (fichiers, fonctions, données) et questions encore ouvertes ; omets les formules de politesse
+et le code détaillé. {max_words} mots maximum, en français.
+
+RÉSUMÉ MIS À JOUR:"""
+
+
+class ConversationMemory:
+    """Résumé glissant par conversation : les anciens messages sont repliés en tâche de fond"""
+
+    def __init__(self):
+        self.enabled = settings.CONVERSATION_SUMMARY_ENABLED
+        self.keep_recent = settings.CONVERSATION_SUMMARY_KEEP_RECENT # Messages récents envoyés tels quels
+        self.fold_batch = settings.CONVERSATION_SUMMARY_FOLD_BATCH # Nb minimum de messages à replier
+        self.max_summary_tokens = settings.CONVERSATION_SUMMARY_MAX_TOKENS
+        self.max_message_tokens = 500 # Un long bloc de code ne doit pas saturer l'appel de résumé
+        self.max_fold_messages = 20 # Rattrapage borné (conversation ancienne jamais résumée)
+        self.stats = {"folds": 0, "folded_messages": 0, "skipped": 0, "errors": 0}
+
+    def prompt_memory(self, conversation: Dict) -> Tuple[List[Dict], Optional[str]]:
+        """(messages récents non résumés, résumé) à placer dans le prompt"""
+        summary = conversation.get("summary") if self.enabled else None
+        messages = unsummarized_tail(conversation) if summary else conversation_tail(conversation)
+        history = [{"role": msg.get("role", "user"), "content": msg.get("content", "")} for msg in messages]
+        return history, summary
+
+    def schedule_fold(self, user_id: str, conversation_id: str):
+        """Planifie le repli après la sauvegarde d'un tour (clé distincte : n'attarde pas les sauvegardes)"""
+        if self.enabled:
+            background_tasks.submit(self.fold, user_id, conversation_id, key=f"summary/{user_id}/{conversation_id}")
+
+    async def fold(self, user_id: str, conversation_id: str):
+        """Intègre au résumé les messages plus anciens que les `keep_recent` derniers"""
+        conversation = await repos.conversations.get(user_id, conversation_id)
+        if not conversation:
+            return
+        summarized = conversation.get("summary_upto", 0)
+        fold_until = message_count(conversation) - self.keep_recent
+        if fold_until - summarized < self.fold_batch:
+            self.stats["skipped"] += 1
+            return
+
+        try:
+            messages = await self._messages_to_fold(user_id, conversation_id, conversation, summarized, fold_until)
+            summary = await self._summarize(conversation.get("summary"), messages)
+            if not summary:
+                return
+            await repos.conversations.update_conversation(user_id, conversation_id, {
+                "summary": summary,
+                "summary_upto": fold_until,
+            })
+            self.stats["folds"] += 1
+            self.stats["folded_messages"] += len(messages)
+            print(f"🧠 Résumé de conversation mis à jour ({len(messages)} messages intégrés)")
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Erreur résumé de conversation: {e}")
+
+    async def _messages_to_fold(self, user_id: str, conversation_id: str, conversation: Dict,
+                                start: int, end: int) -> List[Dict]:
+        tail = conversation_tail(conversation)
+        tail_start = message_count(conversation) - len(tail)
+        if start >= tail_start:
+            # Cas courant : les messages à replier sont déjà dans le tail (aucune lecture)
+            return tail[start - tail_start:end - tail_start]
+        count = min(message_count(conversation) - start, self.max_fold_messages + self.keep_recent)
+        recent = await repos.conversations.get_messages(user_id, conversation_id, limit=count)
+        return recent[:len(recent) - self.keep_recent]
+
+    async def _summarize(self, previous_summary: Optional[str], messages: List[Dict]) -> Optional[str]:
+        if not messages:
+            return previous_summary
+        lines = []
+        for msg in messages:
+            content = compress_to_tokens(msg.get("content", ""), self.max_message_tokens)
+            lines.append(f"{msg.get('role', 'user')}: {content}")
+        prompt = SUMMARY_PROMPT.format(
+            summary=previous_summary or "(aucun)",
+            messages="\n\n".join(lines),
+            max_words=int(self.max_summary_tokens * 0.6),
+        )
+        summary = await llm_service.get_response([{"role": "user", "content": prompt}], priority="background")
+        if not summary or llm_service.is_fallback(summary):
+            return None
+        return truncate_to_tokens(summary.strip(), self.max_summary_tokens)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "enabled": self.enabled}
+
+
+# Instance globale
+conversation_memory = ConversationMemory()
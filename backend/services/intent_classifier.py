@@ -0,0 +1,172 @@
+# services/intent_classifier.py
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from core.config import settings
+
+try:
+    import ahocorasick # pyahocorasick (optionnel)
+except ImportError:
+    ahocorasick = None
+
+# Intentions agentiques : mots-clés (présence), expressions régulières et exemples (classifieur par embeddings).
+# Remplaçables par un fichier JSON de même structure (INTENT_PATTERNS_FILE).
+DEFAULT_INTENT_PATTERNS = {
+    "web_search": {
+        "keywords": ["recherche", "cherche", "trouve", "informations", "actualités",
+                     "nouvelles", "avancées", "tendances", "derniers", "mise à jour",
+                     "quelle est la", "qu'est-ce que", "définition de"],
+        "patterns": [r"recherche.*sur", r"cherche.*info", r"trouve.*sur",
+                     r"actualités.*ia", r"mise à jour.*2025", r"mise à jour.*2026"],
+        "examples": ["Cherche les dernières actualités sur l'IA",
+                     "Trouve des informations récentes sur ce sujet"],
+    },
+    "code_generation": {
+        "keywords": ["code", "programme", "python", "javascript", "html", "génère",
+                     "écris", "script", "fonction", "algorithme", "boucle", "variable"],
+        "patterns": [r"génère.*code", r"écris.*programme", r"code.*pour",
+                     r"python.*pour", r"fonction.*python"],
+        "examples": ["Écris une fonction Python qui trie une liste",
+                     "Génère un script JavaScript pour valider un formulaire"],
+    },
+    "document_processing": {
+        "keywords": ["résume", "synthèse", "synthétise", "extrait", "points clés",
+                     "récapitule", "résumé", "synopsis", "abstract"],
+        "patterns": [r"résume.*document", r"synthèse.*pour", r"points clés.*pour"],
+        "examples": ["Résume ce document en quelques points clés",
+                     "Fais une synthèse de ce texte"],
+    },
+    "data_analysis": {
+        "keywords": ["analyse", "data", "données", "statistiques", "graphique",
+                     "tableau", "comparaison", "chiffres", "pourcentage", "statistique"],
+        "patterns": [r"analyse.*données", r"stats.*sur", r"graphique.*pour"],
+        "examples": ["Analyse ces données et donne les statistiques principales",
+                     "Fais un graphique comparant ces chiffres"],
+    },
+}
+
+KEYWORD_WEIGHT = 0.2 # Par mot-clé distinct trouvé
+PATTERN_WEIGHT = 0.5 # Si au moins une expression correspond
+
+
+def load_intent_patterns(path: str = None) -> Dict:
+    """Patterns depuis un fichier JSON, sinon ceux par défaut"""
+    if not path:
+        return DEFAULT_INTENT_PATTERNS
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            patterns = json.load(f)
+        print(f"✅ Patterns d'intention chargés: {path}")
+        return patterns
+    except Exception as e:
+        print(f"⚠️ Patterns d'intention illisibles ({path}), valeurs par défaut: {e}")
+        return DEFAULT_INTENT_PATTERNS
+
+
+class KeywordMatcher:
+    """Mots-clés présents dans un texte : automate d'Aho-Corasick (un passage) si pyahocorasick est installé,
+    sinon recherches de sous-chaînes précompilées (plus rapides qu'un automate écrit en Python pur)"""
+
+    def __init__(self, keywords: Iterable[Tuple[str, object]]):
+        self.keywords = list(keywords)
+        self._automaton = None
+        if ahocorasick is not None and self.keywords:
+            grouped: Dict[str, List] = {}
+            for keyword, value in self.keywords:
+                grouped.setdefault(keyword, []).append(value)
+            self._automaton = ahocorasick.Automaton()
+            for keyword, values in grouped.items():
+                self._automaton.add_word(keyword, tuple(values))
+            self._automaton.make_automaton()
+
+    @property
+    def engine(self) -> str:
+        return "aho-corasick" if self._automaton is not None else "substring"
+
+    def find(self, text: str) -> set:
+        """Valeurs des mots-clés présents dans `text` (chaque mot-clé compté une fois)"""
+        if self._automaton is not None:
+            found = set()
+            for _, values in self._automaton.iter(text):
+                found.update(values)
+            return found
+        return {value for keyword, value in self.keywords if keyword in text}
+
+
+class IntentClassifier:
+    """Classifieur d'intention compilé une fois : automate de mots-clés + une alternance regex par intention"""
+
+    def __init__(self, patterns: Dict = None):
+        self.patterns = patterns or load_intent_patterns(settings.INTENT_PATTERNS_FILE)
+        self.intents = list(self.patterns) # L'ordre départage les égalités
+        self.keywords = KeywordMatcher(
+            (keyword.lower(), (intent, keyword.lower()))
+            for intent, config in self.patterns.items()
+            for keyword in config.get("keywords", [])
+        )
+        self.regexes = {
+            intent: re.compile("|".join(f"(?:{pattern})" for pattern in config["patterns"]))
+            for intent, config in self.patterns.items() if config.get("patterns")
+        }
+
+    def scores(self, message: str) -> Dict[str, float]:
+        message_lower = message.lower()
+        keyword_counts = dict.fromkeys(self.intents, 0)
+        for intent, _ in self.keywords.find(message_lower):
+            keyword_counts[intent] += 1
+        return {
+            intent: keyword_counts[intent] * KEYWORD_WEIGHT
+            + (PATTERN_WEIGHT if intent in self.regexes and self.regexes[intent].search(message_lower) else 0)
+            for intent in self.intents
+        }
+
+    def classify(self, message: str) -> Tuple[Optional[str], float]:
+        """(intention, confiance) ; (None, 0.0) si aucune correspondance"""
+        best_intent, confidence = None, 0.0
+        for intent, score in self.scores(message).items():
+            # Comparé à la confiance plafonnée (comme l'ancien detect) : au-delà de 1.0, la première intention garde la main
+            if score > confidence:
+                best_intent, confidence = intent, min(score, 1.0)
+        return best_intent, confidence
+
+
+class EmbeddingIntentClassifier:
+    """Similarité entre l'embedding de la requête (déjà calculé pour le RAG) et des exemples par intention"""
+
+    def __init__(self, patterns: Dict, min_similarity: float):
+        self.examples = [
+            (intent, example) for intent, config in patterns.items() for example in config.get("examples", [])
+        ]
+        self.min_similarity = min_similarity
+        self._matrix: Optional[np.ndarray] = None
+
+    def _prototypes(self) -> np.ndarray:
+        if self._matrix is None:
+            # Exemples encodés une seule fois, au premier appel
+            from core.vectorstore import vector_store
+            vectors = np.asarray(vector_store.embed_documents([example for _, example in self.examples]), dtype=np.float32)
+            self._matrix = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return self._matrix
+
+    def classify(self, query_embedding: List[float]) -> Tuple[Optional[str], float]:
+        if not self.examples or query_embedding is None:
+            return None, 0.0
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None, 0.0
+        similarities = self._prototypes() @ (query / norm)
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.min_similarity:
+            return None, 0.0
+        return self.examples[best][0], similarity
+
+
+# Instances globales
+intent_classifier = IntentClassifier()
+embedding_intent_classifier = (
+    EmbeddingIntentClassifier(intent_classifier.patterns, settings.INTENT_EMBEDDING_MIN_SIMILARITY)
+    if settings.INTENT_EMBEDDING_ENABLED else None
+)
@@ -0,0 +1,232 @@
+# services/knowledge_dedup.py
+import hashlib
+import re
+import unicodedata
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from core.config import settings
+from core.cache import TTLCache
+from core.background import background_tasks
+from repositories import repos
+
+LSH_VERSION = 2 # À incrémenter si les signatures changent (reconstruction automatique)
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_TOKEN = re.compile(r"\w+")
+
+# Mots outils (sans accents) : ils rapprochent des questions sans rapport ("qu'est-ce que Python/Java").
+# Les interrogatifs et les négations (comment, pourquoi, pas, sans...) sont conservés : ils changent le sens.
+STOPWORDS = frozenset({
+    "le", "la", "les", "l", "un", "une", "des", "du", "de", "d", "et", "ou", "a", "au", "aux", "en",
+    "dans", "sur", "pour", "par", "avec", "ce", "cet", "cette", "ces", "c", "est", "qu", "que", "qui",
+    "se", "s", "y", "il", "elle", "on", "je", "j", "tu", "nous", "vous", "me", "m", "te", "t", "moi",
+    "mon", "ma", "mes", "ton", "ta", "tes", "son", "sa", "ses", "the", "an", "of", "to", "in", "on",
+    "for", "is", "are", "and", "or",
+})
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Mots en minuscules et sans accents ("Écris" == "ecris"), ponctuation ignorée"""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return _TOKEN.findall("".join(char for char in text if not unicodedata.combining(char)))
+
+
+def shingles(text: str) -> Set[str]:
+    """Mots porteurs de sens et paires de mots consécutifs : l'ordre et le mot qui diffère pèsent
+    ("trie une liste" / "inverse une liste" ne partagent plus que le contexte)"""
+    words = [word for word in normalize_tokens(text) if word not in STOPWORDS]
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def is_near_duplicate(question: str, other: str, threshold: float = None) -> bool:
+    """Quasi-doublon : similarité de Jaccard exacte des shingles au-dessus du seuil"""
+    threshold = settings.KNOWLEDGE_DEDUP_THRESHOLD if threshold is None else threshold
+    return jaccard(shingles(question), shingles(other)) >= threshold
+
+
+def same_question(question: str, other: str) -> bool:
+    """Même question à la casse, aux accents et à la ponctuation près : seul cas où une réponse
+    peut en remplacer une autre (un quasi-doublon n'est qu'une utilisation de plus)"""
+    tokens = normalize_tokens(question)
+    return bool(tokens) and tokens == normalize_tokens(other)
+
+
+class MinHashLSH:
+    """Signatures MinHash découpées en bandes : deux textes partagent un seau avec une probabilité
+    qui croît fortement avec leur similarité de Jaccard (seuil ≈ (1/bandes)^(1/lignes))"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm doit être un multiple de bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Graine fixe : mêmes seaux d'un processus (et d'un redémarrage) à l'autre
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens: Set[str]) -> Optional[np.ndarray]:
+        if not tokens:
+            return None
+        # crc32 plutôt que hash() : ce dernier change à chaque démarrage de Python
+        hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME).min(axis=0)
+
+    def bucket_keys(self, tokens: Set[str]) -> List[str]:
+        signature = self.signature(tokens)
+        if signature is None:
+            return []
+        return [
+            f"b{band:02d}_" + hashlib.sha1(signature[band * self.rows:(band + 1) * self.rows].tobytes()).hexdigest()[:16]
+            for band in range(self.bands)
+        ]
+
+
+class KnowledgeDeduplicator:
+    """Fusion des quasi-doublons à l'apprentissage : seaux LSH persistés par utilisateur, vérification
+    par similarité de Jaccard exacte sur les candidates (une lecture des seaux, une des entrées par lot).
+    La réponse enregistrée n'est remplacée que pour la même question normalisée (`same_question`)"""
+
+    def __init__(self):
+        self.enabled = settings.KNOWLEDGE_DEDUP_ENABLED
+        self.threshold = settings.KNOWLEDGE_DEDUP_THRESHOLD
+        self.lsh = MinHashLSH(settings.KNOWLEDGE_DEDUP_NUM_PERM, settings.KNOWLEDGE_DEDUP_BANDS)
+        self.built = TTLCache("knowledge_lsh_state", maxsize=4096, ttl=settings.KNOWLEDGE_INDEX_CACHE_TTL)
+        self.stats = {"checked": 0, "merged": 0, "merged_in_batch": 0, "responses_replaced": 0, "indexed": 0, "unindexed": 0, "rebuilds": 0}
+
+    @staticmethod
+    def _merge_into(target: Dict, duplicate: Dict):
+        """Fusion en mémoire (lot en cours) : usage cumulé, meilleure réponse conservée pour la même question"""
+        target["usage_count"] = target.get("usage_count", 1) + duplicate.get("usage_count", 1)
+        if (duplicate.get("value_score", 0.0) > target.get("value_score", 0.0)
+                and same_question(target.get("question", ""), duplicate.get("question", ""))):
+            target["response"] = duplicate.get("response", "")
+            target["value_score"] = duplicate["value_score"]
+
+    async def is_built(self, user_id: str) -> bool:
+        built = self.built.get(user_id, None)
+        if built is None:
+            meta = await repos.knowledge.get_meta(user_id, "lsh")
+            built = bool(meta) and meta.get("version") == LSH_VERSION
+            self.built.set(user_id, built)
+        return built
+
+    async def deduplicate(self, events: List[Tuple[str, Dict, List[float]]]
+                          ) -> Tuple[List[Tuple[str, Dict, List[float]]], List[Tuple[str, Dict, List[float], bool]]]:
+        """(événements à insérer, entrées existantes mises à jour par une fusion + réponse remplacée ?)"""
+        if not self.enabled or not events:
+            return events, []
+        self.stats["checked"] += len(events)
+
+        # 1. Quasi-doublons à l'intérieur du lot (quelques dizaines d'événements : comparaison directe)
+        pending: Dict[str, List[Tuple[Set[str], Tuple]]] = {}
+        for event in events:
+            user_id, entry, _ = event
+            tokens = shingles(entry.get("question", ""))
+            twin = next((other for other_tokens, other in pending.get(user_id, [])
+                         if jaccard(tokens, other_tokens) >= self.threshold), None)
+            if twin is not None:
+                self._merge_into(twin[1], entry)
+                self.stats["merged_in_batch"] += 1
+            else:
+                pending.setdefault(user_id, []).append((tokens, event))
+
+        # 2. Quasi-doublons d'entrées déjà enregistrées, par utilisateur
+        fresh, merged = [], []
+        for user_id, user_events in pending.items():
+            if not await self.is_built(user_id):
+                self.schedule_rebuild(user_id) # Entrées antérieures aux seaux : indexées en fond
+            duplicates = await self._find_existing(user_id, user_events)
+            for tokens, event in user_events:
+                existing = duplicates.get(event[1]["id"])
+                replaced = await self._merge_existing(user_id, existing, event[1]) if existing else None
+                if replaced is not None:
+                    merged.append((user_id, existing, event[2], replaced))
+                else:
+                    fresh.append(event)
+        return fresh, merged
+
+    async def _find_existing(self, user_id: str, user_events: List[Tuple[Set[str], Tuple]]) -> Dict[str, Dict]:
+        """{id de la nouvelle entrée: entrée existante la plus proche au-dessus du seuil}"""
+        keys = {event[1]["id"]: self.lsh.bucket_keys(tokens) for tokens, event in user_events}
+        buckets = await repos.knowledge.get_lsh_buckets(user_id, sorted({key for ks in keys.values() for key in ks}))
+        candidates = {entry_id: {c for key in ks for c in buckets.get(key, [])} for entry_id, ks in keys.items()}
+        candidate_ids = sorted(set().union(*candidates.values())) if candidates else []
+        if not candidate_ids:
+            return {}
+        existing = {doc["id"]: doc for doc in await repos.knowledge.get_many(user_id, candidate_ids) if doc.get("id")}
+
+        duplicates = {}
+        for tokens, event in user_events:
+            best, best_similarity = None, self.threshold
+            for candidate_id in candidates[event[1]["id"]]:
+                doc = existing.get(candidate_id)
+                similarity = jaccard(tokens, shingles(doc.get("question", ""))) if doc else 0.0
+                if similarity >= best_similarity:
+                    best, best_similarity = doc, similarity
+            if best is not None:
+                duplicates[event[1]["id"]] = best
+        return duplicates
+
+    async def _merge_existing(self, user_id: str, existing: Dict, entry: Dict) -> Optional[bool]:
+        """True si la réponse a été remplacée, False si seul l'usage est compté, None si l'entrée n'existe plus"""
+        replacement = None
+        if (entry.get("value_score", 0.0) > existing.get("value_score", 0.0)
+                and same_question(existing.get("question", ""), entry.get("question", ""))):
+            replacement = {"response": entry.get("response", ""), "value_score": entry["value_score"]}
+        merged = await repos.knowledge.merge_duplicate(user_id, existing["id"], replacement, count=entry.get("usage_count", 1))
+        if merged is None:
+            return None # Supprimée entre-temps : insérée comme nouvelle entrée
+        replaced = merged.get("response_revision", 0) != existing.get("response_revision", 0)
+        existing.update(merged) # État enregistré (la réponse n'est remplacée que si elle est meilleure en base)
+        self.stats["merged"] += 1
+        self.stats["responses_replaced"] += int(replaced)
+        return replaced
+
+    async def index(self, user_id: str, entries: List[Dict]):
+        """Ajoute les nouvelles entrées à leurs seaux (une écriture groupée)"""
+        buckets: Dict[str, List[str]] = {}
+        for entry in entries:
+            for key in self.lsh.bucket_keys(shingles(entry.get("question", ""))):
+                buckets.setdefault(key, []).append(entry["id"])
+        if buckets:
+            await repos.knowledge.add_lsh_buckets(user_id, buckets)
+            self.stats["indexed"] += len(entries)
+
+    async def unindex(self, user_id: str, entries: List[Dict]):
+        """Retire des entrées supprimées ou rétrogradées de leurs seaux (une écriture groupée)"""
+        buckets: Dict[str, List[str]] = {}
+        for entry in entries:
+            for key in self.lsh.bucket_keys(shingles(entry.get("question", ""))):
+                buckets.setdefault(key, []).append(entry["id"])
+        if buckets:
+            await repos.knowledge.remove_lsh_buckets(user_id, buckets)
+            self.stats["unindexed"] += len(entries)
+
+    def schedule_rebuild(self, user_id: str):
+        background_tasks.submit(self.rebuild, user_id, key=f"knowledge_lsh/{user_id}")
+
+    async def rebuild(self, user_id: str):
+        if await self.is_built(user_id):
+            return # Déjà reconstruit (demandes en double)
+        entries = [entry for entry in await repos.knowledge.find(user_id) if entry.get("id") and entry.get("tier") != "cold"]
+        await self.index(user_id, entries)
+        await repos.knowledge.set_meta(user_id, "lsh", {
+            "version": LSH_VERSION, "built_at": datetime.now().isoformat(), "entries": len(entries)
+        })
+        self.built.set(user_id, True)
+        self.stats["rebuilds"] += 1
+        print(f"🧬 Seaux LSH des connaissances reconstruits ({len(entries)} entrées)")
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "enabled": self.enabled, "threshold": self.threshold}
+
+
+# Instance globale
+knowledge_dedup = KnowledgeDeduplicator()
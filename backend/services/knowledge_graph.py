@@ -0,0 +1,320 @@
+# services/knowledge_graph.py
+import asyncio
+import hashlib
+import os
+import pickle
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from core.config import settings
+from core.cache import invalidation_bus
+from core.executors import run_io
+from repositories import repos
+
+SNAPSHOT_VERSION = 2 # 2 : validation par `seq` au lieu de `count`
+
+
+class KeywordInterner:
+    """Table mot-clé <-> identifiant entier : les graphes ne stockent que des entiers"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._keywords: List[str] = []
+
+    def intern(self, keyword: str) -> int:
+        keyword_id = self._ids.get(keyword)
+        if keyword_id is None:
+            keyword_id = len(self._keywords)
+            self._ids[keyword] = keyword_id
+            self._keywords.append(keyword)
+        return keyword_id
+
+    def lookup(self, keyword: str) -> Optional[int]:
+        return self._ids.get(keyword)
+
+    def keyword(self, keyword_id: int) -> str:
+        return self._keywords[keyword_id]
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+
+class UserGraph:
+    """Graphe d'un utilisateur : mot-clé -> positions d'entrées (tableaux compacts), mots-clés en ordre LRU"""
+
+    __slots__ = ("adjacency", "entry_ids", "entry_positions", "scores", "seq", "dirty")
+
+    def __init__(self):
+        self.adjacency: "OrderedDict[int, array]" = OrderedDict()
+        self.entry_ids: List[str] = []
+        self.entry_positions: Dict[str, int] = {}
+        self.scores = array("f")
+        self.seq = 0 # `seq` des statistiques couvert par le graphe (validation des instantanés)
+        self.dirty = False
+
+    def add(self, entry_id: str, keyword_ids: List[int], value_score: float,
+            max_keywords: int, max_per_keyword: int, max_entries: int) -> bool:
+        if entry_id in self.entry_positions:
+            return False # Déjà intégrée (reconstruction concurrente d'un ajout)
+        position = len(self.entry_ids)
+        self.entry_ids.append(entry_id)
+        self.entry_positions[entry_id] = position
+        self.scores.append(value_score)
+        for keyword_id in keyword_ids:
+            neighbors = self.adjacency.get(keyword_id)
+            if neighbors is None:
+                neighbors = self.adjacency[keyword_id] = array("I")
+            else:
+                self.adjacency.move_to_end(keyword_id)
+            neighbors.append(position)
+            if len(neighbors) > max_per_keyword:
+                del neighbors[0] # Seules les entrées les plus récentes par mot-clé
+        while len(self.adjacency) > max_keywords:
+            self.adjacency.popitem(last=False) # Mot-clé le moins récemment utilisé
+        if len(self.entry_ids) > max_entries:
+            # Garde les entrées référencées les plus récentes (3/4 du plafond : compaction amortie)
+            self._compact(self._referenced()[-(max_entries * 3 // 4 or 1):])
+        self.seq += 1
+        self.dirty = True
+        return True
+
+    def remove(self, deleted: List[str], demoted: List[str] = ()):
+        """Retire des entrées supprimées du dépôt (chacune a incrémenté `seq`, présente dans le graphe ou non)
+        et des entrées rétrogradées (toujours en base : `seq` inchangé)"""
+        removed = {self.entry_positions[entry_id] for entry_id in [*deleted, *demoted] if entry_id in self.entry_positions}
+        if removed:
+            self._compact([position for position in self._referenced() if position not in removed])
+        self.seq += len(deleted)
+        self.dirty = True
+
+    def _referenced(self) -> List[int]:
+        return sorted({position for neighbors in self.adjacency.values() for position in neighbors})
+
+    def _compact(self, kept: List[int]):
+        """Ne garde que les positions `kept` (croissantes) et renumérote"""
+        remap = {old: new for new, old in enumerate(kept)}
+        for keyword_id in list(self.adjacency):
+            neighbors = array("I", (remap[position] for position in self.adjacency[keyword_id] if position in remap))
+            if neighbors:
+                self.adjacency[keyword_id] = neighbors
+            else:
+                del self.adjacency[keyword_id] # Ne pointait que vers des entrées retirées
+        self.entry_ids = [self.entry_ids[old] for old in kept]
+        self.entry_positions = {entry_id: position for position, entry_id in enumerate(self.entry_ids)}
+        self.scores = array("f", (self.scores[old] for old in kept))
+
+    def neighbors(self, keyword_id: int) -> List[Tuple[str, float]]:
+        return [(self.entry_ids[position], self.scores[position]) for position in self.adjacency.get(keyword_id, ())]
+
+    def memory_bytes(self) -> int:
+        arrays = sum(neighbors.buffer_info()[1] * neighbors.itemsize for neighbors in self.adjacency.values())
+        return arrays + self.scores.buffer_info()[1] * self.scores.itemsize + sum(len(e) for e in self.entry_ids)
+
+    def to_snapshot(self, interner: KeywordInterner) -> Dict:
+        # Mots-clés en clair : les identifiants internes sont propres au processus
+        return {
+            "version": SNAPSHOT_VERSION,
+            "seq": self.seq,
+            "entry_ids": list(self.entry_ids),
+            "scores": self.scores.tobytes(),
+            "adjacency": [(interner.keyword(keyword_id), neighbors.tobytes()) for keyword_id, neighbors in self.adjacency.items()],
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict, interner: KeywordInterner) -> "UserGraph":
+        graph = cls()
+        graph.seq = snapshot["seq"]
+        graph.entry_ids = snapshot["entry_ids"]
+        graph.entry_positions = {entry_id: position for position, entry_id in enumerate(graph.entry_ids)}
+        graph.scores.frombytes(snapshot["scores"])
+        for keyword, neighbors in snapshot["adjacency"]:
+            positions = array("I")
+            positions.frombytes(neighbors)
+            graph.adjacency[interner.intern(keyword)] = positions
+        return graph
+
+
+class KnowledgeGraphStore:
+    """Graphes de connaissances bornés : LRU d'utilisateurs en mémoire, instantanés disque, reconstruction paresseuse"""
+
+    channel = "knowledge_graph"
+
+    def __init__(self, extract_keywords: Callable[[str], List[str]], snapshot_dir: str = None):
+        self.extract_keywords = extract_keywords # Pour les entrées antérieures au champ `keywords`
+        self.snapshot_dir = snapshot_dir or settings.KNOWLEDGE_GRAPH_SNAPSHOT_DIR
+        self.max_users = settings.KNOWLEDGE_GRAPH_MAX_USERS
+        self.max_keywords = settings.KNOWLEDGE_GRAPH_MAX_KEYWORDS
+        self.max_entries = settings.KNOWLEDGE_GRAPH_MAX_ENTRIES
+        self.max_per_keyword = 10
+        self.snapshot_interval = settings.KNOWLEDGE_GRAPH_SNAPSHOT_INTERVAL
+        self.interner = KeywordInterner()
+        self._graphs: "OrderedDict[str, UserGraph]" = OrderedDict()
+        self._evicted: Dict[str, UserGraph] = {} # Évincés avec des changements pas encore sur disque
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"rebuilds": 0, "snapshot_loads": 0, "snapshots_written": 0, "evictions": 0, "invalidations": 0}
+        invalidation_bus.subscribe(self.channel, self._drop) # Ajouts faits par un autre worker
+
+    def _snapshot_path(self, user_id: str) -> str:
+        return os.path.join(self.snapshot_dir, hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:24] + ".pkl")
+
+    def _drop(self, user_id: str):
+        self.stats["invalidations"] += 1
+        self._graphs.pop(user_id, None)
+        self._evicted.pop(user_id, None)
+        self._loading.pop(user_id, None)
+
+    async def get(self, user_id: str) -> UserGraph:
+        """Graphe de l'utilisateur, chargé à la première utilisation (un seul chargement concurrent)"""
+        graph = self._graphs.get(user_id)
+        if graph is not None:
+            self._graphs.move_to_end(user_id)
+            return graph
+        task = self._loading.get(user_id)
+        if task is None:
+            task = self._loading[user_id] = asyncio.ensure_future(self._load(user_id))
+        try:
+            graph = await asyncio.shield(task)
+        except Exception:
+            if self._loading.get(user_id) is task:
+                del self._loading[user_id]
+            raise
+        if self._loading.get(user_id) is task: # Premier appelant, chargement non invalidé entre-temps
+            del self._loading[user_id]
+            self._remember(user_id, graph)
+        return self._graphs.get(user_id, graph)
+
+    async def _load(self, user_id: str) -> UserGraph:
+        graph = self._evicted.pop(user_id, None)
+        if graph is not None:
+            return graph
+        # Instantané valide seulement s'il a intégré tous les ajouts et suppressions comptés (`seq`)
+        snapshot, stats = await asyncio.gather(
+            run_io(self._read_snapshot, user_id), repos.knowledge.get_meta(user_id, "stats")
+        )
+        if snapshot and stats and stats.get("initialized") and snapshot.get("seq") == stats.get("seq", 0):
+            self.stats["snapshot_loads"] += 1
+            return UserGraph.from_snapshot(snapshot, self.interner)
+        return await self._rebuild(user_id, stats)
+
+    async def _rebuild(self, user_id: str, stats: Optional[Dict]) -> UserGraph:
+        graph = UserGraph()
+        entries = await repos.knowledge.find(user_id)
+        for entry in entries:
+            if entry.get("tier") == "cold":
+                continue # Rétrogradée : hors du graphe
+            keywords = entry.get("keywords") or self.extract_keywords(entry.get("question", ""))
+            graph.add(
+                entry.get("id") or entry.get("question", "")[:50], [self.interner.intern(k) for k in keywords],
+                entry.get("value_score", 0.0), self.max_keywords, self.max_per_keyword, self.max_entries
+            )
+        if not (stats and stats.get("initialized")):
+            # Compteurs agrégés initialisés (validation des prochains instantanés), sans écraser un incrément concurrent
+            stats = await repos.knowledge.initialize_stats(user_id)
+        # Un ajout concurrent déjà présent laisse `seq` en retard : reconstruction au prochain chargement
+        graph.seq = stats.get("seq", 0)
+        self.stats["rebuilds"] += 1
+        return graph
+
+    def _remember(self, user_id: str, graph: UserGraph):
+        self._graphs[user_id] = graph
+        while len(self._graphs) > self.max_users:
+            evicted_id, evicted = self._graphs.popitem(last=False)
+            self.stats["evictions"] += 1
+            if evicted.dirty:
+                self._evicted[evicted_id] = evicted # Écrit au prochain instantané
+
+    async def add(self, user_id: str, entry_id: str, keywords: List[str], value_score: float):
+        graph = await self.get(user_id)
+        keyword_ids = [self.interner.intern(keyword) for keyword in keywords]
+        if graph.add(entry_id, keyword_ids, value_score, self.max_keywords, self.max_per_keyword, self.max_entries):
+            invalidation_bus.publish(self.channel, user_id, local=False)
+
+    async def remove(self, user_id: str, deleted: List[str], demoted: List[str] = ()):
+        """Retire des entrées supprimées ou rétrogradées : l'instantané reste valide (pas de reconstruction)"""
+        if not (deleted or demoted) or user_id in self._loading:
+            return # Un chargement en cours relit les statistiques : au pire une reconstruction plus tard
+        graph = self._graphs.get(user_id) or self._evicted.get(user_id)
+        if graph is None:
+            # Instantané antérieur aux suppressions (son `seq` est en retard d'autant) : mis à jour sans reconstruction
+            snapshot, stats = await asyncio.gather(
+                run_io(self._read_snapshot, user_id), repos.knowledge.get_meta(user_id, "stats")
+            )
+            if not (snapshot and stats and snapshot.get("seq", 0) + len(deleted) == stats.get("seq", 0)):
+                return
+            if user_id in self._graphs or user_id in self._loading:
+                return # Chargé entre-temps
+            graph = UserGraph.from_snapshot(snapshot, self.interner)
+            self._remember(user_id, graph)
+        graph.remove(deleted, demoted)
+        invalidation_bus.publish(self.channel, user_id, local=False)
+
+    async def size(self, user_id: str) -> int:
+        """Nombre de mots-clés du graphe de l'utilisateur"""
+        return len((await self.get(user_id)).adjacency)
+
+    async def related(self, user_id: str, keyword: str) -> List[Tuple[str, float]]:
+        """(entry_id, value_score) les plus récents liés à un mot-clé"""
+        graph = await self.get(user_id)
+        keyword_id = self.interner.lookup(keyword)
+        return graph.neighbors(keyword_id) if keyword_id is not None else []
+
+    # Instantanés disque
+    def _read_snapshot(self, user_id: str) -> Optional[Dict]:
+        path = self._snapshot_path(user_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                snapshot = pickle.load(f)
+            return snapshot if snapshot.get("version") == SNAPSHOT_VERSION else None
+        except Exception as e:
+            print(f"⚠️ Instantané de graphe illisible ({user_id}): {e}")
+            return None
+
+    def _write_snapshot(self, user_id: str, snapshot: Dict):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(user_id)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(snapshot, f)
+        os.replace(path + ".tmp", path) # Écriture atomique
+
+    async def snapshot(self):
+        """Écrit les graphes modifiés depuis le dernier instantané"""
+        pending = [(user_id, graph) for user_id, graph in self._graphs.items() if graph.dirty]
+        pending += list(self._evicted.items())
+        for user_id, graph in pending:
+            snapshot = graph.to_snapshot(self.interner)
+            graph.dirty = False
+            try:
+                await run_io(self._write_snapshot, user_id, snapshot)
+                self._evicted.pop(user_id, None)
+                self.stats["snapshots_written"] += 1
+            except Exception as e:
+                graph.dirty = True
+                print(f"❌ Erreur instantané graphe de connaissances: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.snapshot()
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "users_in_memory": len(self._graphs),
+            "pending_evicted": len(self._evicted),
+            "interned_keywords": len(self.interner),
+            "memory_bytes": sum(graph.memory_bytes() for graph in self._graphs.values()),
+        }
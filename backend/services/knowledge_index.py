@@ -0,0 +1,164 @@
+# services/knowledge_index.py
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from core.config import settings
+from core.cache import TTLCache, invalidation_bus
+from core.background import background_tasks
+from repositories import repos
+
+INDEX_VERSION = 1 # À incrémenter si l'extraction des mots-clés change (reconstruction automatique)
+
+
+class KnowledgeIndex:
+    """Index inversé des connaissances d'un utilisateur : mot-clé -> {entry_id: value_score}, écrit à l'apprentissage"""
+
+    channel = "knowledge_index"
+
+    def __init__(self):
+        self.postings = TTLCache(
+            "knowledge_index", maxsize=settings.KNOWLEDGE_INDEX_CACHE_SIZE, ttl=settings.KNOWLEDGE_INDEX_CACHE_TTL
+        )
+        self.built = TTLCache("knowledge_index_state", maxsize=4096, ttl=settings.KNOWLEDGE_INDEX_CACHE_TTL)
+        self.stats = {"lookups": 0, "postings_loaded": 0, "indexed_entries": 0, "removed_entries": 0, "rebuilds": 0, "fallback_scans": 0}
+        invalidation_bus.subscribe(self.channel, self._on_invalidation) # Écritures des autres workers
+
+    @staticmethod
+    def _key(user_id: str, keyword: str) -> str:
+        return f"{user_id}/{keyword}"
+
+    def _on_invalidation(self, key: str):
+        user_id, _, keyword = key.partition("/")
+        if keyword:
+            self.postings.invalidate(key)
+        else:
+            # Reconstruction complète chez un autre worker
+            self.built.invalidate(user_id)
+            for cached_key in [k for k in self.postings.keys() if k.startswith(f"{user_id}/")]:
+                self.postings.invalidate(cached_key)
+
+    async def add(self, user_id: str, entry_id: str, keywords: List[str], value_score: float):
+        """Ajoute une entrée aux listes de ses mots-clés (une écriture groupée)"""
+        await self.add_many(user_id, [(entry_id, keywords, value_score)])
+
+    async def add_many(self, user_id: str, entries: List[Tuple[str, List[str], float]]):
+        """Ajoute des entrées (entry_id, mots-clés, value_score) d'un utilisateur en une écriture groupée"""
+        postings: Dict[str, Dict[str, float]] = {}
+        for entry_id, keywords, value_score in entries:
+            for keyword in keywords:
+                postings.setdefault(keyword, {})[entry_id] = value_score
+        if not postings:
+            return
+        await repos.knowledge.add_postings(user_id, postings)
+        for keyword, added in postings.items():
+            key = self._key(user_id, keyword)
+            cached = self.postings.peek(key, None)
+            if cached is not None:
+                cached.update(added) # Liste en cache mise à jour en place
+            else:
+                self.postings.invalidate(key) # Un chargement en cours ne verrait pas ces entrées
+            invalidation_bus.publish(self.channel, key, local=False)
+        self.stats["indexed_entries"] += len(entries)
+
+    async def remove_many(self, user_id: str, entries: List[Tuple[str, List[str]]]):
+        """Retire des entrées (entry_id, mots-clés) d'un utilisateur de leurs listes, en une écriture groupée"""
+        postings: Dict[str, List[str]] = {}
+        for entry_id, keywords in entries:
+            for keyword in keywords:
+                postings.setdefault(keyword, []).append(entry_id)
+        if not postings:
+            return
+        await repos.knowledge.remove_postings(user_id, postings)
+        for keyword, removed in postings.items():
+            key = self._key(user_id, keyword)
+            cached = self.postings.peek(key, None)
+            if cached is not None:
+                for entry_id in removed:
+                    cached.pop(entry_id, None)
+            else:
+                self.postings.invalidate(key)
+            invalidation_bus.publish(self.channel, key, local=False)
+        self.stats["removed_entries"] += len(entries)
+
+    async def is_built(self, user_id: str) -> bool:
+        built = self.built.get(user_id, None)
+        if built is None:
+            meta = await repos.knowledge.get_meta(user_id, "index")
+            built = bool(meta) and meta.get("version") == INDEX_VERSION
+            self.built.set(user_id, built)
+        return built
+
+    async def _load_postings(self, user_id: str, keywords: List[str]) -> Dict[str, Dict[str, float]]:
+        postings = {}
+        missing = []
+        for keyword in keywords:
+            cached = self.postings.get(self._key(user_id, keyword), None)
+            if cached is None:
+                missing.append(keyword)
+            else:
+                postings[keyword] = cached
+        if missing:
+            loaded = await repos.knowledge.get_postings(user_id, missing) # Une lecture groupée
+            self.stats["postings_loaded"] += len(missing)
+            for keyword in missing:
+                postings[keyword] = loaded.get(keyword, {})
+                self.postings.set(self._key(user_id, keyword), postings[keyword])
+        return postings
+
+    async def search(self, user_id: str, keywords: List[str], min_score: float, min_ratio: float,
+                     limit: int) -> Optional[List[Tuple[str, float, float]]]:
+        """[(entry_id, part des mots-clés de la requête couverts, value_score)] par pertinence décroissante ;
+        None si l'index de l'utilisateur n'est pas encore construit"""
+        if not keywords:
+            return []
+        if not await self.is_built(user_id):
+            return None
+        self.stats["lookups"] += 1
+        postings = await self._load_postings(user_id, keywords)
+
+        # Fusion des listes : nombre de mots-clés de la requête présents dans chaque entrée
+        matches = Counter()
+        scores = {}
+        for entries in postings.values():
+            for entry_id, value_score in entries.items():
+                if value_score >= min_score:
+                    matches[entry_id] += 1
+                    scores[entry_id] = value_score
+        results = [
+            (entry_id, count / len(keywords), scores[entry_id])
+            for entry_id, count in matches.items() if count / len(keywords) > min_ratio
+        ]
+        results.sort(key=lambda match: (match[1], match[2]), reverse=True)
+        return results[:limit]
+
+    def schedule_rebuild(self, user_id: str, extract_keywords: Callable[[str], List[str]]):
+        """Indexe en tâche de fond les entrées écrites avant l'index"""
+        self.stats["fallback_scans"] += 1
+        background_tasks.submit(self.rebuild, user_id, extract_keywords, key=f"knowledge_index/{user_id}")
+
+    async def rebuild(self, user_id: str, extract_keywords: Callable[[str], List[str]]):
+        if await self.is_built(user_id):
+            return # Déjà reconstruit (demandes en double)
+        entries = await repos.knowledge.find(user_id)
+        postings: Dict[str, Dict[str, float]] = {}
+        for entry in entries:
+            if not entry.get("id") or entry.get("tier") == "cold":
+                continue # Rétrogradées : exclues des recherches
+            keywords = entry.get("keywords") or extract_keywords(entry.get("question", ""))
+            for keyword in keywords:
+                postings.setdefault(keyword, {})[entry["id"]] = entry.get("value_score", 0.0)
+        await repos.knowledge.add_postings(user_id, postings)
+        await repos.knowledge.set_meta(user_id, "index", {
+            "version": INDEX_VERSION, "built_at": datetime.now().isoformat(), "entries": len(entries)
+        })
+        self._on_invalidation(user_id)
+        invalidation_bus.publish(self.channel, user_id, local=False)
+        self.stats["rebuilds"] += 1
+        print(f"🗂️ Index des connaissances reconstruit ({len(entries)} entrées, {len(postings)} mots-clés)")
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "postings_cache": self.postings.get_stats()}
+
+
+# Instance globale
+knowledge_index = KnowledgeIndex()
@@ -1,26 +1,38 @@
 # services/knowledge_management.py
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from datetime import datetime
-from google.cloud import firestore # firestore : Base de données NoSQL de Google
-from core.database import db # db : l'instance de la base de données Firebase
+from repositories import repos # repos : dépôts de données (Firestore ou mémoire selon DATA_BACKEND)
 from langchain.schema import Document  
 import json
 import re
+import asyncio
+import secrets
+from core.executors import run_cpu
+from services.knowledge_index import knowledge_index
+from services.community_knowledge import community_knowledge, community_id
+from services.knowledge_graph import KnowledgeGraphStore
+from services.learning_pipeline import LearningPipeline
+from services.knowledge_dedup import knowledge_dedup
+from services.knowledge_usage import knowledge_usage
+from core.vectorstore import vector_store, knowledge_vector_key
 
 class KnowledgeManager:
     def __init__(self):
-        self.knowledge_graph = {} # Graphe de connaissances en mémoire
+        self.knowledge_graph = KnowledgeGraphStore(self._extract_keywords) # Borné, persisté, partagé par instantanés
+        self.learning_pipeline = LearningPipeline(self._learn_batch) # Apprentissage hors du chemin de réponse
         self.learning_rate = 0.1  # Taux d'apprentissage pour l'adaptation
         self.min_value_score = 0.3  # Score minimum pour considérer une connaissance utile
     
-    async def enhance_with_knowledge(self, query: str, user_id: str, action_type: str = None) -> Dict:
+    async def enhance_with_knowledge(self, query: str, user_id: str, action_type: str = None,
+                                     query_embedding: List[float] = None) -> Dict:
         """Améliore le contexte avec les connaissances existantes"""
         try:
             # 1. Recherche dans la base de connaissances utilisateur
             user_knowledge = await self._get_user_knowledge(user_id, query)
+            knowledge_usage.record(user_id, [knowledge.get("id") for knowledge in user_knowledge]) # Écrit par lots
             
             # 2. Recherche dans les connaissances globales
-            global_knowledge = await self._get_global_knowledge(query)
+            global_knowledge = await self._get_global_knowledge(query, query_embedding)
             
             # 3. Connaissances spécifiques à l'action
             action_knowledge = await self._get_action_knowledge(action_type, query) if action_type else {}
@@ -42,7 +54,8 @@ class KnowledgeManager:
             return {"has_knowledge": False}
     
     # Méthode d'Apprentissage learn_from_interaction
-    async def learn_from_interaction(self, user_id: str, question: str, result: Dict, interaction_type: str):
+    async def learn_from_interaction(self, user_id: str, question: str, result: Dict, interaction_type: str,
+                                     question_embedding: List[float] = None):
         """Apprentissage à partir des interactions"""
         try:
             # Filtrer les interactions intéressantes
@@ -65,83 +78,103 @@ class KnowledgeManager:
                 "interaction_type": interaction_type,
                 "timestamp": datetime.now().isoformat(),
                 "value_score": value_score,
+                "keywords": self._extract_keywords(question), # Extraits une fois, à l'écriture
+                "usage_count": 1,
                 "last_used": None
             }
             
-            # Sauvegarde en base
-            await self._store_knowledge_entry(user_id, knowledge_entry)
-            
-            # Mise à jour du graphe de connaissances
-            self._update_knowledge_graph(user_id, question, knowledge_entry)
+            knowledge_entry["id"] = self._new_entry_id()
 
-            print(f"📚 Connaissance sauvegardée (score: {value_score:.2f})")
+            # Écriture par lots en tâche de fond (abandonnée si la file est pleine)
+            self.learning_pipeline.submit((user_id, knowledge_entry, question_embedding))
                 
         except Exception as e:
             print(f"❌ Erreur apprentissage: {e}")
+
+    async def _learn_batch(self, events: List[Tuple[str, Dict, List[float]]]):
+        """Enregistre un lot d'apprentissages : commits groupés, un passage d'embedding, une sauvegarde d'index"""
+        # Quasi-doublons fusionnés dans l'entrée existante plutôt qu'insérés
+        events, merged = await knowledge_dedup.deduplicate(events)
+        revised = []
+        for user_id, entry, question_embedding, replaced in merged:
+            # Réponse éventuellement remplacée par une meilleure : score à jour dans l'index, promotion possible
+            await knowledge_index.add(user_id, entry["id"], entry.get("keywords") or self._extract_keywords(entry["question"]), entry["value_score"])
+            if replaced:
+                revised.append((user_id, entry, question_embedding))
+            community_knowledge.schedule_promotion(user_id, entry, question_embedding)
+        if revised:
+            await self._reindex_revised(revised)
+        if not events:
+            print(f"📚 {len(merged)} quasi-doublon(s) fusionné(s)")
+            return
+
+        # Sauvegarde en base (compteurs inclus), puis index inversé et seaux LSH par utilisateur
+        await repos.knowledge.add_many([(user_id, entry["id"], entry) for user_id, entry, _ in events])
+        by_user: Dict[str, List[Dict]] = {}
+        for user_id, entry, _ in events:
+            by_user.setdefault(user_id, []).append(entry)
+        await asyncio.gather(*(
+            knowledge_index.add_many(user_id, [(entry["id"], entry["keywords"], entry["value_score"]) for entry in entries])
+            for user_id, entries in by_user.items()
+        ), *(knowledge_dedup.index(user_id, entries) for user_id, entries in by_user.items()))
+        await self._index_knowledge_vectors(events)
+
+        for user_id, entry, question_embedding in events:
+            # Entrée à forte valeur : promotion anonymisée dans la base communautaire (tâche de fond)
+            community_knowledge.schedule_promotion(user_id, entry, question_embedding)
+            # Mise à jour du graphe de connaissances
+            await self._update_knowledge_graph(user_id, entry)
+
+        print(f"📚 {len(events)} connaissance(s) sauvegardée(s) ({len(by_user)} utilisateur(s)), {len(merged)} fusionnée(s)")
     
 
 
     async def _get_user_knowledge(self, user_id: str, query: str) -> List[Dict]:
         """Récupère les connaissances spécifiques à l'utilisateur"""
         try:
-            knowledge_ref = db.collection('users').document(user_id).collection('knowledge')
-
             # Recherche par similarité sémantique (approximation)
             query_keywords = self._extract_keywords(query)
 
-            docs = knowledge_ref.where(filter=firestore.FieldFilter('value_score', '>=', self.min_value_score)).stream()
+            # Index inversé : fusion des listes des mots-clés de la requête, puis lecture des 5 meilleures
+            matches = await knowledge_index.search(
+                user_id, query_keywords, min_score=self.min_value_score, min_ratio=0.3, limit=5
+            )
+            if matches is not None:
+                return await repos.knowledge.get_many(user_id, [entry_id for entry_id, _, _ in matches])
 
-            results = []
-            for doc in docs:
-                knowledge_data = doc.to_dict()
-                
-                # Vérifier la pertinence
-                if self._is_relevant(knowledge_data, query, query_keywords):
-                    results.append(knowledge_data)
-                
-                if len(results) >= 5:  # Limite de résultats
-                    break
-            
-            return results
+            # Index pas encore construit (entrées antérieures) : reconstruction en fond, parcours en attendant
+            knowledge_index.schedule_rebuild(user_id, self._extract_keywords)
+            return await repos.knowledge.find(
+                user_id,
+                min_score=self.min_value_score,
+                predicate=lambda knowledge_data: self._is_relevant(knowledge_data, query, query_keywords),
+                limit=5
+            )
             
         except Exception as e:
             print(f"❌ Erreur récupération connaissances utilisateur: {e}")
             return []
     
-    async def _get_global_knowledge(self, query: str) -> List[Dict]:
-        """Récupère les connaissances partagées de tous les utilisateurs"""
+    async def _get_global_knowledge(self, query: str, query_embedding: List[float] = None) -> List[Dict]:
+        """Récupère les connaissances partagées de tous les utilisateurs (partition communautaire anonymisée)"""
         try:
-            # Rechercher dans les connaissances de TOUS les utilisateurs
-            all_knowledge_ref = db.collection_group('knowledge')
-            query_keywords = self._extract_keywords(query)
-            
-            results = []
-            
-            # Filtrer seulement les connaissances de haute qualité
-            docs = all_knowledge_ref.where('value_score', '>=', 0.7).limit(20).stream()
-        
-            for doc in docs:
-                knowledge_data = doc.to_dict()
-                
-                # Vérifier la pertinence pour la requête actuelle
-                if self._is_relevant(knowledge_data, query, query_keywords):
-                    # Masquer les informations sensibles de l'utilisateur
-                    anonymized_data = {
-                        'question': knowledge_data.get('question'),
-                        'response': knowledge_data.get('response'),
-                        'value_score': knowledge_data.get('value_score'),
-                        'interaction_type': knowledge_data.get('interaction_type'),
-                        'usage_count': knowledge_data.get('usage_count', 0),
-                        'source': 'community_knowledge',  # Source anonymisée
-                        'is_global': True
-                    }
-                    
-                    results.append(anonymized_data)
-                    
-                    if len(results) >= 5:  # Limiter les résultats
-                        break
-            
-            return results
+            if not community_knowledge.size:
+                return []
+            if query_embedding is None:
+                query_embedding = await run_cpu(vector_store.embed_query, query)
+
+            # Une seule recherche approchée, seules les entrées réellement proches sont retenues
+            matches = await run_cpu(community_knowledge.search, query_embedding, 5)
+            return [{
+                'question': match.get('question'),
+                'response': match.get('response'),
+                'value_score': match.get('value_score'),
+                'interaction_type': match.get('interaction_type'),
+                'usage_count': match.get('usage_count', 0),
+                'similarity': match.get('similarity'),
+                'source': 'community_knowledge',  # Source anonymisée
+                'is_global': True
+            } for match in matches]
             
         except Exception as e:
             print(f"❌ Erreur récupération connaissances globales: {e}")
@@ -228,49 +261,68 @@ class KnowledgeManager:
         return round(avg_quality * quantity_factor, 2)
 
 
-    def _update_knowledge_graph(self, user_id: str, question: str, knowledge_entry: Dict):
-        """Met à jour le graphe de connaissances en mémoire"""
+    async def _update_knowledge_graph(self, user_id: str, knowledge_entry: Dict):
+        """Met à jour le graphe de connaissances (10 dernières entrées par mot-clé)"""
         try:
-            if user_id not in self.knowledge_graph:
-                self.knowledge_graph[user_id] = {}
-            
-            # Extraire les concepts clés de la question
-            keywords = self._extract_keywords(question)
-            
-            for keyword in keywords:
-                if keyword not in self.knowledge_graph[user_id]:
-                    self.knowledge_graph[user_id][keyword] = []
-                
-                # Ajouter la connaissance au graphe
-                self.knowledge_graph[user_id][keyword].append({
-                    "entry_id": knowledge_entry.get("question", "unknown")[:50],
-                    "timestamp": datetime.now().isoformat(),
-                    "value_score": knowledge_entry.get("value_score", 0.0)
-                })
-                
-                # Garder seulement les 10 dernières entrées par mot-clé
-                if len(self.knowledge_graph[user_id][keyword]) > 10:
-                    self.knowledge_graph[user_id][keyword] = self.knowledge_graph[user_id][keyword][-10:]
-                    
+            await self.knowledge_graph.add(
+                user_id, knowledge_entry["id"], knowledge_entry["keywords"], knowledge_entry.get("value_score", 0.0)
+            )
         except Exception as e:
             print(f"❌ Erreur mise à jour graphe connaissances: {e}")
 
-    async def _store_knowledge_entry(self, user_id: str, knowledge: Dict):
-        knowledge_ref = db.collection('users').document(user_id).collection('knowledge')
-        entry_id = f"know_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{hash(knowledge['question'][:10]) % 10000:04d}"
-        knowledge['id'] = entry_id
-        # mettre timestamp natif firestore
-        knowledge['timestamp'] = firestore.SERVER_TIMESTAMP
-        knowledge_ref.document(entry_id).set(knowledge)
+    async def unindex_entries(self, removed: Dict[str, Tuple[List[Dict], List[Dict]]]):
+        """{user_id: (entrées supprimées, entrées rétrogradées)} : retirées du graphe, de l'index inversé et des
+        seaux LSH, une écriture groupée par utilisateur et par structure"""
+        async def _unindex(user_id: str, deleted: List[Dict], demoted: List[Dict]):
+            entries = deleted + demoted
+            await asyncio.gather(
+                self.knowledge_graph.remove(user_id, [entry["id"] for entry in deleted], [entry["id"] for entry in demoted]),
+                knowledge_index.remove_many(user_id, [
+                    (entry["id"], entry.get("keywords") or self._extract_keywords(entry.get("question", ""))) for entry in entries
+                ]),
+                knowledge_dedup.unindex(user_id, entries),
+            )
+        results = await asyncio.gather(
+            *(_unindex(user_id, deleted, demoted) for user_id, (deleted, demoted) in removed.items()), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"❌ Erreur retrait des connaissances des index: {result}")
+
+    def _new_entry_id(self) -> str:
+        # Suffixe aléatoire : deux questions de la même seconde (même lot) ne partagent jamais un ID
+        return f"know_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(6)}"
 
-        # INDEXER dans le vectorstore (embedding du question+response)
+    async def _reindex_revised(self, revised: List[Tuple[str, Dict, List[float]]]):
+        """Réponses remplacées : vecteurs (FAISS, base communautaire) de la révision précédente retirés,
+        nouvelle révision indexée"""
+        previous = [
+            (user_id, knowledge_vector_key(entry["id"], entry.get("response_revision", 1) - 1))
+            for user_id, entry, _ in revised
+        ]
         try:
-            from core.vectorstore import vector_store
-            doc_text = knowledge.get('question', '') + "\n\n" + knowledge.get('response', '')
-            doc = Document(page_content=doc_text, metadata={"source": knowledge.get("interaction_type", "user"), "user_id": user_id, "knowledge_id": entry_id})
+            await run_cpu(vector_store.tombstone, [vector_key for _, vector_key in previous])
+            await run_cpu(community_knowledge.remove, [community_id(user_id, vector_key) for user_id, vector_key in previous])
+        except Exception as e:
+            print(f"❌ Erreur retrait des vecteurs remplacés: {e}")
+        await self._index_knowledge_vectors(revised)
+
+    async def _index_knowledge_vectors(self, events: List[Tuple[str, Dict, List[float]]]):
+        """INDEXER dans le vectorstore (embedding du question+response) : un seul ajout, donc une sauvegarde"""
+        try:
+            docs = [
+                Document(
+                    page_content=entry.get('question', '') + "\n\n" + entry.get('response', ''),
+                    metadata={
+                        "source": entry.get("interaction_type", "user"), "user_id": user_id, "knowledge_id": entry["id"],
+                        "vector_key": knowledge_vector_key(entry["id"], entry.get("response_revision", 0)),
+                    }
+                )
+                for user_id, entry, _ in events
+            ]
             # init vectorstore si pas initialisé
-            vector_store.init_vectorstore()
-            vector_store.add_documents([doc], user_id=user_id)
+            await run_cpu(vector_store.init_vectorstore)
+            await run_cpu(vector_store.add_documents, docs)
         except Exception as e:
             print(f"Erreur indexation knowledge dans vectorstore: {e}")
 
@@ -285,7 +337,7 @@ class KnowledgeManager:
             stopwords = {'le', 'la', 'les', 'un', 'une', 'des', 'et', 'ou', 'mais', 'où', 'que', 'qui', 'quoi'}
             keywords = [word for word in words if word not in stopwords and len(word) > 2]
             
-            return list(set(keywords))[:10]  # Maximum 10 mots-clés uniques
+            return list(dict.fromkeys(keywords))[:10]  # Maximum 10 mots-clés uniques (ordre du texte : stable pour l'index)
             
         except Exception as e:
             print(f"❌ Erreur extraction mots-clés: {e}")
@@ -314,32 +366,28 @@ class KnowledgeManager:
             return False
 
 
+    async def _get_aggregate_stats(self, user_id: str) -> Dict:
+        """Compteurs agrégés (une lecture) ; recalculés une fois pour les utilisateurs antérieurs aux compteurs"""
+        stats = await repos.knowledge.get_meta(user_id, "stats")
+        if stats and stats.get("initialized"):
+            return stats
+        stats = await repos.knowledge.initialize_stats(user_id)
+        print(f"📊 Statistiques de connaissances initialisées ({stats['count']} entrées)")
+        return stats
+
     async def get_user_stats(self, user_id: str) -> Dict:
         """Retourne les statistiques de connaissances d'un utilisateur"""
         try:
-            knowledge_ref = db.collection('users').document(user_id).collection('knowledge')
-            
-            # Compter le nombre total de documents
-            all_docs = list(knowledge_ref.stream())
-            knowledge_count = len(all_docs)
-            
-            # Compter les documents haute valeur
-            high_value_docs = list(knowledge_ref.where('value_score', '>=', 0.7).stream())
-            high_value_count = len(high_value_docs)
-            
-            # Calculer le score moyen
-            total_score = 0.0
-            for doc in all_docs:
-                knowledge_data = doc.to_dict()
-                total_score += knowledge_data.get('value_score', 0.0)
-            
-            avg_score = round(total_score / knowledge_count, 2) if knowledge_count > 0 else 0.0
+            stats = await self._get_aggregate_stats(user_id)
+            knowledge_count = max(stats.get("count", 0), 0)
+            avg_score = round(stats.get("score_sum", 0.0) / knowledge_count, 2) if knowledge_count > 0 else 0.0
             
             return {
                 "total_knowledge": knowledge_count,
-                "high_value_knowledge": high_value_count,
-                "knowledge_graph_size": len(self.knowledge_graph.get(user_id, {})),
+                "high_value_knowledge": stats.get("high_value_count", 0),
+                "knowledge_graph_size": await self.knowledge_graph.size(user_id),
                 "avg_value_score": avg_score,
+                "by_interaction_type": {k: v for k, v in stats.get("by_type", {}).items() if v > 0},
                 "user_id": user_id
             }
             
@@ -356,18 +404,8 @@ class KnowledgeManager:
     async def get_user_knowledge(self, user_id: str, limit: int = 10) -> List[Dict]:
         """Récupère les connaissances d'un utilisateur avec limite"""
         try:
-            knowledge_ref = db.collection('users').document(user_id).collection('knowledge')
-            
             # Trier par date décroissante et limiter
-            query_ref = knowledge_ref.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit)
-            docs = query_ref.stream()
-            
-            results = []
-            for doc in docs:
-                knowledge_data = doc.to_dict()
-                results.append(knowledge_data)
-            
-            return results
+            return await repos.knowledge.list_recent(user_id, limit)
             
         except Exception as e:
             print(f"❌ Erreur récupération connaissances utilisateur: {e}")
@@ -376,15 +414,9 @@ class KnowledgeManager:
     async def _calculate_avg_value_score(self, user_id: str) -> float:
         """Calcule le score de valeur moyen des connaissances"""
         try:
-            knowledge_ref = db.collection('users').document(user_id).collection('knowledge')
-            docs = knowledge_ref.stream()
-            
-            scores = []
-            for doc in docs:
-                knowledge_data = doc.to_dict()
-                scores.append(knowledge_data.get('value_score', 0.0))
-            
-            return round(sum(scores) / len(scores), 2) if scores else 0.0
+            stats = await self._get_aggregate_stats(user_id)
+            count = stats.get("count", 0)
+            return round(stats.get("score_sum", 0.0) / count, 2) if count > 0 else 0.0
             
         except Exception as e:
             print(f"❌ Erreur calcul score moyen: {e}")
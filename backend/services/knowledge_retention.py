@@ -0,0 +1,172 @@
+# services/knowledge_retention.py
+import asyncio
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from core.config import settings
+from core.executors import run_cpu
+from core.vectorstore import vector_store, knowledge_vector_key
+from repositories import repos
+from services.community_knowledge import community_knowledge, community_id
+from services.knowledge_management import knowledge_manager
+from services.knowledge_usage import knowledge_usage
+
+# Durée de vie sans utilisation, par type d'interaction (jours) ; surchargeable par KNOWLEDGE_TTL_DAYS
+DEFAULT_TTL_DAYS = {
+    "web_search": 30, # Actualités : périment vite
+    "data_analysis": 180,
+    "rag_conversation": 180,
+    "document_processing": 365,
+    "code_generation": 365,
+}
+
+
+def parse_ttl_days(spec: str) -> Dict[str, float]:
+    """"web_search=14,code_generation=365" -> {type: jours}, fusionné avec les valeurs par défaut"""
+    ttl_days = dict(DEFAULT_TTL_DAYS)
+    for item in (spec or "").split(","):
+        interaction_type, _, days = item.partition("=")
+        if interaction_type.strip() and days.strip():
+            try:
+                ttl_days[interaction_type.strip()] = float(days)
+            except ValueError:
+                print(f"⚠️ TTL ignoré (valeur invalide): {item}")
+    return ttl_days
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    # Timestamp Firestore (datetime), ISO (entrées anciennes) ou absent
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class RetentionPolicy:
+    """Score de rétention : value_score atténué par l'inactivité (demi-vie), soutenu par l'usage"""
+
+    def __init__(self, ttl_days: Dict[str, float] = None, default_ttl_days: float = None,
+                 half_life_days: float = None, demote_below: float = None, delete_below: float = None):
+        self.ttl_days = ttl_days or parse_ttl_days(settings.KNOWLEDGE_TTL_DAYS)
+        self.default_ttl_days = default_ttl_days or settings.KNOWLEDGE_DEFAULT_TTL_DAYS
+        self.half_life_days = half_life_days or settings.KNOWLEDGE_DECAY_HALF_LIFE_DAYS
+        self.demote_below = demote_below if demote_below is not None else settings.KNOWLEDGE_DEMOTE_BELOW
+        self.delete_below = delete_below if delete_below is not None else settings.KNOWLEDGE_DELETE_BELOW
+
+    def idle_days(self, entry: Dict, now: datetime) -> float:
+        last_activity = _as_datetime(entry.get("last_used")) or _as_datetime(entry.get("timestamp"))
+        return max((now - last_activity).total_seconds() / 86400, 0.0) if last_activity else 0.0
+
+    def retention_score(self, entry: Dict, now: datetime) -> float:
+        # Valeur d'origine : une entrée rétrogradée n'est pas atténuée deux fois
+        value = entry.get("original_value_score", entry.get("value_score", 0.0)) or 0.0
+        usage_boost = 1 + 0.25 * math.log2(max(entry.get("usage_count") or 1, 1))
+        return min(value * usage_boost * 0.5 ** (self.idle_days(entry, now) / self.half_life_days), 1.0)
+
+    def decide(self, entry: Dict, now: datetime) -> Optional[str]:
+        """"delete", "demote" ou None"""
+        ttl = self.ttl_days.get(entry.get("interaction_type"), self.default_ttl_days)
+        if self.idle_days(entry, now) > ttl:
+            return "delete"
+        score = self.retention_score(entry, now)
+        if score < self.delete_below:
+            return "delete"
+        if score < self.demote_below and entry.get("tier") != "cold":
+            return "demote"
+        return None
+
+
+class KnowledgeRetention:
+    """Balayage périodique des connaissances : suppression des entrées expirées ou sans valeur,
+    rétrogradation des entrées en déclin ; leurs vecteurs (FAISS, base communautaire), leur place dans le graphe,
+    l'index inversé et les seaux LSH sont retirés"""
+
+    def __init__(self, policy: RetentionPolicy = None):
+        self.policy = policy or RetentionPolicy()
+        self.enabled = settings.KNOWLEDGE_RETENTION_ENABLED
+        self.interval = settings.KNOWLEDGE_RETENTION_INTERVAL
+        self.page_size = settings.KNOWLEDGE_RETENTION_PAGE_SIZE
+        self.max_per_sweep = settings.KNOWLEDGE_RETENTION_MAX_PER_SWEEP
+        self._cursor: Optional[str] = None # Reprise du parcours d'un balayage à l'autre
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"sweeps": 0, "scanned": 0, "deleted": 0, "demoted": 0, "vectors_removed": 0, "last_sweep": None}
+
+    async def sweep(self) -> Dict:
+        """Un balayage borné (`max_per_sweep` entrées), repris là où le précédent s'est arrêté"""
+        await knowledge_usage.flush() # Utilisations récentes prises en compte dans l'atténuation
+        now = datetime.now(timezone.utc)
+        scanned = deleted = demoted = 0
+        while scanned < self.max_per_sweep:
+            entries, self._cursor = await repos.knowledge.scan_global(self._cursor, self.page_size)
+            scanned += len(entries)
+            removed = []
+            by_user: Dict[str, Tuple[List[Dict], List[Dict]]] = {} # (supprimées, rétrogradées)
+            for entry in entries:
+                user_id, entry_id = entry.get("user_id"), entry.get("id")
+                if not user_id or not entry_id:
+                    continue
+                action = self.policy.decide(entry, now)
+                vector_key = knowledge_vector_key(entry_id, entry.get("response_revision", 0)) # Révision courante
+                if action == "delete" and await repos.knowledge.delete(user_id, entry_id):
+                    deleted += 1
+                    removed.append((user_id, vector_key))
+                    by_user.setdefault(user_id, ([], []))[0].append(entry)
+                elif action == "demote" and await self._demote(user_id, entry, now):
+                    demoted += 1
+                    removed.append((user_id, vector_key))
+                    by_user.setdefault(user_id, ([], []))[1].append(entry)
+            if removed:
+                # Vecteurs retirés par lot : une sauvegarde par page
+                await run_cpu(vector_store.tombstone, [vector_key for _, vector_key in removed])
+                await run_cpu(community_knowledge.remove, [community_id(user_id, vector_key) for user_id, vector_key in removed])
+                self.stats["vectors_removed"] += len(removed)
+                # Graphe, index inversé et seaux LSH : une écriture groupée par utilisateur pour la page
+                await knowledge_manager.unindex_entries(by_user)
+            if self._cursor is None:
+                break # Fin du parcours : le prochain balayage repart du début
+        self.stats["sweeps"] += 1
+        self.stats["scanned"] += scanned
+        self.stats["deleted"] += deleted
+        self.stats["demoted"] += demoted
+        self.stats["last_sweep"] = now.isoformat()
+        if deleted or demoted:
+            print(f"🧹 Rétention des connaissances: {deleted} supprimée(s), {demoted} rétrogradée(s) sur {scanned}")
+        return {"scanned": scanned, "deleted": deleted, "demoted": demoted}
+
+    async def _demote(self, user_id: str, entry: Dict, now: datetime) -> bool:
+        """Sous le seuil de valeur : exclue des recherches (score atténué, retirée des index), conservée jusqu'à expiration"""
+        score = round(self.policy.retention_score(entry, now), 3)
+        return await repos.knowledge.update_entry(user_id, entry["id"], {
+            "tier": "cold",
+            "value_score": score,
+            "original_value_score": entry.get("original_value_score", entry.get("value_score", 0.0)),
+        })
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"❌ Erreur balayage de rétention: {e}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "enabled": self.enabled, "ttl_days": self.policy.ttl_days}
+
+
+# Instance globale
+knowledge_retention = KnowledgeRetention()
@@ -0,0 +1,86 @@
+# services/knowledge_usage.py
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from core.config import settings
+from core.background import background_tasks
+from repositories import repos
+
+
+class KnowledgeUsageTracker:
+    """Utilisations des connaissances accumulées en mémoire (aucune écriture sur le chemin de lecture),
+    écrites périodiquement en incréments groupés : `usage_count` et `last_used` alimentent la rétention"""
+
+    def __init__(self):
+        self.flush_interval = settings.KNOWLEDGE_USAGE_FLUSH_INTERVAL
+        self.max_pending = settings.KNOWLEDGE_USAGE_MAX_PENDING # Vidage anticipé au-delà
+        self._pending: Dict[Tuple[str, str], List] = {} # (user_id, entry_id) -> [utilisations, dernière]
+        self._task: Optional[asyncio.Task] = None
+        self._flush_scheduled = False
+        self.stats = {"recorded": 0, "flushed": 0, "flushes": 0, "failed": 0}
+
+    def record(self, user_id: str, entry_ids: Iterable[str]):
+        """Compte une utilisation de chaque entrée (O(1), en mémoire)"""
+        now = datetime.now(timezone.utc)
+        for entry_id in entry_ids:
+            if not user_id or not entry_id:
+                continue
+            usage = self._pending.setdefault((user_id, entry_id), [0, now])
+            usage[0] += 1
+            usage[1] = now
+            self.stats["recorded"] += 1
+        if len(self._pending) >= self.max_pending and not self._flush_scheduled:
+            self._flush_scheduled = True
+            background_tasks.submit(self.flush, key="knowledge_usage")
+
+    def record_documents(self, documents: Iterable):
+        """Documents du vector store issus d'une connaissance (métadonnées `knowledge_id` et `user_id`)"""
+        for doc in documents:
+            metadata = getattr(doc, "metadata", {}) or {}
+            if metadata.get("knowledge_id"):
+                self.record(metadata.get("user_id"), [metadata["knowledge_id"]])
+
+    async def flush(self):
+        """Écrit les utilisations accumulées (une lecture et des écritures groupées)"""
+        self._flush_scheduled = False
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        usage: Dict[str, Dict[str, Tuple[int, datetime]]] = {}
+        for (user_id, entry_id), (hits, last_used) in pending.items():
+            usage.setdefault(user_id, {})[entry_id] = (hits, last_used)
+        try:
+            await repos.knowledge.record_usage(usage)
+            self.stats["flushes"] += 1
+            self.stats["flushed"] += len(pending)
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"❌ Erreur écriture des utilisations de connaissances: {e}")
+            # Remises dans l'accumulateur pour le prochain vidage
+            for key, (hits, last_used) in pending.items():
+                usage_entry = self._pending.setdefault(key, [0, last_used])
+                usage_entry[0] += hits
+                usage_entry[1] = max(usage_entry[1], last_used)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "pending": len(self._pending)}
+
+
+# Instance globale
+knowledge_usage = KnowledgeUsageTracker()
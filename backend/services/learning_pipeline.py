@@ -0,0 +1,96 @@
+# services/learning_pipeline.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from core.config import settings
+from core.background import background_tasks
+
+
+class LearningPipeline:
+    """File bornée d'événements d'apprentissage, vidée par lots par un worker de fond.
+
+    Le chemin de réponse ne fait qu'un `put_nowait` ; écritures, embeddings et sauvegarde d'index
+    sont faits une fois par lot. File pleine : l'événement est abandonné (compté dans `dropped`).
+    Après `stop()`, les événements tardifs passent par la file de fond (vidée en dernier à l'arrêt).
+    """
+
+    def __init__(self, handler: Callable[[List[Any]], Awaitable], maxsize: int = None,
+                 batch_size: int = None, max_wait: float = None):
+        self.handler = handler
+        self.maxsize = maxsize or settings.LEARNING_QUEUE_SIZE
+        self.batch_size = batch_size or settings.LEARNING_BATCH_SIZE
+        self.max_wait = max_wait if max_wait is not None else settings.LEARNING_BATCH_WAIT # Attente max pour compléter un lot
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+        self.stats = {"enqueued": 0, "dropped": 0, "batches": 0, "processed": 0, "failed": 0, "late": 0}
+
+    def start(self):
+        """Démarre le worker (appelé depuis le lifespan, ou au premier événement)"""
+        self._stopped = False
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, event: Any) -> bool:
+        if self._stopped:
+            # Pipeline arrêté : pas de nouvelle file jamais vidée, lot d'un événement en tâche de fond
+            self.stats["late"] += 1
+            return background_tasks.submit(self.handler, [event], key="learning_pipeline")
+        self.start()
+        try:
+            self._queue.put_nowait(event)
+            self.stats["enqueued"] += 1
+            return True
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            print(f"⚠️ File d'apprentissage pleine, événement ignoré ({self.stats['dropped']} au total)")
+            return False
+
+    async def _collect(self) -> List[Any]:
+        """Premier événement attendu sans limite, puis complété jusqu'à `batch_size` ou `max_wait`"""
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self.handler(batch)
+                self.stats["batches"] += 1
+                self.stats["processed"] += len(batch)
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                print(f"❌ Erreur lot d'apprentissage ({len(batch)} événements): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def stop(self, timeout: float = 15.0):
+        """Traite les événements en attente (dans la limite de `timeout`) puis arrête le worker"""
+        self._stopped = True
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Arrêt : {self._queue.qsize()} événement(s) d'apprentissage non traité(s)")
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "pending": self._queue.qsize() if self._queue else 0, "maxsize": self.maxsize}
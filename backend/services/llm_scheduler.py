@@ -0,0 +1,279 @@
+# services/llm_scheduler.py
+import asyncio
+import heapq # heapq : File de priorité pour l'ordre de passage des requêtes
+import itertools
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Voies de priorité : plus la valeur est basse, plus la requête passe tôt
+PRIORITY_LANES = {
+    "interactive": 0,  # Chat utilisateur
+    "agentic": 1,      # Actions agentiques
+    "background": 2,   # Résumés et tâches de fond
+}
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class RateLimitTimeout(Exception):
+    """Aucun modèle ne peut servir la requête avant son échéance"""
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Convertit un header de reset Groq ("2m59.56s", "7.66s", "120ms") en secondes"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total = 0.0
+    matched = False
+    for number, unit in _DURATION_RE.findall(value):
+        matched = True
+        factor = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}[unit]
+        total += float(number) * factor
+    return total if matched else None
+
+
+class TokenBucket:
+    """Seau à jetons à remplissage continu"""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.refill_rate = self.capacity / period # Jetons récupérés par seconde
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated_at = now
+
+    def wait_time(self, amount: float, now: float = None) -> float:
+        """Temps d'attente (s) avant de pouvoir consommer `amount` jetons"""
+        now = now or time.monotonic()
+        self._refill(now)
+        # Une demande plus grosse que la capacité passe dès que le seau est plein
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        if self.refill_rate <= 0:
+            return float("inf")
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float):
+        self._refill(time.monotonic())
+        self.tokens -= amount # Peut devenir négatif : la dette est remboursée par le remplissage
+
+    def refund(self, amount: float):
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], reset_seconds: Optional[float]):
+        """Recale le seau sur l'état annoncé par le serveur"""
+        now = time.monotonic()
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.tokens = min(self.capacity, float(remaining))
+        # Le serveur annonce le temps restant avant remise à plein : on en déduit le débit réel
+        if reset_seconds and remaining is not None and self.capacity > remaining:
+            self.refill_rate = (self.capacity - float(remaining)) / reset_seconds
+        self.updated_at = now
+
+    def headroom(self) -> float:
+        """Fraction de la capacité disponible (0 à 1)"""
+        self._refill(time.monotonic())
+        return max(self.tokens, 0.0) / self.capacity if self.capacity else 0.0
+
+
+class ModelBudget:
+    """Budgets de débit d'un modèle : requêtes/minute, tokens/minute et requêtes/jour"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.daily_requests: Optional[TokenBucket] = None # Appris via les headers (Groq : x-ratelimit-*-requests = RPD)
+        self.blocked_until = 0.0 # Renseigné après un 429 (retry-after)
+
+    def wait_time(self, requests: int, tokens: int, now: float) -> float:
+        waits = [
+            self.requests.wait_time(requests, now),
+            self.tokens.wait_time(tokens, now),
+            max(self.blocked_until - now, 0.0),
+        ]
+        if self.daily_requests:
+            waits.append(self.daily_requests.wait_time(requests, now))
+        return max(waits)
+
+    def consume(self, tokens: int):
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+        if self.daily_requests:
+            self.daily_requests.consume(1)
+
+    def refund(self, tokens: int):
+        self.requests.refund(1)
+        self.tokens.refund(tokens)
+        if self.daily_requests:
+            self.daily_requests.refund(1)
+
+    def headroom(self) -> float:
+        values = [self.requests.headroom(), self.tokens.headroom()]
+        if self.daily_requests:
+            values.append(self.daily_requests.headroom())
+        if self.blocked_until > time.monotonic():
+            return 0.0
+        return round(min(values), 3)
+
+
+class LLMScheduler:
+    """Ordonnanceur des appels LLM : buckets par modèle, voies de priorité et échéances"""
+
+    def __init__(self, default_rpm: int, default_tpm: int, deadlines: Dict[str, float]):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.deadlines = deadlines
+        self.budgets: Dict[str, ModelBudget] = {}
+        self._queues: Dict[str, List[Tuple[int, int, int]]] = {} # modèle -> tas de (voie, ordre, tokens)
+        self._seq = itertools.count()
+        self.stats = {
+            "scheduled": 0,
+            "rerouted": 0,
+            "timeouts": 0,
+            "rate_limited": 0,
+            "released": 0,
+            "per_lane": {lane: 0 for lane in PRIORITY_LANES},
+        }
+
+    def budget(self, model: str) -> ModelBudget:
+        if model not in self.budgets:
+            self.budgets[model] = ModelBudget(self.default_rpm, self.default_tpm)
+        return self.budgets[model]
+
+    async def acquire(self, models: List[str], estimated_tokens: int, priority: str = "interactive",
+                      deadline: float = None) -> str:
+        """Attend un créneau et retourne le modèle à utiliser (le premier de `models` si possible)"""
+        if priority not in PRIORITY_LANES:
+            priority = "interactive"
+        timeout = deadline if deadline is not None else self.deadlines.get(priority, 30.0)
+        expires_at = time.monotonic() + timeout
+        ticket = (PRIORITY_LANES[priority], next(self._seq), estimated_tokens)
+        queued_on = None
+
+        try:
+            while True:
+                now = time.monotonic()
+                model, wait = self._pick(models, ticket, now, expires_at)
+                if model is None:
+                    self.stats["timeouts"] += 1
+                    raise RateLimitTimeout(
+                        f"Aucun modèle disponible avant l'échéance ({timeout:.1f}s, voie {priority})"
+                    )
+
+                # Se placer dans la file du modèle choisi
+                if queued_on != model:
+                    if queued_on:
+                        self._dequeue(queued_on, ticket)
+                    heapq.heappush(self._queues.setdefault(model, []), ticket)
+                    queued_on = model
+
+                if wait <= 0 and self._queues[model][0] == ticket:
+                    self.budget(model).consume(estimated_tokens)
+                    self.stats["scheduled"] += 1
+                    self.stats["per_lane"][priority] += 1
+                    if model != models[0]:
+                        self.stats["rerouted"] += 1
+                        print(f"↪️ Requête {priority} redirigée vers {model} (attente trop longue sur {models[0]})")
+                    return model
+
+                await asyncio.sleep(min(max(wait, 0.01), 0.5))
+        finally:
+            if queued_on:
+                self._dequeue(queued_on, ticket)
+
+    def _pick(self, models: List[str], ticket: Tuple[int, int, int], now: float, expires_at: float):
+        """Premier modèle (par ordre de préférence) dont l'attente tient dans l'échéance"""
+        for model in models:
+            wait = self._estimated_wait(model, ticket, now)
+            if wait <= 0 or now + wait <= expires_at:
+                return model, wait
+        return None, None
+
+    def _estimated_wait(self, model: str, ticket: Tuple[int, int, int], now: float) -> float:
+        # Les requêtes plus prioritaires (ou plus anciennes) de la même file passent avant
+        ahead = [t for t in self._queues.get(model, []) if t < ticket]
+        requests = 1 + len(ahead)
+        tokens = ticket[2] + sum(t[2] for t in ahead)
+        return self.budget(model).wait_time(requests, tokens, now)
+
+    def _dequeue(self, model: str, ticket: Tuple[int, int, int]):
+        queue = self._queues.get(model, [])
+        if ticket in queue:
+            queue.remove(ticket)
+            heapq.heapify(queue)
+
+    def release(self, model: str, estimated_tokens: int):
+        """Rend un créneau obtenu par `acquire` mais non utilisé (disjoncteur refusant l'appel)"""
+        self.budget(model).refund(estimated_tokens)
+        self.stats["released"] += 1
+
+    def settle(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Corrige la consommation estimée avec l'usage réel renvoyé par l'API"""
+        if actual_tokens is None:
+            return
+        budget = self.budget(model)
+        delta = estimated_tokens - actual_tokens
+        if delta > 0:
+            budget.tokens.refund(delta)
+        elif delta < 0:
+            budget.tokens.consume(-delta)
+
+    def observe_headers(self, model: str, headers) -> None:
+        """Apprend les limites réelles à partir des headers x-ratelimit-* de Groq"""
+        if not headers:
+            return
+        budget = self.budget(model)
+
+        def _number(name):
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+
+        token_limit = _number("x-ratelimit-limit-tokens")
+        token_remaining = _number("x-ratelimit-remaining-tokens")
+        if token_limit or token_remaining is not None:
+            budget.tokens.sync(token_limit, token_remaining, parse_reset(headers.get("x-ratelimit-reset-tokens")))
+
+        request_limit = _number("x-ratelimit-limit-requests")
+        request_remaining = _number("x-ratelimit-remaining-requests")
+        if request_limit:
+            if budget.daily_requests is None:
+                budget.daily_requests = TokenBucket(request_limit, period=86400.0)
+            budget.daily_requests.sync(
+                request_limit, request_remaining, parse_reset(headers.get("x-ratelimit-reset-requests"))
+            )
+
+    def penalize(self, model: str, retry_after: Optional[float]):
+        """Bloque un modèle après un 429 jusqu'à la fin du retry-after"""
+        self.stats["rate_limited"] += 1
+        budget = self.budget(model)
+        budget.blocked_until = max(budget.blocked_until, time.monotonic() + (retry_after or 5.0))
+        budget.tokens.tokens = min(budget.tokens.tokens, 0.0)
+
+    def headroom(self, model: str) -> float:
+        return self.budget(model).headroom()
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "queued": {model: len(queue) for model, queue in self._queues.items() if queue},
+            "headroom": {model: budget.headroom() for model, budget in self.budgets.items()},
+        }
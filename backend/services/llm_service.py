@@ -1,10 +1,15 @@
 # services/llm_service.py
-from openai import OpenAI # Client pour les APIs compatibles OpenAI (comme Groq)
+from openai import AsyncOpenAI, RateLimitError # Client pour les APIs compatibles OpenAI (comme Groq)
 import os
 import requests
 import asyncio
 from core.config import settings
 from functools import lru_cache
+from services.llm_scheduler import LLMScheduler, RateLimitTimeout, parse_reset
+from services.model_router import ModelRouter
+from services.circuit_breaker import CircuitBreaker
+from core.tokenizer import count_message_tokens
+import time
 
 
 class LLMService:
@@ -20,31 +25,244 @@ class LLMService:
                 "qwen/qwen3-32b"
                 ]
         }
+        self.max_tokens = settings.LLM_MAX_TOKENS
+        self.max_attempts = 3 # Tentatives en cas de 429
+        self.scheduler = LLMScheduler(
+            default_rpm=settings.LLM_DEFAULT_RPM,
+            default_tpm=settings.LLM_DEFAULT_TPM,
+            deadlines={
+                "interactive": settings.LLM_DEADLINE_INTERACTIVE,
+                "agentic": settings.LLM_DEADLINE_AGENTIC,
+                "background": settings.LLM_DEADLINE_BACKGROUND,
+            },
+        )
+        # Routage dynamique : moins cher modèle respectant le SLO, selon les stats live
+        self.router = ModelRouter(
+            latency_slos={
+                "interactive": settings.LLM_SLO_INTERACTIVE,
+                "agentic": settings.LLM_SLO_AGENTIC,
+                "background": settings.LLM_SLO_BACKGROUND,
+            },
+            headroom_fn=self.scheduler.headroom,
+        )
+        # Disjoncteurs par modèle et hedging (requête doublée sur un autre modèle si le 1er token tarde)
+        self.breakers = {
+            model: CircuitBreaker(
+                failure_threshold=settings.LLM_BREAKER_FAILURES,
+                recovery_timeout=settings.LLM_BREAKER_RECOVERY,
+            )
+            for model in self.router.catalog
+        }
+        self.hedging_enabled = settings.LLM_HEDGING_ENABLED
+        self.hedge_ratio = settings.LLM_HEDGE_MAX_RATIO # Part max de requêtes doublées
+        self.hedge_credits = 0.0
+        self.hedge_stats = {"requests": 0, "hedges_sent": 0, "hedges_won": 0, "hedges_denied": 0}
+        self._client = None
     
-    async def get_response(self, messages: list) -> str:
+    async def get_response(self, messages: list, priority: str = "interactive", deadline: float = None) -> str:
+        """Réponse LLM ; priority : interactive (chat), agentic (actions) ou background (résumés)"""
         try:
-            return await self._call_groq(messages)
+            return await self._call_groq(messages, priority, deadline)
         except Exception as e:
-            logger.error(f"Erreur LLM: {e}")
+            print(f"❌ Erreur LLM: {e}")
             # return self._call_fallback(messages)
             return await asyncio.to_thread(self._call_fallback, messages)
-            
-    def _call_groq_sync(self, messages: list) -> str:
+
+    def _get_client(self) -> AsyncOpenAI:
+        if self._client is None:
+            # Pas de retry interne : les 429 et pannes sont gérés par l'ordonnanceur et les disjoncteurs
+            self._client = AsyncOpenAI(
+                api_key=settings.GROQ_API_KEY,
+                base_url=settings.GROQ_API_URL,
+                timeout=settings.LLM_REQUEST_TIMEOUT,
+                max_retries=0,
+            )
+        return self._client
+
+    def _estimate_tokens(self, messages: list) -> int:
+        """Coût d'une requête en tokens : prompt compté + réponse maximale"""
+        return count_message_tokens(messages) + self.max_tokens
+
+    def plan_model(self, prompt_tokens: int, text: str = "", priority: str = "interactive") -> str:
+        """Modèle cible prévu pour un prompt de cette taille (sert à dimensionner le prompt)"""
+        # Simple prévision : la décision est journalisée au moment de l'appel
+        model = self.router.select(prompt_tokens, self.router.classify(text), self.max_tokens, priority, record=False)
+        return model or "llama-3.1-8b-instant"
+
+    def _candidate_models(self, messages: list, priority: str = "interactive") -> list:
+        """Modèles classés par le routeur : le premier est le modèle optimal, les suivants servent de repli"""
+        last_message = messages[-1]["content"] if messages else ""
+        prompt_tokens = self._estimate_tokens(messages) - self.max_tokens
+        return self.router.rank(prompt_tokens, self.router.classify(last_message), self.max_tokens, priority)
+
+    async def _call_groq(self, messages: list, priority: str = "interactive", deadline: float = None) -> str:
+        ranked = self._candidate_models(messages, priority)
+        if not ranked:
+            raise Exception("Aucun modèle ne peut contenir ce prompt")
+        estimated_tokens = self._estimate_tokens(messages)
+        self.hedge_stats["requests"] += 1
+        self.hedge_credits = min(self.hedge_credits + self.hedge_ratio, 5.0)
+
+        excluded = set()
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            # Disjoncteur ouvert = rejet immédiat, sans attendre le timeout du client
+            candidates = [m for m in ranked if m not in excluded and self.breakers[m].allow_request()]
+            if not candidates:
+                break
+            model = await self.scheduler.acquire(candidates, estimated_tokens, priority, deadline)
+            if not self.breakers[model].try_acquire():
+                self.scheduler.release(model, estimated_tokens) # Budget rendu aux autres modèles
+                excluded.add(model) # Requête de test déjà en cours sur ce modèle
+                continue
+            try:
+                return await self._hedged_completion(messages, model, candidates, estimated_tokens, priority)
+            except RateLimitError as e:
+                last_error = e # Modèle bloqué par l'ordonnanceur : il re-routera
+                print(f"⏳ Limite de débit atteinte sur {model} (tentative {attempt}/{self.max_attempts})")
+            except Exception as e:
+                last_error = e
+                excluded.add(model)
+                print(f"⚠️ Échec {model} (tentative {attempt}/{self.max_attempts}): {e}")
+        raise last_error or Exception("Tous les modèles sont indisponibles (disjoncteurs ouverts)")
+
+    async def _hedged_completion(self, messages: list, model: str, candidates: list,
+                                 estimated_tokens: int, priority: str) -> str:
+        """Lance la requête ; si le 1er token tarde au-delà du p95, double sur un autre modèle"""
+        winner = asyncio.get_running_loop().create_future() # Reçoit la tâche qui produit le 1er token
+        attempts = {}
+        alive = {"count": 0}
+
+        def _launch(target: str):
+            alive["count"] += 1
+            task = asyncio.create_task(self._stream_completion(target, messages, estimated_tokens, winner))
+
+            def _on_done(t: asyncio.Task):
+                if t.cancelled():
+                    return
+                error = t.exception()
+                if error is None:
+                    if not winner.done():
+                        winner.set_result(t) # Réponse vide mais valide
+                    return
+                alive["count"] -= 1
+                if alive["count"] == 0 and not winner.done():
+                    winner.set_exception(error)
+
+            task.add_done_callback(_on_done)
+            attempts[target] = task
+
+        _launch(model)
         try:
-            client = OpenAI(api_key=settings.GROQ_API_KEY, base_url=settings.GROQ_API_URL)
-            model = self._select_optimal_model(messages)
+            if self.hedging_enabled:
+                try:
+                    await asyncio.wait_for(asyncio.shield(winner), timeout=self.router.hedge_delay(model))
+                except asyncio.TimeoutError:
+                    hedge_model = await self._acquire_hedge(candidates, model, estimated_tokens, priority)
+                    if hedge_model:
+                        print(f"🪁 Hedging : {model} lent, requête doublée sur {hedge_model}")
+                        _launch(hedge_model)
 
-            print(f"🎯 Utilisation du modèle: {model}")
+            winning_task = await winner
+            # Le perdant est annulé dès que le gagnant a produit son premier token
+            for task in attempts.values():
+                if task is not winning_task:
+                    task.cancel()
+            if winning_task is not attempts[model]:
+                self.hedge_stats["hedges_won"] += 1
+            return await winning_task
+        finally:
+            for task in attempts.values():
+                if not task.done():
+                    task.cancel()
 
-            response = client.chat.completions.create(
-                model=model, messages=messages, stream=False, temperature=0.7, max_tokens=2000
+    async def _acquire_hedge(self, candidates: list, primary: str, estimated_tokens: int, priority: str):
+        """Modèle de secours disponible immédiatement, dans la limite du budget de hedging"""
+        if self.hedge_credits < 1:
+            self.hedge_stats["hedges_denied"] += 1
+            return None
+        alternates = [m for m in candidates if m != primary and self.breakers[m].allow_request()]
+        if not alternates:
+            return None
+        try:
+            # Échéance nulle : on ne double que si un créneau est libre tout de suite
+            hedge_model = await self.scheduler.acquire(alternates, estimated_tokens, priority, deadline=0)
+        except RateLimitTimeout:
+            self.hedge_stats["hedges_denied"] += 1
+            return None
+        if not self.breakers[hedge_model].try_acquire():
+            self.scheduler.release(hedge_model, estimated_tokens)
+            return None
+        self.hedge_credits -= 1
+        self.hedge_stats["hedges_sent"] += 1
+        return hedge_model
+
+    async def _stream_completion(self, model: str, messages: list, estimated_tokens: int,
+                                 winner: asyncio.Future) -> str:
+        """Appel streaming : signale le 1er token, alimente routeur, ordonnanceur et disjoncteur"""
+        client = self._get_client()
+        breaker = self.breakers[model]
+        started = time.monotonic()
+        first_token_latency = None
+        parts = []
+        usage = None
+
+        print(f"🎯 Utilisation du modèle: {model}")
+        try:
+            raw = await client.chat.completions.with_raw_response.create(
+                model=model, messages=messages, stream=True, temperature=0.7, max_tokens=self.max_tokens
             )
-            return response.choices[0].message.content
+            self.scheduler.observe_headers(model, raw.headers)
+            stream = raw.parse()
+            async for chunk in stream:
+                usage = self._chunk_usage(chunk) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token_latency is None:
+                        first_token_latency = time.monotonic() - started
+                        if not winner.done():
+                            winner.set_result(asyncio.current_task())
+                    parts.append(delta)
+        except asyncio.CancelledError:
+            # Perdant du hedging : ni succès ni échec, on rend la place et les tokens non consommés
+            breaker.release()
+            self.scheduler.settle(model, estimated_tokens, estimated_tokens - self.max_tokens + len("".join(parts)) // 4)
+            raise
+        except RateLimitError as e:
+            breaker.release()
+            headers = getattr(getattr(e, "response", None), "headers", None) or {}
+            self.scheduler.observe_headers(model, headers)
+            self.scheduler.penalize(model, parse_reset(headers.get("retry-after")))
+            raise
         except Exception as e:
-            raise Exception(f"Erreur Groq API: {e}")
+            breaker.record_failure()
+            self.router.record(model, time.monotonic() - started, success=False)
+            raise Exception(f"Erreur Groq API ({model}): {e}")
+
+        breaker.record_success()
+        self.router.record(model, time.monotonic() - started, success=True,
+                           completion_tokens=usage.get("completion_tokens") if usage else len(parts),
+                           first_token_latency=first_token_latency)
+        self.scheduler.settle(model, estimated_tokens, usage.get("total_tokens") if usage else None)
+        return "".join(parts)
 
-    async def _call_groq(self, messages: list) -> str:
-        return await asyncio.to_thread(self._call_groq_sync, messages)
+    @staticmethod
+    def _chunk_usage(chunk) -> dict:
+        """Usage renvoyé dans le dernier chunk (champ standard ou extension x_groq)"""
+        usage = getattr(chunk, "usage", None)
+        if usage is None:
+            extra = getattr(chunk, "x_groq", None)
+            usage = extra.get("usage") if isinstance(extra, dict) else getattr(extra, "usage", None)
+        if usage is None:
+            return None
+        if isinstance(usage, dict):
+            return usage
+        return {
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+        }
 
     # def _call_groq(self, messages: list) -> str:
     #     """Utilise l'API Groq avec sélection intelligente du modèle"""
@@ -71,6 +289,10 @@ class LLMService:
     #     except Exception as e:
     #         raise Exception(f"Erreur Groq API: {e}")
 
+    def is_fallback(self, response: str) -> bool:
+        """Vrai si la réponse est le message de mode dégradé (à ne pas mémoriser)"""
+        return response == self._call_fallback([])
+
     def _call_fallback(self, messages: str) -> str:
         """Réponse de fallback si tout échoue"""
         return """🤖 Assistant IA en mode dégradé
@@ -85,92 +307,19 @@ En attendant, voici une réponse générale sur l'IA :
 L'intelligence artificielle est un domaine de l'informatique qui crée des systèmes capables d'apprendre, de raisonner et de résoudre des problèmes comme un humain."""
 
 
-    def _select_optimal_model(self, messages: list) -> str:
-        """Sélectionne le modèle optimal basé sur le contexte"""
-        last_message = messages[-1]["content"] if messages else ""
-        last_message_lower = last_message.lower()
-        
-        # Classification des modèles par catégorie et performance
-        models = {
-            # Modèles rapides (8-20B) - Réponses instantanées
-            "fast": {
-                "model": "llama-3.1-8b-instant",
-                "tokens": 8192,
-                "speed": "très rapide",
-                "use_case": "conversations courantes, réponses simples"
-            },
-            
-            # Modèles équilibrés (17-32B) - Bonnes performances
-            "balanced": {
-                "model": "meta-llama/llama-4-maverick-17b-128e-instruct", 
-                "tokens": 128000,
-                "speed": "rapide",
-                "use_case": "tâches générales, analyse modérée"
-            },
-            
-            # Modèles techniques (32B) - Expert code/technique
-            "technical": {
-                "model": "qwen/qwen3-32b",
-                "tokens": 32768, 
-                "speed": "moyen",
-                "use_case": "code, documentation technique, raisonnement"
-            },
-            
-            # Modèles puissants (70B) - Analyse approfondie
-            "powerful": {
-                "model": "llama-3.3-70b-versatile",
-                "tokens": 8192,
-                "speed": "modéré",
-                "use_case": "recherche, analyse complexe, contenu détaillé"
-            },
-            
-            # Modèles spécialisés (70B) - Domaines spécifiques
-            "specialized": {
-                "model": "deepseek-r1-distill-llama-70b",
-                "tokens": 32768,
-                "speed": "modéré", 
-                "use_case": "raisonnement, tâches spécialisées, connaissances approfondies"
-            },
-            
-            # Modèles multilingues (20B) - Langues multiples
-            "multilingual": {
-                "model": "openai/gpt-oss-20b",
-                "tokens": 8192,
-                "speed": "rapide",
-                "use_case": "multilingue, traitement multiple langues"
-            },
-            
-            
-            # Modèles efficaces (9B) - Léger et performant
-            "efficient": {
-                "model": "gemma2-9b-it",
-                "tokens": 8192,
-                "speed": "très rapide",
-                "use_case": "réponses concises, traitement léger"
-            }
+    def _select_optimal_model(self, messages: list, priority: str = "interactive") -> str:
+        """Sélectionne le modèle optimal basé sur le contexte et les statistiques live"""
+        candidates = self._candidate_models(messages, priority)
+        return candidates[0] if candidates else "llama-3.1-8b-instant"
+
+    def get_router_stats(self) -> dict:
+        """Décisions du routeur et statistiques par modèle (diagnostics)"""
+        return {
+            "router": self.router.get_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "circuit_breakers": {model: breaker.to_dict() for model, breaker in self.breakers.items()},
+            "hedging": {**self.hedge_stats, "enabled": self.hedging_enabled},
         }
-        
-        # # Détection du type de requête pour sélection optimale
-        # if any(word in last_message_lower for word in ["code", "program", "script", "python", "javascript", "java", "c++", "html", "css", "algorithm"]):
-        #     return models["technical"]["model"]  # qwen/qwen3-32b
-        
-        # if any(word in last_message_lower for word in ["recherche", "analyse", "détaillé", "complet", "complexe", "étude", "rapport"]):
-        #     return models["powerful"]["model"]  # llama-3.3-70b-versatile
-        
-        # if any(word in last_message_lower for word in ["raisonnement", "logique", "problème", "solution", "stratégie"]):
-        #     return models["specialized"]["model"]  # deepseek-r1-distill-llama-70b
-        
-        # if any(word in last_message_lower for word in ["anglais", "english", "español", "français", "deutsch", "multilingue", "traduction"]):
-        #     return models["multilingual"]["model"]  # openai/gpt-oss-20b
-        
-        # if len(last_message) > 1000:  # Requêtes très longues
-        #     return models["balanced"]["model"]  # meta-llama/llama-4-maverick-17b-128e-instruct
-        
-        # if len(last_message) > 300:  # Requêtes moyennes
-        #     return models["balanced"]["model"]  # meta-llama/llama-4-maverick-17b-128e-instruct
-        
-        # Par défaut: modèle rapide pour conversations courantes
-        return models["fast"]["model"]  # llama-3.1-8b-instant
     
 
     @lru_cache(maxsize=1000)
@@ -0,0 +1,263 @@
+# services/model_router.py
+import time
+from collections import deque # deque : Fenêtres glissantes de mesures
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# Catalogue des modèles Groq : contexte, coût ($ / million de tokens) et compétences
+MODEL_CATALOG = {
+    # Modèles rapides (8-20B) - Réponses instantanées
+    "llama-3.1-8b-instant": {
+        "category": "fast",
+        "tokens": 8192,
+        "speed": "très rapide",
+        "use_case": "conversations courantes, réponses simples",
+        "cost_input": 0.05,
+        "cost_output": 0.08,
+        "expected_p95": 2.0, # Latence a priori (s) tant qu'aucune mesure n'existe
+        "skills": {"general"},
+    },
+    # Modèles efficaces (9B) - Léger et performant
+    "gemma2-9b-it": {
+        "category": "efficient",
+        "tokens": 8192,
+        "speed": "très rapide",
+        "use_case": "réponses concises, traitement léger",
+        "cost_input": 0.20,
+        "cost_output": 0.20,
+        "expected_p95": 2.5,
+        "skills": {"general"},
+    },
+    # Modèles multilingues (20B) - Langues multiples
+    "openai/gpt-oss-20b": {
+        "category": "multilingual",
+        "tokens": 8192,
+        "speed": "rapide",
+        "use_case": "multilingue, traitement multiple langues",
+        "cost_input": 0.10,
+        "cost_output": 0.50,
+        "expected_p95": 3.0,
+        "skills": {"general", "multilingual", "reasoning"},
+    },
+    # Modèles équilibrés (17-32B) - Bonnes performances
+    "meta-llama/llama-4-maverick-17b-128e-instruct": {
+        "category": "balanced",
+        "tokens": 128000,
+        "speed": "rapide",
+        "use_case": "tâches générales, analyse modérée",
+        "cost_input": 0.20,
+        "cost_output": 0.60,
+        "expected_p95": 3.5,
+        "skills": {"general", "multilingual", "research"},
+    },
+    # Modèles techniques (32B) - Expert code/technique
+    "qwen/qwen3-32b": {
+        "category": "technical",
+        "tokens": 32768,
+        "speed": "moyen",
+        "use_case": "code, documentation technique, raisonnement",
+        "cost_input": 0.29,
+        "cost_output": 0.59,
+        "expected_p95": 5.0,
+        "skills": {"general", "technical", "reasoning", "multilingual"},
+    },
+    # Modèles puissants (70B) - Analyse approfondie
+    "llama-3.3-70b-versatile": {
+        "category": "powerful",
+        "tokens": 8192,
+        "speed": "modéré",
+        "use_case": "recherche, analyse complexe, contenu détaillé",
+        "cost_input": 0.59,
+        "cost_output": 0.79,
+        "expected_p95": 6.0,
+        "skills": {"general", "research", "technical"},
+    },
+    # Modèles spécialisés (70B) - Domaines spécifiques
+    "deepseek-r1-distill-llama-70b": {
+        "category": "specialized",
+        "tokens": 32768,
+        "speed": "modéré",
+        "use_case": "raisonnement, tâches spécialisées, connaissances approfondies",
+        "cost_input": 0.75,
+        "cost_output": 0.99,
+        "expected_p95": 8.0,
+        "skills": {"technical", "reasoning", "research"},
+    },
+}
+
+# Classes de tâches : mots déclencheurs -> compétence requise
+TASK_KEYWORDS = {
+    "technical": ["code", "program", "script", "python", "javascript", "java", "c++", "html", "css", "algorithm"],
+    "research": ["recherche", "analyse", "détaillé", "complet", "complexe", "étude", "rapport"],
+    "reasoning": ["raisonnement", "logique", "problème", "solution", "stratégie"],
+    "multilingual": ["anglais", "english", "español", "deutsch", "multilingue", "traduction"],
+}
+
+
+class ModelStats:
+    """Statistiques glissantes d'un modèle : latence, erreurs, débit"""
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window) # True = succès
+        self.tokens_per_second = deque(maxlen=window)
+        self.last_used = None
+
+    def record(self, latency: float, success: bool, completion_tokens: int = None, first_token_latency: float = None):
+        self.outcomes.append(success)
+        self.last_used = time.time()
+        if not success:
+            return
+        self.latencies.append(latency)
+        if first_token_latency is not None:
+            self.first_token_latencies.append(first_token_latency)
+        if completion_tokens and latency > 0:
+            self.tokens_per_second.append(completion_tokens / latency)
+
+    @staticmethod
+    def _percentile(values, pct: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        index = min(int(round(pct * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    def p50(self) -> Optional[float]:
+        return self._percentile(self.latencies, 0.50)
+
+    def p95(self) -> Optional[float]:
+        return self._percentile(self.latencies, 0.95)
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def avg_tokens_per_second(self) -> Optional[float]:
+        if not self.tokens_per_second:
+            return None
+        return sum(self.tokens_per_second) / len(self.tokens_per_second)
+
+    def to_dict(self) -> Dict:
+        def _round(value):
+            return round(value, 3) if value is not None else None
+
+        return {
+            "samples": len(self.outcomes),
+            "p50_latency": _round(self.p50()),
+            "p95_latency": _round(self.p95()),
+            "error_rate": round(self.error_rate(), 3),
+            "tokens_per_second": _round(self.avg_tokens_per_second()),
+            "last_used": datetime.fromtimestamp(self.last_used).isoformat() if self.last_used else None,
+        }
+
+
+class ModelRouter:
+    """Choisit le modèle le moins cher qui respecte le SLO de latence et la taille du contexte"""
+
+    def __init__(self, latency_slos: Dict[str, float], headroom_fn: Callable[[str], float] = None,
+                 max_error_rate: float = 0.5, min_headroom: float = 0.1):
+        self.catalog = MODEL_CATALOG
+        self.latency_slos = latency_slos
+        self.headroom_fn = headroom_fn or (lambda model: 1.0)
+        self.max_error_rate = max_error_rate
+        self.min_headroom = min_headroom
+        self.stats: Dict[str, ModelStats] = {model: ModelStats() for model in self.catalog}
+        self.decisions = deque(maxlen=50) # Dernières décisions, exposées par les diagnostics
+
+    def classify(self, text: str) -> str:
+        """Classe de tâche d'un message (general par défaut)"""
+        text_lower = text.lower()
+        for task_class, keywords in TASK_KEYWORDS.items():
+            if any(word in text_lower for word in keywords):
+                return task_class
+        return "general"
+
+    def expected_p95(self, model: str) -> float:
+        measured = self.stats[model].p95()
+        return measured if measured is not None else self.catalog[model]["expected_p95"]
+
+    def hedge_delay(self, model: str, minimum: float = 0.3) -> float:
+        """Délai avant hedging : p95 du temps au premier token (ou moitié du p95 a priori)"""
+        measured = self.stats[model]._percentile(self.stats[model].first_token_latencies, 0.95)
+        delay = measured if measured is not None else self.catalog[model]["expected_p95"] / 2
+        return max(delay, minimum)
+
+    def estimated_cost(self, model: str, prompt_tokens: int, max_tokens: int) -> float:
+        info = self.catalog[model]
+        return (prompt_tokens * info["cost_input"] + max_tokens * info["cost_output"]) / 1_000_000
+
+    def rank(self, prompt_tokens: int, task_class: str = "general", max_tokens: int = 2000,
+             priority: str = "interactive", record: bool = True) -> List[str]:
+        """Modèles classés : éligibles (coût croissant) puis dégradés (latence croissante)"""
+        slo = self.latency_slos.get(priority, self.latency_slos.get("interactive", 5.0))
+        eligible, degraded = [], []
+        reasons = {}
+
+        for model, info in self.catalog.items():
+            if prompt_tokens + max_tokens > info["tokens"]:
+                reasons[model] = "contexte insuffisant"
+                continue # Ne rentre pas : jamais candidat
+            if task_class != "general" and task_class not in info["skills"]:
+                reasons[model] = "compétence absente"
+                degraded.append(model)
+                continue
+            if self.stats[model].error_rate() > self.max_error_rate and len(self.stats[model].outcomes) >= 5:
+                reasons[model] = "taux d'erreur élevé"
+                degraded.append(model)
+                continue
+            if self.headroom_fn(model) < self.min_headroom:
+                reasons[model] = "quota presque épuisé"
+                degraded.append(model)
+                continue
+            if self.expected_p95(model) > slo:
+                reasons[model] = "SLO de latence non tenu"
+                degraded.append(model)
+                continue
+            eligible.append(model)
+
+        eligible.sort(key=lambda m: self.estimated_cost(m, prompt_tokens, max_tokens))
+        degraded.sort(key=lambda m: (task_class not in self.catalog[m]["skills"], self.expected_p95(m)))
+        ranked = eligible + degraded
+        if not record:
+            return ranked
+
+        self.decisions.append({
+            "timestamp": datetime.now().isoformat(),
+            "task_class": task_class,
+            "priority": priority,
+            "prompt_tokens": prompt_tokens,
+            "latency_slo": slo,
+            "chosen": ranked[0] if ranked else None,
+            "eligible": eligible,
+            "excluded": reasons,
+        })
+        return ranked
+
+    def select(self, prompt_tokens: int, task_class: str = "general", max_tokens: int = 2000,
+               priority: str = "interactive", record: bool = True) -> Optional[str]:
+        ranked = self.rank(prompt_tokens, task_class, max_tokens, priority, record)
+        return ranked[0] if ranked else None
+
+    def record(self, model: str, latency: float, success: bool, completion_tokens: int = None,
+               first_token_latency: float = None):
+        if model not in self.stats:
+            self.stats[model] = ModelStats()
+        self.stats[model].record(latency, success, completion_tokens, first_token_latency)
+
+    def get_stats(self) -> Dict:
+        return {
+            "latency_slos": self.latency_slos,
+            "models": {
+                model: {
+                    **self.stats[model].to_dict(),
+                    "context": info["tokens"],
+                    "cost_input": info["cost_input"],
+                    "cost_output": info["cost_output"],
+                    "headroom": self.headroom_fn(model),
+                }
+                for model, info in self.catalog.items()
+            },
+            "recent_decisions": list(self.decisions)[-10:],
+        }
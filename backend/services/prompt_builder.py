@@ -0,0 +1,125 @@
+# services/prompt_builder.py
+from typing import Dict, List, Tuple
+from langchain.schema import Document
+from core.config import settings
+from core.tokenizer import count_tokens, truncate_to_tokens, compress_to_tokens, MESSAGE_OVERHEAD
+from services.model_router import MODEL_CATALOG
+
+SYSTEM_TEMPLATE = """Utilisez le contexte pour répondre précisément.
+
+{memory}CONTEXTE:
+{context}
+
+QUESTION: {query}
+
+RÉPONSE:"""
+
+SIMPLE_TEMPLATE = "{memory}Question: {query}\n\nRéponse:"
+
+MEMORY_TEMPLATE = "RÉSUMÉ DE LA CONVERSATION:\n{summary}\n\n"
+
+
+class PromptBuilder:
+    """Assemble le prompt RAG dans un budget de tokens : instructions, sources puis historique"""
+
+    def __init__(self):
+        self.reserve_output_tokens = settings.LLM_MAX_TOKENS # Place laissée à la réponse
+        self.max_prompt_tokens = settings.RAG_PROMPT_TOKEN_BUDGET # Plafond, même sur les grands contextes
+        self.history_share = settings.RAG_HISTORY_SHARE # Part max du budget restant pour l'historique
+        self.max_history_messages = 4
+        self.min_piece_tokens = 80 # En dessous, un morceau tronqué n'apporte plus rien
+        self.safety_margin = 64
+
+    def budget_for(self, model: str) -> int:
+        context_window = MODEL_CATALOG.get(model, {}).get("tokens", 8192)
+        return min(context_window - self.reserve_output_tokens - self.safety_margin, self.max_prompt_tokens)
+
+    def build(self, query: str, relevant_docs: List[Document], conversation_history: List[Dict] = None,
+              model: str = None, summary: str = None) -> Tuple[List[Dict], Dict]:
+        """Retourne (messages, rapport d'usage des tokens planifié) ; `summary` = mémoire résumée"""
+        budget = self.budget_for(model)
+        report = {
+            "model": model,
+            "budget": budget,
+            "trimmed_sources": 0,
+            "dropped_sources": 0,
+            "compressed_history": 0,
+            "dropped_history": 0,
+        }
+
+        # 1. Partie fixe : instructions + résumé + question (jamais tronquée, sauf démesure)
+        template = SYSTEM_TEMPLATE if relevant_docs else SIMPLE_TEMPLATE
+        memory = MEMORY_TEMPLATE.format(summary=truncate_to_tokens(summary, budget // 4, model)) if summary else ""
+        fixed_tokens = count_tokens(template.format(memory=memory, context="", query=query), model) + MESSAGE_OVERHEAD
+        if fixed_tokens > budget // 2:
+            query = truncate_to_tokens(query, budget // 4, model)
+            fixed_tokens = count_tokens(template.format(memory=memory, context="", query=query), model) + MESSAGE_OVERHEAD
+        remaining = budget - fixed_tokens
+
+        # 2. Historique : les messages les plus récents d'abord, les plus anciens sacrifiés
+        history_budget = int(remaining * self.history_share) if relevant_docs else remaining
+        history, history_tokens = self._fit_history(conversation_history or [], history_budget, model, report)
+        remaining -= history_tokens
+
+        # 3. Sources : par ordre de pertinence, les moins pertinentes tronquées/écartées en premier
+        context_text, source_tokens = self._fit_sources(relevant_docs, remaining, model, report)
+
+        if relevant_docs:
+            system_prompt = SYSTEM_TEMPLATE.format(memory=memory, context=context_text, query=query)
+        else:
+            system_prompt = SIMPLE_TEMPLATE.format(memory=memory, query=query)
+        messages = [{"role": "system", "content": system_prompt}] + history
+
+        report.update({
+            "summary": count_tokens(memory, model),
+            "system": fixed_tokens,
+            "sources": source_tokens,
+            "history": history_tokens,
+            "total": fixed_tokens + source_tokens + history_tokens,
+        })
+        return messages, report
+
+    def _fit_history(self, conversation_history: List[Dict], budget: int, model: str, report: Dict):
+        recent = conversation_history[-self.max_history_messages:]
+        kept = []
+        used = 0
+        for index, msg in enumerate(reversed(recent)):
+            content = msg.get("content", "")
+            cost = count_tokens(content, model) + MESSAGE_OVERHEAD
+            if used + cost > budget:
+                available = budget - used - MESSAGE_OVERHEAD
+                if available < self.min_piece_tokens:
+                    report["dropped_history"] += len(recent) - index
+                    break
+                # Longues réponses (code...) : on garde le début et la fin
+                content = compress_to_tokens(content, available, model)
+                cost = count_tokens(content, model) + MESSAGE_OVERHEAD
+                report["compressed_history"] += 1
+            kept.append({"role": msg.get("role", "user"), "content": content})
+            used += cost
+        kept.reverse()
+        return kept, used
+
+    def _fit_sources(self, relevant_docs: List[Document], budget: int, model: str, report: Dict):
+        parts = []
+        used = 0
+        for i, doc in enumerate(relevant_docs):
+            header = f"Document {i+1} (Source: {doc.metadata.get('source', 'Inconnu')}):\n"
+            header_tokens = count_tokens(header, model) + 2 # Séparateur entre documents
+            content = doc.page_content
+            content_tokens = count_tokens(content, model)
+            available = budget - used - header_tokens
+            if content_tokens > available:
+                if available < self.min_piece_tokens:
+                    report["dropped_sources"] += len(relevant_docs) - i
+                    break
+                content = truncate_to_tokens(content, available, model)
+                content_tokens = count_tokens(content, model)
+                report["trimmed_sources"] += 1
+            parts.append(header + content)
+            used += header_tokens + content_tokens
+        return "\n\n".join(parts), used
+
+
+# Instance globale
+prompt_builder = PromptBuilder()
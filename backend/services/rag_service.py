@@ -4,51 +4,59 @@ from langchain.schema import Document # Document : Format standard LangChain pou
 from core.vectorstore import vector_store  # vector_store : La Base de données vectorielle FAISS
 from services.llm_service import llm_service # llm_service : Service pour appeler les modèles de langage
 from services.knowledge_management import knowledge_manager
+from services.prompt_builder import prompt_builder
+from services.conversation_index import conversation_index
+from services.knowledge_usage import knowledge_usage
+from core.tokenizer import count_tokens
 from datetime import datetime
-from core.database import db 
+from core.executors import run_cpu
 import asyncio
 
 class RAGService:
     def __init__(self):
         self.vector_store = vector_store  # Initialisation de base vector
     
-    def build_context_prompt(self, query: str, relevant_docs: List[Document]) -> str:
-        """Prompt avec contexte"""
-        if not relevant_docs: # Si pas de documents, prompt simple
-            return f"Question: {query}\n\nRéponse:"
-        
-        context_text = "\n\n".join([
-            f"Document {i+1} (Source: {doc.metadata.get('source', 'Inconnu')}):\n{doc.page_content}"
-            for i, doc in enumerate(relevant_docs)
-        ])
-        
-        return f"""Utilisez le contexte pour répondre précisément.
-
-CONTEXTE:
-{context_text}
-
-QUESTION: {query}
-
-RÉPONSE:"""
+    def build_context_prompt(self, query: str, relevant_docs: List[Document], model: str = None) -> str:
+        """Prompt avec contexte, dans le budget de tokens du modèle"""
+        messages, _ = prompt_builder.build(query, relevant_docs, model=model)
+        return messages[0]["content"]
     
-    async def process_query_with_rag(self, query: str, user_id: str, conversation_history: list = None) -> dict:
-        """Traite une requête avec RAG et enrichment automatique"""
+    async def process_query_with_rag(self, query: str, user_id: str, conversation_history: list = None,
+                                     query_embedding: List[float] = None, conversation_summary: str = None,
+                                     conversation_id: str = None) -> dict:
+        """Traite une requête avec RAG et enrichment automatique (résumé + derniers messages + sources)"""
         try:
             
-            # Recherche dans la base vectorielle
-            relevant_docs = self.vector_store.search_similar(query, k=3, user_id=user_id)
+            # Un seul embedding (réutilisé s'il a déjà été calculé) pour la base de connaissances
+            # et l'index de la conversation, interrogés en parallèle
+            if query_embedding is None:
+                query_embedding = await run_cpu(self.vector_store.embed_query, query)
+            history_questions = [msg.get("content", "") for msg in conversation_history or [] if msg.get("role") == "user"]
+            relevant_docs, related_turns = await asyncio.gather(
+                run_cpu(self.vector_store.search_by_vector, query_embedding, 3, user_id),
+                conversation_index.search(user_id, conversation_id, query_embedding, exclude_questions=history_questions),
+            )
+            knowledge_usage.record_documents(relevant_docs) # Connaissances retrouvées : popularité, sans écriture
+            turn_docs = [self._turn_document(turn) for turn in related_turns]
+            if turn_docs:
+                print(f"🔁 {len(turn_docs)} échange(s) antérieur(s) pertinent(s) dans la conversation")
 
             
-            # Construction du prompt , Intègre les documents trouvés dans le prompt
-            rag_prompt = self.build_context_prompt(query, relevant_docs)
-            
-            # Appel au LLM
-            messages = [{"role": "system", "content": rag_prompt}]
-            
+            # Modèle cible : dimensionne le budget de tokens du prompt
+            recent_history = (conversation_history or [])[-prompt_builder.max_history_messages:]
+            raw_tokens = (count_tokens(query)
+                          + sum(count_tokens(doc.page_content) for doc in relevant_docs + turn_docs)
+                          + sum(count_tokens(msg.get("content", "")) for msg in recent_history)
+                          + count_tokens(conversation_summary or ""))
+            target_model = llm_service.plan_model(min(raw_tokens, prompt_builder.max_prompt_tokens), query)
+
+            # Construction du prompt : instructions, sources et historique dans le budget
+            messages, token_usage = prompt_builder.build(
+                query, relevant_docs + turn_docs, conversation_history, model=target_model, summary=conversation_summary
+            )
             if conversation_history: #  Garde le contexte de la conversation
-                for msg in conversation_history[-4:]:
-                    messages.append({"role": msg['role'], "content": msg['content']})
                 print("✅ Garde le contexte de la conversation")
+            print(f"🧮 Tokens prévus: {token_usage['total']}/{token_usage['budget']} ({target_model})")
 
             # Génère la réponse basée sur le contexte
             response =  await llm_service.get_response(messages)
@@ -66,6 +74,8 @@ RÉPONSE:"""
                 "sources": sources,
                 "has_context": len(relevant_docs) > 0,
                 "context_count": len(relevant_docs),
+                "related_turns": [turn["seq"] for turn in related_turns],
+                "token_usage": token_usage,
             }
             
         except Exception as e:
@@ -77,6 +87,13 @@ RÉPONSE:"""
                 "context_count": 0,
             }
 
+    def _turn_document(self, turn: Dict) -> Document:
+        """Ancien tour de la conversation, présenté comme une source du prompt"""
+        return Document(
+            page_content=f"Utilisateur: {turn['question']}\nAssistant: {turn['answer']}",
+            metadata={"source": "échange précédent de la conversation", "seq": turn["seq"], "score": turn["score"]},
+        )
+
     def add_knowledge_documents(self, texts: List[str], metadata: List[Dict], user_id: str):
         """Ajoute des documents à la base de connaissances"""
         try:
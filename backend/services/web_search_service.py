@@ -5,39 +5,68 @@ import re
 import html
 from typing import List, Dict, Optional
 from urllib.parse import urlparse, quote_plus
+from core.config import settings
+from core.http_client import http_client # Client partagé : connexions réutilisées d'une recherche à l'autre
 
 
 class WebSearchService:
     def __init__(self):
-        self.timeout = httpx.Timeout(20.0)
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0",
             "Accept": "application/json,text/html;q=0.9,*/*;q=0.8",
             "Accept-Language": "fr,en;q=0.8",
         }
+        self.deadline = settings.WEB_SEARCH_DEADLINE # Délai global, toutes sources confondues
+        self.searxng_instances = [
+            "https://search.disroot.org",
+            "https://searx.tiekoetter.com",
+            "https://searxng.nicfab.eu",
+            "https://searx.be",  # Nouvelle instance
+            "https://search.us.projectsegfau.lt",  # Nouvelle instance
+        ]
             
     async def search_with_fallback(self, query: str, max_results: int = 5) -> Dict:
         print(f"Recherche optimisée: '{query}' (max {max_results})")
-        results = []
 
-        # Ordre des sources avec priorités
-        sources = [
-            self._search_duckduckgo_lite,
-            self._search_wikipedia,
-            self._search_searxng,
-            # self._search_google_programmable  # Décommentez si configuré
-        ]
-
-        for source in sources:
-            try:
-                part = await source(query, max_results)
-                if part:
-                    results.extend(part)
-                    print(f"✅ {source.__name__}: {len(part)} résultats")
-                    if len(results) >= max_results:
-                        break
-            except Exception as e:
-                print(f"❌ Erreur {source.__name__}: {e}")
+        # Toutes les sources en parallèle ; résultats fusionnés à leur arrivée, sous un délai global
+        sources = {
+            "duckduckgo": self._search_duckduckgo_lite(query, max_results),
+            "wikipedia_fr": self._search_wikipedia_lang("fr", query, max_results),
+            "wikipedia_en": self._search_wikipedia_lang("en", query, max_results),
+            **{
+                f"searxng {instance}": self._search_searxng_instance(instance, query, max_results)
+                for instance in self.searxng_instances
+            },
+            # "google": self._search_google_programmable(query, max_results),  # Décommentez si configuré
+        }
+        tasks = {asyncio.create_task(coro): name for name, coro in sources.items()}
+        results: List[Dict] = []
+        seen = set()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        pending = set(tasks)
+        try:
+            while pending and len(results) < max_results:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    print(f"⏱️ Délai de recherche atteint, {len(pending)} source(s) abandonnée(s)")
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        part = task.result()
+                    except Exception as e:
+                        print(f"❌ Erreur {tasks[task]}: {e}")
+                        continue
+                    fresh = self._merge_results(results, seen, part or [])
+                    if fresh:
+                        print(f"✅ {tasks[task]}: {fresh} résultats")
+        finally:
+            # Sources les plus lentes annulées dès que le quota est atteint (ou le délai écoulé)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
 
         if not results:
             print("❌ Aucun résultat trouvé, utilisation du fallback LLM")
@@ -49,6 +78,7 @@ class WebSearchService:
                 "has_web_results": False,
             }
 
+        results.sort(key=lambda result: result.get("confidence", 0), reverse=True) # Tri stable : ordre d'arrivée sinon
         return {
             "query": query,
             "results": results[:max_results],
@@ -57,6 +87,30 @@ class WebSearchService:
             "has_web_results": True,
         }
 
+    def _merge_results(self, results: List[Dict], seen: set, part: List[Dict]) -> int:
+        """Ajoute les résultats exploitables pas encore vus (même URL normalisée) ; nombre ajoutés"""
+        added = 0
+        for result in part:
+            if not result.get("content"):
+                continue
+            key = self._url_key(result.get("url", "")) or result.get("title", "").lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append(result)
+            added += 1
+        return added
+
+    def _url_key(self, url: str) -> str:
+        try:
+            parsed = urlparse(url)
+        except ValueError:
+            return url
+        if not parsed.netloc:
+            return ""
+        host = parsed.netloc.lower().removeprefix("www.")
+        return f"{host}{parsed.path.rstrip('/')}" + (f"?{parsed.query}" if parsed.query else "")
+
     # ---------------- DuckDuckGo ----------------
     async def _search_duckduckgo_lite(self, query: str, max_results: int) -> List[Dict]:
         url = "https://api.duckduckgo.com/"
@@ -67,22 +121,21 @@ class WebSearchService:
             "no_redirect": "1",
         }
 
-        async with httpx.AsyncClient(timeout=self.timeout, headers=self.headers) as client:
-            for attempt, delay in enumerate([1, 3, 6], 1):
-                resp = await client.get(url, params=params)
-                if resp.status_code == 200:
-                    try:
-                        data = resp.json()
-                        return self._parse_duckduckgo(data, max_results)
-                    except Exception as e:
-                        print(f"DuckDuckGo JSON error: {e}")
-                        return []
-                elif resp.status_code == 202:
-                    print(f"DuckDuckGo retry {attempt}/3 après {delay}s")
-                    await asyncio.sleep(delay)
-                else:
-                    print(f"DuckDuckGo status {resp.status_code}")
-                    break
+        for attempt, delay in enumerate([1, 3, 6], 1):
+            resp = await http_client.get(url, params=params, headers=self.headers)
+            if resp.status_code == 200:
+                try:
+                    data = resp.json()
+                    return self._parse_duckduckgo(data, max_results)
+                except Exception as e:
+                    print(f"DuckDuckGo JSON error: {e}")
+                    return []
+            elif resp.status_code == 202:
+                print(f"DuckDuckGo retry {attempt}/3 après {delay}s")
+                await asyncio.sleep(delay)
+            else:
+                print(f"DuckDuckGo status {resp.status_code}")
+                break
         return []
 
     def _parse_duckduckgo(self, data: dict, max_results: int) -> List[Dict]:
@@ -122,106 +175,80 @@ class WebSearchService:
         return results[:max_results]
 
     # ---------------- Wikipedia ----------------
-    async def _search_wikipedia(self, query: str, max_results: int) -> List[Dict]:
-        results = []
-        async with httpx.AsyncClient(timeout=self.timeout, headers=self.headers) as client:
-            for lang in ["fr", "en"]:
-                params = {
-                    "action": "query",
-                    "list": "search",
-                    "srsearch": query,
-                    "format": "json",
-                    "utf8": 1,
-                    "srlimit": max_results,
-                }
-                resp = await client.get(f"https://{lang}.wikipedia.org/w/api.php", params=params)
-                if resp.status_code != 200:
-                    continue
-
-                if "application/json" not in resp.headers.get("Content-Type", ""):
-                    print(f"Wikipedia {lang} n’a pas renvoyé du JSON")
-                    continue
+    async def _search_wikipedia_lang(self, lang: str, query: str, max_results: int) -> List[Dict]:
+        params = {
+            "action": "query",
+            "list": "search",
+            "srsearch": query,
+            "format": "json",
+            "utf8": 1,
+            "srlimit": max_results,
+        }
+        resp = await http_client.get(f"https://{lang}.wikipedia.org/w/api.php", params=params, headers=self.headers)
+        if resp.status_code != 200:
+            return []
 
-                data = resp.json()
-                for item in data.get("query", {}).get("search", []):
-                    results.append({
-                        "title": item.get("title", ""),
-                        "content": self._clean_text(item.get("snippet", "")),
-                        "url": f"https://{lang}.wikipedia.org/wiki/{quote_plus(item.get('title', '').replace(' ', '_'))}",
-                        "source": f"wikipedia_{lang}",
-                        "domain": "wikipedia.org",
-                        "confidence": 0.8,
-                    })
-                if results:
-                    break
+        if "application/json" not in resp.headers.get("Content-Type", ""):
+            print(f"Wikipedia {lang} n’a pas renvoyé du JSON")
+            return []
+
+        data = resp.json()
+        results = []
+        for item in data.get("query", {}).get("search", []):
+            results.append({
+                "title": item.get("title", ""),
+                "content": self._clean_text(item.get("snippet", "")),
+                "url": f"https://{lang}.wikipedia.org/wiki/{quote_plus(item.get('title', '').replace(' ', '_'))}",
+                "source": f"wikipedia_{lang}",
+                "domain": "wikipedia.org",
+                "confidence": 0.8,
+            })
         return results[:max_results]
 
     # ---------------- SearXNG ----------------
+    async def _search_searxng_instance(self, instance: str, query: str, max_results: int) -> List[Dict]:
+        """Recherche via une instance SearXNG (les instances sont interrogées en parallèle)"""
+        params = {
+            "q": query,
+            "format": "json",
+            "language": "fr",
+            "safesearch": 0,
+        }
+        # Essayer d'abord le endpoint standard
+        try:
+            resp = await http_client.get(f"{instance}/search", headers=self.headers, params=params)
+        except httpx.ConnectError:
+            # Si échec, essayer sans /search
+            resp = await http_client.get(instance, headers=self.headers, params=params)
 
+        if resp.status_code != 200:
+            print(f"{instance} status {resp.status_code}")
+            return []
 
-    async def _search_searxng(self, query: str, max_results: int) -> List[Dict]:
-        """Recherche via SearXNG avec meilleure gestion d'erreurs"""
-        instances = [
-            "https://search.disroot.org",
-            "https://searx.tiekoetter.com",
-            "https://searxng.nicfab.eu",
-            "https://searx.be",  # Nouvelle instance
-            "https://search.us.projectsegfau.lt",  # Nouvelle instance
-        ]
-        
-        for instance in instances:
+        content_type = resp.headers.get("Content-Type", "").lower()
+        if "application/json" not in content_type:
+            print(f" {instance} pas JSON - Content-Type: {content_type}")
+            # Essayer de parser quand même
             try:
-                async with httpx.AsyncClient(timeout=self.timeout, headers=self.headers) as client:
-                    # Essayer d'abord le endpoint standard
-                    try:
-                        resp = await client.get(f"{instance}/search", params={
-                            "q": query,
-                            "format": "json",
-                            "language": "fr",
-                            "safesearch": 0,
-                        })
-                    except httpx.ConnectError:
-                        # Si échec, essayer sans /search
-                        resp = await client.get(instance, params={
-                            "q": query,
-                            "format": "json",
-                            "language": "fr",
-                            "safesearch": 0,
-                        })
-                    
-                    if resp.status_code != 200:
-                        print(f"{instance} status {resp.status_code}")
-                        continue
-                    
-                    content_type = resp.headers.get("Content-Type", "").lower()
-                    if "application/json" not in content_type:
-                        print(f" {instance} pas JSON - Content-Type: {content_type}")
-                        # Essayer de parser quand même
-                        try:
-                            data = resp.json()
-                        except:
-                            continue
-                    else:
-                        data = resp.json()
-
-                    results = []
-                    for item in data.get("results", [])[:max_results]:
-                        if not item.get("title") or not item.get("content"):
-                            continue
-                        results.append({
-                            "title": self._clean_text(item["title"]),
-                            "content": self._clean_text(item["content"]),
-                            "url": item.get("url", ""),
-                            "source": "searxng",
-                            "domain": self._extract_domain(item.get("url", "")),
-                            "confidence": 0.75,
-                        })
-                    if results:
-                        return results
-            except Exception as e:
-                print(f"❌ Erreur {instance}: {e}")
+                data = resp.json()
+            except:
+                return []
+        else:
+            data = resp.json()
+
+        results = []
+        for item in data.get("results", [])[:max_results]:
+            if not item.get("title") or not item.get("content"):
                 continue
-        return []
+            results.append({
+                "title": self._clean_text(item["title"]),
+                "content": self._clean_text(item["content"]),
+                "url": item.get("url", ""),
+                "source": "searxng",
+                "domain": self._extract_domain(item.get("url", "")),
+                "confidence": 0.75,
+            })
+        return results
  
     # ---------------- Utils ----------------
     def _clean_text(self, text: str) -> str:
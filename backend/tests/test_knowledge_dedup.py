@@ -0,0 +1,62 @@
+# tests/test_knowledge_dedup.py
+"""Quasi-doublons de connaissances : questions différentes jamais fusionnées, réponses jamais écrasées
+
+Usage (depuis backend/) :
+    python -m pytest -q tests/test_knowledge_dedup.py
+"""
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("REFRESH_SECRET_KEY", "test-refresh-secret")
+os.environ.setdefault("DATA_BACKEND", "memory")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.knowledge_dedup import KnowledgeDeduplicator, is_near_duplicate, same_question  # noqa: E402
+
+DIFFERENT_QUESTIONS = [
+    ("Qu'est-ce que Python ?", "Qu'est-ce que Java ?"),
+    ("Comment installer Docker sur Ubuntu", "Comment installer Docker sur Windows"),
+    ("Écris une fonction Python qui trie une liste", "Écris une fonction Python qui inverse une liste"),
+    ("capitale de la France", "capitale de la Belgique"),
+    ("Comment installer Docker avec Compose", "Comment installer Docker sans Compose"),
+]
+
+REPHRASED_QUESTIONS = [
+    ("Qu'est-ce que Python ?", "qu'est ce que python"),
+    ("Comment installer Docker sur Ubuntu ?", "comment installer docker sur ubuntu"),
+    ("Écris une fonction Python qui trie une liste", "Ecris une fonction python qui trie la liste"),
+]
+
+
+@pytest.mark.parametrize("question, other", DIFFERENT_QUESTIONS)
+def test_different_questions_are_not_near_duplicates(question, other):
+    assert not is_near_duplicate(question, other)
+
+
+@pytest.mark.parametrize("question, other", REPHRASED_QUESTIONS)
+def test_rephrased_questions_are_near_duplicates(question, other):
+    assert is_near_duplicate(question, other)
+
+
+def test_same_question_ignores_case_accents_and_punctuation_only():
+    assert same_question("Écris une fonction Python ?", "ecris une fonction python")
+    assert not same_question("Écris une fonction Python qui trie une liste", "Ecris une fonction python qui trie la liste")
+    assert not same_question("", "")
+
+
+def test_batch_merge_keeps_response_of_a_different_question():
+    target = {"question": "Écris une fonction Python qui trie une liste", "response": "sorted()", "value_score": 0.6}
+    duplicate = {"question": "Ecris une fonction python qui trie la liste", "response": "autre", "value_score": 0.9}
+    KnowledgeDeduplicator._merge_into(target, duplicate)
+    assert target["response"] == "sorted()" and target["value_score"] == 0.6
+    assert target["usage_count"] == 2
+
+
+def test_batch_merge_replaces_response_of_the_same_question():
+    target = {"question": "Qu'est-ce que Python ?", "response": "Un serpent", "value_score": 0.5}
+    duplicate = {"question": "qu'est-ce que python", "response": "Un langage", "value_score": 0.9}
+    KnowledgeDeduplicator._merge_into(target, duplicate)
+    assert target["response"] == "Un langage" and target["value_score"] == 0.9
@@ -20,7 +20,7 @@ import {
 import { useAuth } from '../context/AuthContext';
 import { LinearGradient } from 'expo-linear-gradient';
 import Icon from 'react-native-vector-icons/MaterialIcons';
-import { chatService, userService, documentService } from '../services/api';
+import { chatService, userService, documentService, mergeConversations, appendConversations } from '../services/api';
 import UserSettings from './UserSettings';
 import MessageRenderer from './MessageRenderer';
 
@@ -33,6 +33,9 @@ const ChatScreen = ({ navigation }) => {
   const [isLoading, setIsLoading] = useState(false);
   const [conversationId, setConversationId] = useState(null);
   const [conversations, setConversations] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const syncedAt = useRef(null); // server_time de la dernière lecture : base de la synchronisation incrémentale
   const [showSidebar, setShowSidebar] = useState(false);
   const [showSettings, setShowSettings] = useState(false);
   const [deletingConversation, setDeletingConversation] = useState(null);
@@ -64,13 +67,44 @@ const ChatScreen = ({ navigation }) => {
 
   const loadConversations = async () => {
     try {
-      const data = await chatService.getConversations();
-      setConversations(data.conversations || []);
+      if (!syncedAt.current) {
+        // Première page seulement, les suivantes au défilement
+        const data = await chatService.getConversations();
+        setConversations(data.conversations || []);
+        setNextCursor(data.next_cursor);
+        syncedAt.current = data.server_time;
+      } else {
+        // Seulement ce qui a changé depuis la dernière lecture
+        const data = await chatService.syncConversations(syncedAt.current);
+        setConversations(prev => mergeConversations(prev, data.conversations, data.deleted));
+        syncedAt.current = data.server_time;
+      }
     } catch (error) {
       console.error('Error loading conversations:', error);
     }
   };
 
+  const loadMoreConversations = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const data = await chatService.getConversations({ cursor: nextCursor });
+      setConversations(prev => appendConversations(prev, data.conversations));
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error loading more conversations:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const handleConversationsScroll = ({ nativeEvent }) => {
+    const { layoutMeasurement, contentOffset, contentSize } = nativeEvent;
+    if (layoutMeasurement.height + contentOffset.y >= contentSize.height - 80) {
+      loadMoreConversations();
+    }
+  };
+
   const handleLogout = async () => {
     try {
       await logout();
@@ -372,7 +406,11 @@ const ChatScreen = ({ navigation }) => {
           </LinearGradient>
         </TouchableOpacity>
 
-        <ScrollView style={styles.conversationsList}>
+        <ScrollView
+          style={styles.conversationsList}
+          onScroll={handleConversationsScroll}
+          scrollEventThrottle={200}
+        >
           {conversations.map((conversation) => (
             <TouchableOpacity
               key={conversation.id}
@@ -399,6 +437,15 @@ const ChatScreen = ({ navigation }) => {
               </TouchableOpacity>
             </TouchableOpacity>
           ))}
+          {nextCursor && (
+            <TouchableOpacity
+              style={styles.loadMoreButton}
+              onPress={loadMoreConversations}
+              disabled={loadingMore}
+            >
+              <Text style={styles.loadMoreText}>{loadingMore ? 'Chargement...' : 'Charger plus'}</Text>
+            </TouchableOpacity>
+          )}
         </ScrollView>
 
         <View style={styles.userSection}>
@@ -708,6 +755,15 @@ const styles = StyleSheet.create({
   deleteButton: {
     padding: 4,
   },
+  loadMoreButton: {
+    alignItems: 'center',
+    padding: 12,
+    marginVertical: 4,
+  },
+  loadMoreText: {
+    color: '#94a3b8',
+    fontSize: 14,
+  },
   userSection: {
     flexDirection: 'row',
     alignItems: 'center',
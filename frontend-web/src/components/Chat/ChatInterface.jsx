@@ -1,6 +1,6 @@
 // components/Chat/ChatInterface.jsx 
 import React, { useState, useRef, useEffect } from 'react';
-import { chatService } from '../../services/api';
+import { chatService, mergeConversations, appendConversations } from '../../services/api';
 import MessageList from './MessageList';
 import InputArea from './InputArea';
 import { useAuth } from '../../contexts/AuthContext';
@@ -13,6 +13,9 @@ const ChatInterface = () => {
   const [isLoading, setIsLoading] = useState(false);
   const [conversationId, setConversationId] = useState(null);
   const [conversations, setConversations] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const syncedAt = useRef(null); // server_time de la dernière lecture : base de la synchronisation incrémentale
   const [showSidebar, setShowSidebar] = useState(true);
   const [showFileUpload, setShowFileUpload] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
@@ -32,13 +35,37 @@ const ChatInterface = () => {
 
   const loadConversations = async () => {
     try {
-      const data = await chatService.getConversations();
-      setConversations(data.conversations || []);
+      if (!syncedAt.current) {
+        // Première page seulement, les suivantes à la demande
+        const data = await chatService.getConversations();
+        setConversations(data.conversations || []);
+        setNextCursor(data.next_cursor);
+        syncedAt.current = data.server_time;
+      } else {
+        // Seulement ce qui a changé depuis la dernière lecture
+        const data = await chatService.syncConversations(syncedAt.current);
+        setConversations(prev => mergeConversations(prev, data.conversations, data.deleted));
+        syncedAt.current = data.server_time;
+      }
     } catch (error) {
       console.error('Error loading conversations:', error);
     }
   };
 
+  const loadMoreConversations = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const data = await chatService.getConversations({ cursor: nextCursor });
+      setConversations(prev => appendConversations(prev, data.conversations));
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error loading more conversations:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleNewChat = () => {
     setMessages([]);
     setConversationId(null);
@@ -374,6 +401,25 @@ const ChatInterface = () => {
               </div>
             ))
           )}
+
+          {nextCursor && (
+            <button
+              onClick={loadMoreConversations}
+              disabled={loadingMore}
+              style={{
+                width: '100%',
+                padding: '0.5rem',
+                background: 'transparent',
+                border: '1px solid #475569',
+                borderRadius: '0.75rem',
+                color: '#94a3b8',
+                fontSize: '0.875rem',
+                cursor: loadingMore ? 'not-allowed' : 'pointer'
+              }}
+            >
+              {loadingMore ? 'Chargement...' : 'Charger plus'}
+            </button>
+          )}
         </div>
 
         {/* User info */}
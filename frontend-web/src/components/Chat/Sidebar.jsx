@@ -8,7 +8,7 @@ import {
   Trash2
 } from 'lucide-react';
 import { useAuth } from '../../contexts/AuthContext';
-import { getConversations } from '../../services/api';
+import { chatService, appendConversations } from '../../services/api';
 
 const Sidebar = ({ 
   conversations, 
@@ -18,16 +18,19 @@ const Sidebar = ({
   onFileUpload 
 }) => {
   const [conversationsList, setConversationsList] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const { user, logout } = useAuth();
 
   useEffect(() => {
     loadConversations();
   }, []);
 
-  const loadConversations = async () => {
+  // Page par page : la première au montage, les suivantes via next_cursor
+  const loadConversations = async (cursor = null) => {
     try {
-      const data = await getConversations();
-      setConversationsList(data.conversations || []);
+      const data = await chatService.getConversations(cursor ? { cursor } : {});
+      setConversationsList(prev => cursor ? appendConversations(prev, data.conversations) : (data.conversations || []));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error('Error loading conversations:', error);
     }
@@ -200,6 +203,24 @@ const Sidebar = ({
             </div>
           ))
         )}
+
+        {nextCursor && (
+          <button
+            onClick={() => loadConversations(nextCursor)}
+            style={{
+              width: '100%',
+              padding: '0.5rem',
+              background: 'transparent',
+              border: '1px solid #e2e8f0',
+              borderRadius: '0.375rem',
+              color: '#64748b',
+              fontSize: '0.875rem',
+              cursor: 'pointer'
+            }}
+          >
+            Charger plus
+          </button>
+        )}
       </div>
     </div>
   );
@@ -29,6 +29,21 @@ api.interceptors.response.use(
   }
 );
 
+const CONVERSATIONS_PAGE_SIZE = 30;
+
+// Liste locale (plus récentes en tête) mise à jour : conversations modifiées remontées, supprimées retirées
+export const mergeConversations = (current, changed = [], deleted = []) => {
+  const replaced = new Set([...changed.map((c) => c.id), ...deleted]);
+  return [...changed, ...current.filter((c) => !replaced.has(c.id))]
+    .sort((a, b) => (b.updated_at || '').localeCompare(a.updated_at || ''));
+};
+
+// Page plus ancienne ajoutée en fin de liste (sans doublon si une synchronisation l'a déjà remontée)
+export const appendConversations = (current, older = []) => {
+  const known = new Set(current.map((c) => c.id));
+  return [...current, ...older.filter((c) => !known.has(c.id))];
+};
+
 // Service Chat
 export const chatService = {
   sendMessage: async (message, conversationId = null) => {
@@ -39,11 +54,27 @@ export const chatService = {
     return response.data;
   },
 
-  getConversations: async () => {
-    const response = await api.get('/chat/conversations');
+  // Une page : params { limit, cursor, since } -> { conversations, next_cursor, deleted, server_time }
+  getConversations: async (params = {}) => {
+    const response = await api.get('/chat/conversations', {
+      params: { limit: CONVERSATIONS_PAGE_SIZE, ...params }
+    });
     return response.data;
   },
 
+  // Modifications depuis `since` (toutes les pages) -> { conversations, deleted, server_time }
+  syncConversations: async (since) => {
+    const first = await chatService.getConversations({ since });
+    const conversations = [...first.conversations];
+    let cursor = first.next_cursor;
+    while (cursor) {
+      const page = await chatService.getConversations({ since, cursor });
+      conversations.push(...page.conversations);
+      cursor = page.next_cursor;
+    }
+    return { conversations, deleted: first.deleted || [], server_time: first.server_time };
+  },
+
   getConversation: async (conversationId) => {
     const response = await api.get(`/chat/conversations/${conversationId}`);
     return response.data;